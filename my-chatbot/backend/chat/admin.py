@@ -1,6 +1,56 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.db.models.fields.json import KT
+from django.db.models.functions import Substr
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
 
-from .models import Conversation, Participant, StudySession, SurveyResponse
+from .analytics import AUDIT_METRICS, GROUP_KEYS, cohort_report
+from .study_services import bump_memory_revision, refresh_participant_summaries
+from .models import (
+    Conversation,
+    MemoryFact,
+    Participant,
+    ParticipantSummary,
+    StudySession,
+    SurveyResponse,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids a full COUNT(*) on large, unfiltered changelists.
+
+    On PostgreSQL the planner's row estimate (pg_class.reltuples) is used once
+    the table is past ESTIMATE_THRESHOLD rows; filtered querysets and other
+    backends fall back to an exact count.
+    """
+
+    ESTIMATE_THRESHOLD = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where:
+            connection = connections[qs.db]
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [qs.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= self.ESTIMATE_THRESHOLD:
+                    return int(row[0])
+        return super().count
+
+
+def _is_changelist(request) -> bool:
+    match = getattr(request, "resolver_match", None)
+    return bool(match and match.url_name and match.url_name.endswith("_changelist"))
 
 
 @admin.register(SurveyResponse)
@@ -19,24 +69,84 @@ class SurveyResponseAdmin(admin.ModelAdmin):
     list_filter = ("survey_version", "session_number", "condition")
     search_fields = ("participant_code", "item_id")
     raw_id_fields = ("participant", "study_session")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if _is_changelist(request):
+            qs = qs.defer("item_text")
+        return qs
 
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
     list_display = ("id", "user_name", "character", "participant", "started_at", "messages_preview")
+    list_select_related = ("participant",)
     ordering = ("-started_at",)
     raw_id_fields = ("participant",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if _is_changelist(request):
+            # The preview is extracted in SQL; the blobs themselves never leave the database.
+            qs = qs.defer("messages", "audit", "participant__memory_summary").annotate(
+                first_sender=KT("messages__0__sender"),
+                first_content=Substr(KT("messages__0__content"), 1, 40),
+            )
+        return qs
 
     def messages_preview(self, obj):
-        if not obj.messages:
-            return "(no messages)"
-        first = obj.messages[0]
-        sender = first.get("sender", "?")
-        content = first.get("content", "")[:40]
-        return f"{sender}: {content}..."
+        if obj.archived_at:
+            return "(archived)"
+        if hasattr(obj, "first_sender"):
+            sender, content = obj.first_sender, obj.first_content
+            if sender is None and content is None:
+                return "(no messages)"
+        else:
+            if not obj.messages:
+                return "(no messages)"
+            first = obj.messages[0]
+            sender = first.get("sender")
+            content = (first.get("content") or "")[:40]
+        return f"{sender or '?'}: {content or ''}..."
 
     messages_preview.short_description = "First message"
 
+    def get_urls(self):
+        urls = [
+            path(
+                "cohort-report/",
+                self.admin_site.admin_view(self.cohort_report_view),
+                name="chat_conversation_cohort_report",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def cohort_report_view(self, request):
+        by = [k for k in request.GET.getlist("by") if k in GROUP_KEYS]
+        if "by" not in request.GET:
+            by = list(GROUP_KEYS)
+        fields = [*by, "conversations", "mean_messages", *AUDIT_METRICS]
+        rows = []
+        for row in cohort_report(by=by):
+            cells = []
+            for f in fields:
+                v = row.get(f)
+                cells.append("—" if v is None else f"{v:.3f}" if isinstance(v, float) else v)
+            rows.append(cells)
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Cohort audit report",
+            "opts": self.model._meta,
+            "group_options": [(k, k in by) for k in GROUP_KEYS],
+            "fields": fields,
+            "rows": rows,
+        }
+        return TemplateResponse(request, "admin/chat/cohort_report.html", context)
+
 
 @admin.register(Participant)
 class ParticipantAdmin(admin.ModelAdmin):
@@ -46,12 +156,92 @@ class ParticipantAdmin(admin.ModelAdmin):
         "condition",
         "display_name",
         "enrollment_code_used",
+        "sessions_completed",
+        "total_active_seconds",
         "created_at",
     )
+    list_select_related = ("summary",)
     ordering = ("-created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ("id", "auth_token", "pin_hash", "created_at")
     search_fields = ("display_name", "enrollment_code_used", "login_code", "id")
 
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if _is_changelist(request):
+            qs = qs.defer("memory_summary")
+        return qs
+
+    def _summary(self, obj):
+        try:
+            return obj.summary
+        except ParticipantSummary.DoesNotExist:
+            return None
+
+    def sessions_completed(self, obj):
+        summary = self._summary(obj)
+        return summary.sessions_completed if summary else "—"
+
+    sessions_completed.short_description = "Completed"
+
+    def total_active_seconds(self, obj):
+        summary = self._summary(obj)
+        return summary.total_active_seconds if summary else "—"
+
+    total_active_seconds.short_description = "Active seconds"
+
+
+@admin.register(MemoryFact)
+class MemoryFactAdmin(admin.ModelAdmin):
+    list_display = ("participant", "text", "created_at")
+    list_select_related = ("participant",)
+    ordering = ("-created_at",)
+    raw_id_fields = ("participant", "conversation")
+    search_fields = ("text",)
+
+    # Chat turns cache each participant's facts by memory_revision; bump it on edits.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_memory_revision(obj.participant)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_memory_revision(obj.participant)
+
+    def delete_queryset(self, request, queryset):
+        participants = list(Participant.objects.filter(memory_facts__in=queryset).distinct())
+        super().delete_queryset(request, queryset)
+        for participant in participants:
+            bump_memory_revision(participant)
+
+
+@admin.register(ParticipantSummary)
+class ParticipantSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        "participant",
+        "sessions_completed",
+        "sessions_abandoned",
+        "total_active_seconds",
+        "latest_session_number",
+        "last_completed_at",
+        "updated_at",
+    )
+    list_select_related = ("participant",)
+    list_filter = ("participant__condition", "sessions_completed")
+    ordering = ("-last_completed_at",)
+    readonly_fields = (
+        "participant",
+        "sessions_completed",
+        "sessions_abandoned",
+        "total_active_seconds",
+        "last_completed_at",
+        "latest_session_number",
+        "latest_survey_scores",
+        "availability_week_index",
+        "updated_at",
+    )
+
 
 @admin.register(StudySession)
 class StudySessionAdmin(admin.ModelAdmin):
@@ -66,5 +256,33 @@ class StudySessionAdmin(admin.ModelAdmin):
         "end_reason",
     )
     list_filter = ("status", "week_index")
+    list_select_related = ("participant",)
     ordering = ("participant", "week_index", "slot_index")
     raw_id_fields = ("participant", "conversation")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # Hand edits bypass the incremental summary updates; rebuild the participant's row.
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_participant_summaries([obj.participant_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_participant_summaries([obj.participant_id])
+
+    def delete_queryset(self, request, queryset):
+        participant_ids = set(queryset.values_list("participant_id", flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_participant_summaries(participant_ids)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if _is_changelist(request):
+            qs = qs.defer(
+                "comprehension_responses",
+                "likert_responses",
+                "survey_scores",
+                "participant__memory_summary",
+            )
+        return qs
@@ -0,0 +1,193 @@
+"""
+Cohort-level audit analytics.
+
+Loads every conversation's stored audit plus turn counts into columnar numpy
+arrays once, then answers grouped questions (by study arm, week, character)
+with vectorized bincounts instead of one Python pass per conversation.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.db.models.functions import Coalesce
+
+from .db_functions import JSONArrayLength
+from .models import Conversation, ParticipantSummary
+
+AUDIT_METRICS = (
+    "on_text_adherence",
+    "warmth_rate",
+    "over_social_rate",
+    "tailoring_score",
+    "adaptivity_index",
+    "child_on_task_rate",
+    "child_elaboration_rate",
+    "child_question_rate",
+)
+
+GROUP_KEYS = ("condition", "week", "character")
+
+# Conversations outside the study (legacy /start-conversation/) have no arm or week.
+NO_CONDITION = ""
+NO_WEEK = 0
+
+
+@dataclass
+class AuditColumns:
+    condition: np.ndarray  # object (str)
+    week: np.ndarray  # int64
+    character: np.ndarray  # object (str)
+    message_count: np.ndarray  # int64
+    metrics: np.ndarray  # (n, len(AUDIT_METRICS)) float64, NaN = not computed
+
+    def __len__(self) -> int:
+        return int(self.week.shape[0])
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+
+def load_audit_columns(queryset=None, chunk_size: int = 2000) -> AuditColumns:
+    """One streaming query; message blobs stay in the database."""
+    qs = queryset if queryset is not None else Conversation.objects.all()
+    rows = (
+        qs.order_by()
+        .annotate(
+            message_count=Coalesce("archive__message_count", JSONArrayLength("messages"))
+        )
+        .values_list(
+            "participant__condition",
+            "study_sessions__week_index",
+            "character",
+            "message_count",
+            "audit",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    conditions: List[str] = []
+    weeks: List[int] = []
+    characters: List[str] = []
+    counts: List[int] = []
+    values: List[float] = []
+    nan = float("nan")
+    for condition, week, character, count, audit in rows:
+        conditions.append(condition or NO_CONDITION)
+        weeks.append(week or NO_WEEK)
+        characters.append(character or "")
+        counts.append(count or 0)
+        audit = audit or {}
+        for m in AUDIT_METRICS:
+            v = audit.get(m)
+            values.append(nan if v is None else float(v))
+    n = len(weeks)
+    return AuditColumns(
+        condition=np.array(conditions, dtype=object),
+        week=np.array(weeks, dtype=np.int64),
+        character=np.array(characters, dtype=object),
+        message_count=np.array(counts, dtype=np.int64),
+        metrics=np.array(values, dtype=np.float64).reshape(n, len(AUDIT_METRICS)),
+    )
+
+
+def grouped_metrics(
+    columns: AuditColumns, by: Sequence[str] = GROUP_KEYS
+) -> List[Dict[str, Any]]:
+    """
+    Mean of each audit metric (ignoring missing values), conversation counts
+    and mean message count per group. `by` is any subset of GROUP_KEYS; an
+    empty `by` yields one overall row.
+    """
+    unknown = [k for k in by if k not in GROUP_KEYS]
+    if unknown:
+        raise ValueError(f"unknown group keys: {unknown}")
+    n = len(columns)
+    if n == 0:
+        return []
+
+    if by:
+        codes = []
+        labels = []
+        for key in by:
+            uniq, inverse = np.unique(columns.column(key), return_inverse=True)
+            codes.append(inverse)
+            labels.append(uniq)
+        stacked = np.stack(codes, axis=1)
+        groups, group_of_row = np.unique(stacked, axis=0, return_inverse=True)
+        group_of_row = group_of_row.reshape(-1)
+    else:
+        groups = np.zeros((1, 0), dtype=np.int64)
+        labels = []
+        group_of_row = np.zeros(n, dtype=np.int64)
+    g = groups.shape[0]
+
+    sizes = np.bincount(group_of_row, minlength=g)
+    msg_sum = np.bincount(group_of_row, weights=columns.message_count, minlength=g)
+    present = ~np.isnan(columns.metrics)
+    filled = np.where(present, columns.metrics, 0.0)
+
+    out: List[Dict[str, Any]] = []
+    metric_means = np.empty((g, len(AUDIT_METRICS)))
+    metric_counts = np.empty((g, len(AUDIT_METRICS)), dtype=np.int64)
+    for j in range(len(AUDIT_METRICS)):
+        s = np.bincount(group_of_row, weights=filled[:, j], minlength=g)
+        c = np.bincount(group_of_row, weights=present[:, j], minlength=g).astype(np.int64)
+        metric_counts[:, j] = c
+        with np.errstate(invalid="ignore", divide="ignore"):
+            metric_means[:, j] = np.where(c > 0, s / np.maximum(c, 1), np.nan)
+
+    for gi in range(g):
+        row: Dict[str, Any] = {}
+        for ki, key in enumerate(by):
+            value = labels[ki][groups[gi, ki]]
+            row[key] = int(value) if key == "week" else value
+        row["conversations"] = int(sizes[gi])
+        row["mean_messages"] = float(msg_sum[gi] / sizes[gi])
+        for j, m in enumerate(AUDIT_METRICS):
+            mean: Optional[float] = (
+                None if np.isnan(metric_means[gi, j]) else float(metric_means[gi, j])
+            )
+            row[m] = mean
+            row[f"{m}_n"] = int(metric_counts[gi, j])
+        out.append(row)
+    return out
+
+
+def cohort_report(by: Sequence[str] = GROUP_KEYS, queryset=None) -> List[Dict[str, Any]]:
+    return grouped_metrics(load_audit_columns(queryset), by=by)
+
+
+def participant_progress_by_condition() -> List[Dict[str, Any]]:
+    """Per-arm progress from ParticipantSummary (one row per participant, no session scan)."""
+    rows = list(
+        ParticipantSummary.objects.order_by().values_list(
+            "participant__condition",
+            "sessions_completed",
+            "sessions_abandoned",
+            "total_active_seconds",
+        )
+    )
+    if not rows:
+        return []
+    condition = np.array([r[0] for r in rows], dtype=object)
+    completed = np.array([r[1] for r in rows], dtype=np.float64)
+    abandoned = np.array([r[2] for r in rows], dtype=np.float64)
+    active = np.array([r[3] for r in rows], dtype=np.float64)
+    labels, group_of_row = np.unique(condition, return_inverse=True)
+    g = labels.shape[0]
+    sizes = np.bincount(group_of_row, minlength=g)
+    completed_sum = np.bincount(group_of_row, weights=completed, minlength=g)
+    abandoned_sum = np.bincount(group_of_row, weights=abandoned, minlength=g)
+    active_sum = np.bincount(group_of_row, weights=active, minlength=g)
+    return [
+        {
+            "condition": labels[i],
+            "participants": int(sizes[i]),
+            "mean_sessions_completed": float(completed_sum[i] / sizes[i]),
+            "mean_sessions_abandoned": float(abandoned_sum[i] / sizes[i]),
+            "mean_active_seconds": float(active_sum[i] / sizes[i]),
+            "total_active_seconds": int(active_sum[i]),
+        }
+        for i in range(g)
+    ]
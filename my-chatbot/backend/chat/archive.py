@@ -0,0 +1,166 @@
+"""
+Archival tier for finished conversations.
+
+Once every StudySession using a conversation has been completed or abandoned
+for STUDY_ARCHIVE_AFTER_DAYS, archive_conversations() moves the messages
+JSON into a compressed ConversationArchive row (zstd when the optional
+`zstandard` package is installed, gzip otherwise), empties
+Conversation.messages and stamps Conversation.archived_at. The audit column
+stays on the conversation, so analytics never need the archive.
+
+Reads go through Conversation.load_messages() or, for values() queries,
+messages_from_row(); restore_conversation() moves a conversation back to
+the hot table (e.g. before appending to it).
+"""
+from __future__ import annotations
+
+import gzip
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Conversation, ConversationArchive, StudySession
+
+# values() / values_list() lookups that carry the archived copy of a conversation.
+ARCHIVE_FIELDS = ("archive__codec", "archive__payload")
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def default_codec() -> str:
+    return ConversationArchive.Codec.ZSTD if _zstd() else ConversationArchive.Codec.GZIP
+
+
+def encode_messages(messages: List[dict], codec: Optional[str] = None) -> Tuple[str, bytes, int]:
+    """(codec, compressed payload, uncompressed size) for a messages list."""
+    codec = codec or default_codec()
+    raw = json.dumps(messages, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if codec == ConversationArchive.Codec.ZSTD:
+        zstd = _zstd()
+        if zstd is None:
+            raise ImportError("zstd archives require `pip install zstandard`.")
+        return codec, zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), len(raw)
+    return ConversationArchive.Codec.GZIP, gzip.compress(raw, compresslevel=GZIP_LEVEL), len(raw)
+
+
+def decode_messages(codec: str, payload) -> List[dict]:
+    data = bytes(payload)
+    if codec == ConversationArchive.Codec.ZSTD:
+        zstd = _zstd()
+        if zstd is None:
+            raise ImportError("Reading zstd archives requires `pip install zstandard`.")
+        raw = zstd.ZstdDecompressor().decompress(data)
+    else:
+        raw = gzip.decompress(data)
+    return json.loads(raw)
+
+
+def messages_from_row(messages: Any, codec: Optional[str], payload: Any) -> List[dict]:
+    """Messages for a row fetched with "messages" plus ARCHIVE_FIELDS."""
+    if payload is not None:
+        return decode_messages(codec, payload)
+    return messages or []
+
+
+def archive_after_days() -> int:
+    return int(getattr(settings, "STUDY_ARCHIVE_AFTER_DAYS", 30))
+
+
+def archivable_conversations(now: Optional[datetime] = None, days: Optional[int] = None):
+    """
+    Conversations not yet archived whose study sessions all ended (completed
+    or abandoned) at least `days` ago. Legacy conversations with no study
+    session are left alone.
+    """
+    now = now or timezone.now()
+    days = archive_after_days() if days is None else days
+    cutoff = now - timedelta(days=days)
+    finished = (StudySession.Status.COMPLETED, StudySession.Status.ABANDONED)
+    sessions = StudySession.objects.filter(conversation=OuterRef("pk"))
+    return Conversation.objects.filter(
+        Exists(sessions),
+        ~Exists(
+            sessions.filter(
+                ~Q(status__in=finished) | Q(ended_at__isnull=True) | Q(ended_at__gt=cutoff)
+            )
+        ),
+        archived_at__isnull=True,
+    )
+
+
+@dataclass
+class ArchiveResult:
+    conversations: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+
+
+def archive_conversations(
+    now: Optional[datetime] = None,
+    days: Optional[int] = None,
+    batch_size: int = 200,
+    codec: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> ArchiveResult:
+    """Archive every archivable conversation, one transaction per batch."""
+    now = now or timezone.now()
+    codec = codec or default_codec()
+    result = ArchiveResult()
+    while limit is None or result.conversations < limit:
+        size = batch_size if limit is None else min(batch_size, limit - result.conversations)
+        with transaction.atomic():
+            batch = list(
+                archivable_conversations(now, days)
+                .select_for_update(skip_locked=True)
+                .order_by("pk")
+                .only("id", "messages")[:size]
+            )
+            if not batch:
+                break
+            archives = []
+            for convo in batch:
+                used, payload, raw_bytes = encode_messages(convo.messages or [], codec)
+                archives.append(
+                    ConversationArchive(
+                        conversation=convo,
+                        codec=used,
+                        payload=payload,
+                        message_count=len(convo.messages or []),
+                        raw_bytes=raw_bytes,
+                    )
+                )
+                result.raw_bytes += raw_bytes
+                result.stored_bytes += len(payload)
+            ConversationArchive.objects.bulk_create(archives)
+            Conversation.objects.filter(pk__in=[c.pk for c in batch]).update(
+                messages=[], archived_at=now
+            )
+            result.conversations += len(batch)
+    return result
+
+
+def restore_conversation(conversation: Conversation) -> Conversation:
+    """Move an archived conversation's messages back into the hot row."""
+    if conversation.archived_at is None:
+        return conversation
+    with transaction.atomic():
+        conversation.messages = conversation.load_messages()
+        conversation.archived_at = None
+        conversation.save(update_fields=["messages", "archived_at"])
+        ConversationArchive.objects.filter(conversation=conversation).delete()
+    return conversation
@@ -2,6 +2,8 @@
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from .message_meta import meta_view
+
 AGENT_SENDERS = {"assistant", "bot", "agent"}
 CHILD_SENDERS = {"user", "child", "student"}
 
@@ -15,6 +17,27 @@ def _timestamp_from_iso(s: Optional[str], default: float) -> float:
         return default
 
 
+def message_timestamp(msg: Dict[str, Any], default: float) -> float:
+    """
+    Epoch seconds for a stored message: the "ts" float written with the
+    message, else parsed from the legacy created_at ISO string.
+    """
+    ts = msg.get("ts")
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return float(ts)
+    return _timestamp_from_iso(msg.get("created_at"), default)
+
+
+def _is_sorted(turns: List[Dict[str, Any]]) -> bool:
+    prev = None
+    for t in turns:
+        ts = t.get("timestamp", 0)
+        if prev is not None and ts < prev:
+            return False
+        prev = ts
+    return True
+
+
 def classify_role(msg: Dict[str, Any]) -> str:
     """
     Decide if a message belongs to the agent or the child.
@@ -29,7 +52,7 @@ def classify_role(msg: Dict[str, Any]) -> str:
     if sender in CHILD_SENDERS:
         return "child"
 
-    meta = msg.get("meta") or {}
+    meta = meta_view(msg.get("meta"))
     meta_role = meta.get("role")
     if meta_role in ("agent", "child"):
         return meta_role
@@ -139,8 +162,10 @@ def compute_session_metrics(turns: List[Dict[str, Any]]) -> Dict[str, Optional[f
     if not turns:
         return {}
 
-    # Sort by timestamp to ensure correct order
-    turns = sorted(turns, key=lambda t: t.get("timestamp", 0))
+    # Sort by timestamp to ensure correct order. Messages are appended in order,
+    # so this is normally a no-op; skip it when a linear check says so.
+    if not _is_sorted(turns):
+        turns = sorted(turns, key=lambda t: t.get("timestamp", 0))
 
     # Counters
     agent_turns = 0
@@ -231,8 +256,8 @@ def messages_to_turns(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if role not in ("agent", "child"):
             continue
 
-        meta = msg.get("meta") or {}
-        ts = _timestamp_from_iso(msg.get("created_at"), float(idx))
+        meta = meta_view(msg.get("meta"))
+        ts = message_timestamp(msg, float(idx))
 
         turn: Dict[str, Any] = {
             "timestamp": ts,
@@ -4,8 +4,10 @@ Full = sessions 1, 5, 9 (29 items). Mini = sessions 2,3,4,6,7,8 (10 items).
 """
 from __future__ import annotations
 
+import hashlib
+import json
 from dataclasses import dataclass
-from typing import List, Literal, Sequence
+from typing import Dict, FrozenSet, List, Literal, Sequence, Tuple
 
 SurveyVersion = Literal["full", "mini"]
 
@@ -103,24 +105,34 @@ def survey_version_for_session(week_index: int, slot_index: int) -> SurveyVersio
     return None
 
 
+SURVEY_VERSIONS: Tuple[SurveyVersion, ...] = ("full", "mini")
+
+_ITEMS_BY_ID: Dict[str, SurveyItem] = {it.item_id: it for it in CAIQ_FULL_ITEMS + PANAS_FULL_ITEMS}
+
+_ITEMS_BY_VERSION: Dict[str, Tuple[SurveyItem, ...]] = {
+    "full": tuple(CAIQ_FULL_ITEMS) + tuple(PANAS_FULL_ITEMS),
+    "mini": tuple(_ITEMS_BY_ID[iid] for iid in (*MINI_CAIQ_IDS, *MINI_PANAS_IDS)),
+}
+
+
+_EXPECTED_ID_SETS: Dict[str, FrozenSet[str]] = {
+    v: frozenset(it.item_id for it in items) for v, items in _ITEMS_BY_VERSION.items()
+}
+
+
 def expected_item_ids(version: SurveyVersion) -> List[str]:
-    if version == "full":
-        return [i.item_id for i in CAIQ_FULL_ITEMS] + [i.item_id for i in PANAS_FULL_ITEMS]
-    return list(MINI_CAIQ_IDS) + list(MINI_PANAS_IDS)
+    return [it.item_id for it in _ITEMS_BY_VERSION[version]]
+
+
+def expected_item_id_set(version: SurveyVersion) -> FrozenSet[str]:
+    return _EXPECTED_ID_SETS[version]
 
 
 def survey_items_for_version(version: SurveyVersion) -> List[SurveyItem]:
-    if version == "full":
-        return list(CAIQ_FULL_ITEMS) + list(PANAS_FULL_ITEMS)
-    id_to_item = {it.item_id: it for it in CAIQ_FULL_ITEMS + PANAS_FULL_ITEMS}
-    out: List[SurveyItem] = []
-    for iid in expected_item_ids(version):
-        out.append(id_to_item[iid])
-    return out
+    return list(_ITEMS_BY_VERSION[version])
 
 
-def survey_definition_payload(version: SurveyVersion) -> dict:
-    items = survey_items_for_version(version)
+def _build_payload(version: SurveyVersion) -> dict:
     return {
         "surveyVersion": version,
         "caiqInstruction": CAIQ_INSTRUCTION,
@@ -134,6 +146,41 @@ def survey_definition_payload(version: SurveyVersion) -> dict:
                 "text": it.text,
                 "block": it.block,
             }
-            for it in items
+            for it in _ITEMS_BY_VERSION[version]
         ],
     }
+
+
+@dataclass(frozen=True)
+class SurveyDefinition:
+    """A version's payload, its serialized JSON body and a strong ETag over that body."""
+
+    payload: dict
+    body: bytes
+    etag: str
+
+
+def _build_definition(version: SurveyVersion) -> SurveyDefinition:
+    payload = _build_payload(version)
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return SurveyDefinition(
+        payload=payload,
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+    )
+
+
+_DEFINITIONS: Dict[str, SurveyDefinition] = {v: _build_definition(v) for v in SURVEY_VERSIONS}
+
+
+def survey_definition(version: SurveyVersion) -> SurveyDefinition:
+    """Prebuilt definition for `version` (KeyError for unknown versions)."""
+    return _DEFINITIONS[version]
+
+
+def survey_definition_payload(version: SurveyVersion) -> dict:
+    """
+    Top-level copy of the prebuilt payload, so callers may add keys; the
+    nested item list is shared and must not be mutated.
+    """
+    return dict(_DEFINITIONS[version].payload)
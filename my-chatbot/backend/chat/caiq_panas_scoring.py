@@ -1,59 +1,180 @@
 """
 Aggregate scores for CAIQ-PANAS (full and mini).
+
+compute_scores() scores one submission. score_matrix() scores a
+(sessions x items) matrix for one survey version in a single vectorized
+pass, and rescore_sessions() uses it to recompute survey_scores for every
+StudySession straight from SurveyResponse rows (scoring revisions, or
+validating what is stored). Both paths produce identical dicts: item values
+are small integers, so a float64 row sum is exact and sum / count rounds the
+same way statistics.mean does.
 """
 from __future__ import annotations
 
-from statistics import mean
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from .caiq_panas_items import (
-    CAIQ_FULL_ITEMS,
     MINI_CAIQ_IDS,
     MINI_PANAS_IDS,
-    PANAS_FULL_ITEMS,
+    SURVEY_VERSIONS,
     SurveyVersion,
+    expected_item_ids,
 )
+from .models import StudySession, SurveyResponse
+
+
+@dataclass(frozen=True)
+class ScoreLayout:
+    """Column positions of each scored block within expected_item_ids(version)."""
 
+    version: SurveyVersion
+    item_ids: Tuple[str, ...]
+    column: Dict[str, int]
+    caiq: np.ndarray  # CAIQ columns (averaged for full, reported per item for mini)
+    positive: np.ndarray
+    negative: np.ndarray
+
+    @property
+    def caiq_ids(self) -> Tuple[str, ...]:
+        return tuple(self.item_ids[i] for i in self.caiq)
+
+
+def _build_layout(version: SurveyVersion) -> ScoreLayout:
+    item_ids = tuple(expected_item_ids(version))
+    column = {iid: i for i, iid in enumerate(item_ids)}
+    if version == "full":
+        caiq = [column[iid] for iid in item_ids if iid.startswith("CAIQ")]
+        pos = [column[iid] for iid in item_ids if iid.startswith("PANAS_PA")]
+        neg = [column[iid] for iid in item_ids if iid.startswith("PANAS_NA")]
+    else:
+        # mini: 6 CAIQ individual; PANAS pos = mean PA2,PA3; neg = mean NA4,NA5
+        caiq = [column[iid] for iid in MINI_CAIQ_IDS]
+        pos = [column[iid] for iid in MINI_PANAS_IDS[:2]]
+        neg = [column[iid] for iid in MINI_PANAS_IDS[2:]]
+    as_index = lambda cols: np.asarray(cols, dtype=np.intp)  # noqa: E731
+    return ScoreLayout(
+        version=version,
+        item_ids=item_ids,
+        column=column,
+        caiq=as_index(caiq),
+        positive=as_index(pos),
+        negative=as_index(neg),
+    )
 
-def _vals_by_ids(responses: Dict[str, int], ids: List[str]) -> List[float]:
-    out = []
-    for iid in ids:
-        v = responses.get(iid)
-        if v is None:
-            raise ValueError(f"missing item {iid}")
-        out.append(float(v))
+
+LAYOUTS: Dict[str, ScoreLayout] = {v: _build_layout(v) for v in SURVEY_VERSIONS}
+
+
+def response_matrix(
+    version: SurveyVersion, responses: Sequence[Dict[str, int]]
+) -> np.ndarray:
+    """(len(responses), n_items) float64 matrix; a missing item raises ValueError."""
+    layout = LAYOUTS[version]
+    out = np.empty((len(responses), len(layout.item_ids)), dtype=np.float64)
+    for r, resp in enumerate(responses):
+        for iid, c in layout.column.items():
+            v = resp.get(iid)
+            if v is None:
+                raise ValueError(f"missing item {iid}")
+            out[r, c] = v
     return out
 
 
+def _block_means(matrix: np.ndarray, cols: np.ndarray) -> List[float]:
+    return (matrix[:, cols].sum(axis=1) / len(cols)).tolist()
+
+
+def score_matrix(version: SurveyVersion, matrix: np.ndarray) -> List[Dict[str, Any]]:
+    """Score every row of a complete (sessions x items) matrix for one version."""
+    layout = LAYOUTS[version]
+    pos = _block_means(matrix, layout.positive)
+    neg = _block_means(matrix, layout.negative)
+    caiq_items = matrix[:, layout.caiq].astype(np.int64).tolist()
+    caiq_ids = layout.caiq_ids
+
+    if version == "full":
+        caiq_mean = _block_means(matrix, layout.caiq)
+        return [
+            {
+                "version": "full",
+                "caiqTotalMean": round(caiq_mean[r], 4),
+                "panasPositiveMean": round(pos[r], 4),
+                "panasNegativeMean": round(neg[r], 4),
+                "overallAffect": round(pos[r] - neg[r], 4),
+                "caiqItemScores": dict(zip(caiq_ids, caiq_items[r])),
+            }
+            for r in range(matrix.shape[0])
+        ]
+
+    return [
+        {
+            "version": "mini",
+            "caiqItemScores": dict(zip(caiq_ids, caiq_items[r])),
+            "panasPositiveMiniMean": round(pos[r], 4),
+            "panasNegativeMiniMean": round(neg[r], 4),
+            "overallAffectMini": round(pos[r] - neg[r], 4),
+        }
+        for r in range(matrix.shape[0])
+    ]
+
+
 def compute_scores(version: SurveyVersion, responses: Dict[str, int]) -> Dict[str, Any]:
     """
     responses: item_id -> 1..5 for all items in that survey version.
     """
-    if version == "full":
-        caiq_ids = [it.item_id for it in CAIQ_FULL_ITEMS]
-        caiq_vals = _vals_by_ids(responses, caiq_ids)
-        caiq_total = mean(caiq_vals)
-        pa_ids = [it.item_id for it in PANAS_FULL_ITEMS if it.item_id.startswith("PANAS_PA")]
-        na_ids = [it.item_id for it in PANAS_FULL_ITEMS if it.item_id.startswith("PANAS_NA")]
-        pos = mean(_vals_by_ids(responses, pa_ids))
-        neg = mean(_vals_by_ids(responses, na_ids))
-        return {
-            "version": "full",
-            "caiqTotalMean": round(caiq_total, 4),
-            "panasPositiveMean": round(pos, 4),
-            "panasNegativeMean": round(neg, 4),
-            "overallAffect": round(pos - neg, 4),
-            "caiqItemScores": {iid: responses[iid] for iid in caiq_ids},
-        }
+    return score_matrix(version, response_matrix(version, [responses]))[0]
+
+
+@dataclass
+class RescoreResult:
+    scores: Dict[Any, Dict[str, Any]] = field(default_factory=dict)  # session id -> scores
+    changed: List[Any] = field(default_factory=list)  # differs from stored survey_scores
+    incomplete: List[Any] = field(default_factory=list)  # missing items; not scored
+
+
+def rescore_sessions(queryset=None) -> RescoreResult:
+    """
+    Recompute survey_scores for every StudySession with SurveyResponse rows
+    (optionally limited to `queryset`). Reads responses in one query, fills
+    one matrix per survey version and scores each matrix in one pass.
+    Nothing is written; compare `changed` or save `scores` as needed.
+    """
+    responses = SurveyResponse.objects.all()
+    if queryset is not None:
+        responses = responses.filter(study_session__in=queryset)
+
+    rows: Dict[str, Dict[Any, int]] = {v: {} for v in SURVEY_VERSIONS}
+    filled: Dict[str, List[np.ndarray]] = {v: [] for v in SURVEY_VERSIONS}
+    result = RescoreResult()
+    for sid, version, iid, value in responses.order_by().values_list(
+        "study_session_id", "survey_version", "item_id", "value"
+    ):
+        layout = LAYOUTS.get(version)
+        col = layout.column.get(iid) if layout else None
+        if col is None:
+            continue
+        index = rows[version]
+        r = index.get(sid)
+        if r is None:
+            r = index[sid] = len(index)
+            filled[version].append(np.full(len(layout.item_ids), np.nan))
+        filled[version][r][col] = value
+
+    for version, index in rows.items():
+        if not index:
+            continue
+        matrix = np.vstack(filled[version])
+        complete = ~np.isnan(matrix).any(axis=1)
+        ids = list(index)
+        result.incomplete.extend(sid for sid, ok in zip(ids, complete) if not ok)
+        scored = score_matrix(version, matrix[complete])
+        result.scores.update(zip((sid for sid, ok in zip(ids, complete) if ok), scored))
 
-    # mini: 6 CAIQ individual; PANAS pos = mean PA2,PA3; neg = mean NA4,NA5
-    caiq_scores = {iid: responses[iid] for iid in MINI_CAIQ_IDS}
-    pos = mean(_vals_by_ids(responses, list(MINI_PANAS_IDS[:2])))  # PA2, PA3
-    neg = mean(_vals_by_ids(responses, list(MINI_PANAS_IDS[2:])))  # NA4, NA5
-    return {
-        "version": "mini",
-        "caiqItemScores": caiq_scores,
-        "panasPositiveMiniMean": round(pos, 4),
-        "panasNegativeMiniMean": round(neg, 4),
-        "overallAffectMini": round(pos - neg, 4),
-    }
+    stored = StudySession.objects.filter(id__in=list(result.scores)).values_list(
+        "id", "survey_scores"
+    )
+    result.changed = [sid for sid, current in stored if current != result.scores[sid]]
+    return result
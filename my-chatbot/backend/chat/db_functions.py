@@ -0,0 +1,16 @@
+"""
+Small database functions shared by analytics, exports and the admin.
+"""
+from django.db.models import Func, IntegerField
+
+
+class JSONArrayLength(Func):
+    """Length of a JSON array column computed in the database (no blob transfer)."""
+
+    function = "JSON_ARRAY_LENGTH"
+    output_field = IntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, function="JSONB_ARRAY_LENGTH", **extra_context
+        )
@@ -0,0 +1,100 @@
+"""
+Staff-only streaming exports for researchers.
+"""
+from __future__ import annotations
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from .exports import (
+    SURVEY_RESPONSE_COLUMNS,
+    TRANSCRIPT_TURN_COLUMNS,
+    aiter_in_batches,
+    iter_csv,
+    iter_survey_response_rows,
+    iter_transcript_ndjson,
+    iter_transcript_records,
+    iter_transcript_turn_rows,
+    survey_response_queryset,
+)
+
+
+def _stream(request, lines, content_type: str) -> StreamingHttpResponse:
+    # Under ASGI a sync iterator would be read into a list before the first byte.
+    if isinstance(request, ASGIRequest):
+        lines = aiter_in_batches(lines)
+    return StreamingHttpResponse(lines, content_type=content_type)
+
+
+def _int_param(request, *names):
+    for name in names:
+        raw = request.GET.get(name)
+        if raw not in (None, ""):
+            return int(raw)
+    return None
+
+
+@require_GET
+@staff_member_required
+def export_survey_responses(request):
+    """CSV of SurveyResponse rows; filters: condition, sessionNumber, surveyVersion."""
+    try:
+        session_number = _int_param(request, "sessionNumber", "session_number")
+    except ValueError:
+        return JsonResponse({"error": "sessionNumber must be an integer"}, status=400)
+    qs = survey_response_queryset(
+        condition=request.GET.get("condition") or None,
+        session_number=session_number,
+        survey_version=request.GET.get("surveyVersion") or request.GET.get("survey_version"),
+    )
+    response = _stream(
+        request,
+        iter_csv(SURVEY_RESPONSE_COLUMNS, iter_survey_response_rows(qs)),
+        "text/csv; charset=utf-8",
+    )
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+    response["Content-Disposition"] = f'attachment; filename="survey_responses_{stamp}.csv"'
+    return response
+
+
+def _flag(request, name: str, default: bool) -> bool:
+    raw = request.GET.get(name)
+    if raw is None:
+        return default
+    return raw.lower() in ("1", "true", "yes")
+
+
+@require_GET
+@staff_member_required
+def export_transcripts(request):
+    """
+    Study transcripts with session context.
+    format=ndjson (default): one JSON object per session.
+    format=csv: one row per message.
+    includeMessages=false (ndjson only) / includeContent=false for metadata-only exports.
+    """
+    fmt = request.GET.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return JsonResponse({"error": "format must be ndjson or csv"}, status=400)
+    records = iter_transcript_records(
+        condition=request.GET.get("condition") or None,
+        include_messages=fmt == "csv" or _flag(request, "includeMessages", True),
+        include_content=_flag(request, "includeContent", True),
+    )
+    stamp = timezone.now().strftime("%Y%m%d-%H%M%S")
+    if fmt == "csv":
+        response = _stream(
+            request,
+            iter_csv(TRANSCRIPT_TURN_COLUMNS, iter_transcript_turn_rows(records)),
+            "text/csv; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="transcript_turns_{stamp}.csv"'
+        return response
+    response = _stream(
+        request, iter_transcript_ndjson(records), "application/x-ndjson; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="transcripts_{stamp}.ndjson"'
+    return response
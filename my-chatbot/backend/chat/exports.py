@@ -0,0 +1,298 @@
+"""
+Streaming research exports (constant memory: rows come from
+`.values_list().iterator()` and are written as they arrive).
+
+The iter_* generators are synchronous. Under ASGI, Django would buffer a
+sync iterator in full before sending it, so views wrap them in
+aiter_in_batches(), which pulls one batch of lines per sync_to_async call.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+
+from .archive import ARCHIVE_FIELDS, messages_from_row
+from .message_meta import decode_meta
+from .models import StudySession, SurveyResponse
+
+SURVEY_RESPONSE_COLUMNS: Tuple[str, ...] = (
+    "id",
+    "participant_code",
+    "participant_id",
+    "study_session_id",
+    "condition",
+    "session_number",
+    "survey_version",
+    "item_id",
+    "item_text",
+    "value",
+    "completion_status",
+    "recorded_at",
+)
+
+DEFAULT_CHUNK_SIZE = 2000
+# Encoded lines per sync_to_async hop when streaming under ASGI.
+DEFAULT_STREAM_BATCH = 500
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(header: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_cell(v) for v in row])
+
+
+async def aiter_in_batches(
+    lines: Iterable[str], batch_size: int = DEFAULT_STREAM_BATCH
+) -> AsyncIterator[str]:
+    """
+    Async iterator over a sync iterator of encoded lines, joined `batch_size`
+    at a time. Every pull runs through (thread-sensitive) sync_to_async, so
+    the queryset cursor behind `lines` stays on the request's DB thread, and
+    only one batch is held in memory.
+    """
+    lines = iter(lines)
+    take = sync_to_async(lambda: "".join(islice(lines, batch_size)))
+    try:
+        while True:
+            chunk = await take()
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        close = getattr(lines, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def survey_response_queryset(
+    condition: Optional[str] = None,
+    session_number: Optional[int] = None,
+    survey_version: Optional[str] = None,
+):
+    qs = SurveyResponse.objects.all()
+    if condition:
+        qs = qs.filter(condition=condition)
+    if session_number is not None:
+        qs = qs.filter(session_number=session_number)
+    if survey_version:
+        qs = qs.filter(survey_version=survey_version)
+    return qs
+
+
+def iter_survey_response_rows(qs=None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[tuple]:
+    qs = qs if qs is not None else SurveyResponse.objects.all()
+    return (
+        qs.order_by("id")
+        .values_list(*SURVEY_RESPONSE_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def write_parquet(
+    path: str,
+    header: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    batch_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+    Write rows to a Parquet file one record batch at a time.
+    Requires the optional `pyarrow` package.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:  # pragma: no cover - depends on optional install
+        raise ImportError("Parquet export requires `pip install pyarrow`.") from e
+
+    writer = None
+    total = 0
+    batch: list = []
+
+    def flush():
+        nonlocal writer
+        cols = list(zip(*batch))
+        table = pa.table(
+            {name: [_str_if_needed(v) for v in col] for name, col in zip(header, cols)}
+        )
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table.cast(writer.schema))
+
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+                total += len(batch)
+                batch = []
+        if batch:
+            flush()
+            total += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
+
+
+def _str_if_needed(value: Any) -> Any:
+    # UUIDs are not a native Arrow type; keep everything else typed.
+    if value is None or isinstance(value, (str, int, float, bool, datetime)):
+        return value
+    return str(value)
+
+
+# ---------------------------------------------------------------------------
+# Transcripts (StudySession + Conversation + Participant)
+# ---------------------------------------------------------------------------
+
+TRANSCRIPT_SESSION_FIELDS: Tuple[str, ...] = (
+    "id",
+    "participant_id",
+    "participant__login_code",
+    "participant__condition",
+    "week_index",
+    "slot_index",
+    "status",
+    "started_at",
+    "ended_at",
+    "end_reason",
+    "active_seconds",
+    "survey_scores",
+    "conversation_id",
+    "conversation__character",
+    "conversation__user_name",
+    "conversation__started_at",
+)
+
+TRANSCRIPT_TURN_COLUMNS: Tuple[str, ...] = (
+    "study_session_id",
+    "conversation_id",
+    "participant_code",
+    "condition",
+    "week_index",
+    "slot_index",
+    "end_reason",
+    "active_seconds",
+    "turn_index",
+    "sender",
+    "created_at",
+    "content",
+    "meta",
+)
+
+DEFAULT_TRANSCRIPT_CHUNK_SIZE = 200
+
+
+def iter_transcript_records(
+    condition: Optional[str] = None,
+    include_messages: bool = True,
+    include_content: bool = True,
+    chunk_size: int = DEFAULT_TRANSCRIPT_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """
+    One dict per study session that has a conversation, joined in a single
+    query per chunk and keyset-paginated on the session primary key, so at
+    most `chunk_size` message blobs are held at once. With
+    include_messages=False the messages column is never selected.
+    """
+    fields = list(TRANSCRIPT_SESSION_FIELDS)
+    if include_messages:
+        fields += ["conversation__messages", *(f"conversation__{f}" for f in ARCHIVE_FIELDS)]
+    qs = StudySession.objects.filter(conversation__isnull=False)
+    if condition:
+        qs = qs.filter(participant__condition=condition)
+    qs = qs.order_by("pk")
+
+    last_pk = None
+    while True:
+        page = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+        rows = list(page.values(*fields)[:chunk_size])
+        if not rows:
+            return
+        for row in rows:
+            yield _transcript_record(row, include_messages, include_content)
+        last_pk = rows[-1]["id"]
+
+
+def _transcript_record(row: dict, include_messages: bool, include_content: bool) -> dict:
+    record = {
+        "studySessionId": str(row["id"]),
+        "conversationId": str(row["conversation_id"]),
+        "participantId": str(row["participant_id"]),
+        "participantCode": row["participant__login_code"] or "",
+        "condition": row["participant__condition"],
+        "weekIndex": row["week_index"],
+        "slotIndex": row["slot_index"],
+        "status": row["status"],
+        "startedAt": _cell(row["started_at"]),
+        "endedAt": _cell(row["ended_at"]),
+        "endReason": row["end_reason"],
+        "activeSeconds": row["active_seconds"],
+        "surveyScores": row["survey_scores"],
+        "character": row["conversation__character"],
+        "userName": row["conversation__user_name"],
+        "conversationStartedAt": _cell(row["conversation__started_at"]),
+    }
+    if include_messages:
+        messages = []
+        stored = messages_from_row(
+            row.get("conversation__messages"),
+            row.get("conversation__archive__codec"),
+            row.get("conversation__archive__payload"),
+        )
+        for m in stored:
+            out = {
+                "sender": m.get("sender"),
+                "created_at": m.get("created_at"),
+                "meta": decode_meta(m.get("meta")),
+            }
+            if include_content:
+                out["content"] = m.get("content")
+            messages.append(out)
+        record["messages"] = messages
+    return record
+
+
+def iter_transcript_ndjson(records: Iterable[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def iter_transcript_turn_rows(records: Iterable[dict]) -> Iterator[tuple]:
+    """Flatten transcript records to one row per message (CSV-per-turn)."""
+    for r in records:
+        for i, m in enumerate(r.get("messages") or []):
+            yield (
+                r["studySessionId"],
+                r["conversationId"],
+                r["participantCode"],
+                r["condition"],
+                r["weekIndex"],
+                r["slotIndex"],
+                r["endReason"],
+                r["activeSeconds"],
+                i,
+                m.get("sender"),
+                m.get("created_at"),
+                m.get("content", ""),
+                json.dumps(decode_meta(m.get("meta")), ensure_ascii=False),
+            )
@@ -0,0 +1,23 @@
+"""
+Password hasher for study PINs.
+
+A 4–6 digit PIN has at most 10**6 values, so no iteration count protects a
+leaked hash against offline guessing; the work factor only has to make
+online guessing slow, which the login lockout already does. The cost is
+therefore set for login latency (STUDY_PIN_HASH_ITERATIONS; measure with
+`manage.py benchmark_pin_hasher`) instead of Django's password default.
+Hashes with other parameters are upgraded on the next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+STUDY_PIN_ALGORITHM = "study_pin_pbkdf2"
+DEFAULT_PIN_HASH_ITERATIONS = 60000
+
+
+class StudyPinHasher(PBKDF2PasswordHasher):
+    algorithm = STUDY_PIN_ALGORITHM
+
+    @property
+    def iterations(self):
+        return int(getattr(settings, "STUDY_PIN_HASH_ITERATIONS", DEFAULT_PIN_HASH_ITERATIONS))
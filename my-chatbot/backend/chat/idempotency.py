@@ -0,0 +1,199 @@
+"""
+Idempotency keys for write endpoints.
+
+A client that may retry a POST sends the same `Idempotency-Key` header on
+every attempt. The first attempt claims an IdempotencyRecord row for
+(scope, key) before the view runs; once the view returns a 2xx/3xx response
+its body is stored on the row, and later attempts get that response back
+(with `Idempotent-Replayed: true`) without running the view again, so a
+retry never appends a message twice or pays for a second LLM call.
+
+- A request with no header behaves exactly as before.
+- The same key with a different body or caller gets 422.
+- The same key while the first attempt is still running gets 409.
+- Error responses (>= 400) and exceptions release the key so the client can retry.
+
+Records expire after STUDY_IDEMPOTENCY_TTL_SECONDS; a claim that never
+finished (worker killed mid-request) can be taken over after
+STUDY_IDEMPOTENCY_STALE_SECONDS, which is never shorter than the longest a
+view can spend on OpenAI calls (see view_time_budget), so a slow request is
+not run twice. Takeover, completion and release are conditional updates on
+(pk, created_at): an attempt whose claim was taken over finds no row to
+update, returns its response without storing it and leaves the new owner's
+claim alone. Expired rows are removed by the purge_idempotency_records
+command.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyRecord
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+MAX_KEY_LENGTH = 128
+
+
+def _ttl() -> timedelta:
+    return timedelta(seconds=int(getattr(settings, "STUDY_IDEMPOTENCY_TTL_SECONDS", 86400)))
+
+
+# Slack on top of the OpenAI budget for the rest of the view (DB work, prompt building).
+STALE_MARGIN_SECONDS = 60
+
+
+def view_time_budget() -> float:
+    """Upper bound on the time a view spends in OpenAI calls (every attempt timing out)."""
+    timeout = float(getattr(settings, "CHAT_OPENAI_TIMEOUT_SECONDS", 30))
+    retries = int(getattr(settings, "CHAT_OPENAI_MAX_RETRIES", 1))
+    return timeout * (retries + 1)
+
+
+def _stale_after() -> timedelta:
+    configured = int(getattr(settings, "STUDY_IDEMPOTENCY_STALE_SECONDS", 300))
+    return timedelta(seconds=max(configured, view_time_budget() + STALE_MARGIN_SECONDS))
+
+
+def request_fingerprint(request) -> str:
+    """Hash of what makes two attempts "the same request": caller, path and body."""
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(b"\0" + request.path.encode())
+    h.update(b"\0" + request.META.get("HTTP_AUTHORIZATION", "").encode())
+    h.update(b"\0" + request.body)
+    return h.hexdigest()
+
+
+def _claim(scope: str, key: str, fingerprint: str):
+    """
+    Returns (record, None) if this request now owns the key, or
+    (None, existing) if another attempt already has it.
+    """
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(
+                    scope=scope, key=key, fingerprint=fingerprint, expires_at=now + _ttl()
+                )
+            return record, None
+        except IntegrityError:
+            existing = IdempotencyRecord.objects.filter(scope=scope, key=key).first()
+            if existing is None:
+                continue
+            abandoned = (
+                existing.status_code is None and existing.created_at <= now - _stale_after()
+            )
+            if existing.expires_at > now and not abandoned:
+                return None, existing
+            # Expired, or its owner died: take the row over, unless another
+            # attempt got there first (then created_at no longer matches).
+            fields = dict(
+                fingerprint=fingerprint,
+                status_code=None,
+                content_type="",
+                body=b"",
+                created_at=now,
+                expires_at=now + _ttl(),
+            )
+            taken = IdempotencyRecord.objects.filter(
+                pk=existing.pk, created_at=existing.created_at
+            ).update(**fields)
+            if taken:
+                for name, value in fields.items():
+                    setattr(existing, name, value)
+                return existing, None
+    return None, IdempotencyRecord.objects.filter(scope=scope, key=key).first()
+
+
+def _owned(record: IdempotencyRecord):
+    # The row as long as this attempt still holds the claim.
+    return IdempotencyRecord.objects.filter(pk=record.pk, created_at=record.created_at)
+
+
+def _response_body(response) -> Optional[tuple]:
+    """(content_type, body bytes) to store, or None if the response can't be replayed."""
+    if getattr(response, "streaming", False):
+        return None
+    data = getattr(response, "data", None)
+    if data is not None and not getattr(response, "is_rendered", True):
+        # DRF Response leaving the handler: not rendered yet, store its data as JSON.
+        return "application/json", json.dumps(data, cls=DjangoJSONEncoder).encode("utf-8")
+    return response.get("Content-Type", "application/json"), bytes(response.content)
+
+
+def _replay(record: IdempotencyRecord) -> HttpResponse:
+    response = HttpResponse(
+        bytes(record.body), status=record.status_code, content_type=record.content_type
+    )
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(scope: str):
+    """
+    View decorator adding Idempotency-Key support. Works on function views
+    and, through method_decorator, on APIView handler methods.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            key = (request.META.get(HEADER) or "").strip()
+            if not key or request.method != "POST":
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({"error": "Idempotency-Key too long"}, status=400)
+
+            fingerprint = request_fingerprint(request)
+            record, existing = _claim(scope, key, fingerprint)
+            if record is None:
+                if existing is None or existing.fingerprint != fingerprint:
+                    return JsonResponse(
+                        {"error": "Idempotency-Key was already used for a different request"},
+                        status=422,
+                    )
+                if existing.status_code is None:
+                    response = JsonResponse(
+                        {"error": "A request with this Idempotency-Key is still in progress"},
+                        status=409,
+                    )
+                    response["Retry-After"] = "1"
+                    return response
+                return _replay(existing)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                _owned(record).delete()
+                raise
+            stored = _response_body(response) if response.status_code < 400 else None
+            if stored is None:
+                _owned(record).delete()
+                return response
+            content_type, body = stored
+            # Zero rows: the claim was taken over (or purged) meanwhile. The
+            # work is done, so answer anyway and just don't store the response.
+            _owned(record).update(
+                status_code=response.status_code, content_type=content_type, body=body
+            )
+            return response
+
+        return wrapped
+
+    return decorator
+
+
+def purge_expired(now=None) -> int:
+    now = now or timezone.now()
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=now).delete()
+    return deleted
@@ -0,0 +1,49 @@
+"""
+Move finished conversations' messages into the compressed archive table.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.archive import archivable_conversations, archive_conversations, default_codec
+
+
+class Command(BaseCommand):
+    help = (
+        "Compress the messages of conversations whose study sessions all ended at least "
+        "--days ago (default STUDY_ARCHIVE_AFTER_DAYS) into ConversationArchive rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--limit", type=int, default=None, help="Stop after N conversations.")
+        parser.add_argument(
+            "--codec",
+            choices=("gzip", "zstd"),
+            default=None,
+            help="Default: zstd if the zstandard package is installed, else gzip.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count what would be archived."
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            n = archivable_conversations(days=options["days"]).count()
+            self.stdout.write(f"{n} conversations would be archived ({default_codec()}).")
+            return
+        try:
+            result = archive_conversations(
+                days=options["days"],
+                batch_size=options["batch_size"],
+                codec=options["codec"],
+                limit=options["limit"],
+            )
+        except ImportError as e:
+            raise CommandError(str(e))
+        ratio = result.stored_bytes / result.raw_bytes if result.raw_bytes else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {result.conversations} conversations: "
+                f"{result.raw_bytes} -> {result.stored_bytes} bytes ({ratio:.0%})."
+            )
+        )
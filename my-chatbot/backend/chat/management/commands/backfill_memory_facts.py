@@ -0,0 +1,29 @@
+"""
+Split legacy Participant.memory_summary text into MemoryFact rows.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from chat.models import MemoryFact, Participant
+from chat.study_services import add_memory_facts, facts_from_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Create MemoryFact rows from memory_summary for participants that have a "
+        "summary but no facts yet (safe to re-run)."
+    )
+
+    def handle(self, *args, **options):
+        participants = (
+            Participant.objects.exclude(memory_summary="")
+            .filter(~Exists(MemoryFact.objects.filter(participant=OuterRef("pk"))))
+            .only("id", "memory_summary")
+        )
+        people = facts = 0
+        for participant in participants.iterator(chunk_size=200):
+            added = add_memory_facts(participant, facts_from_text(participant.memory_summary))
+            if added:
+                people += 1
+                facts += added
+        self.stdout.write(self.style.SUCCESS(f"Added {facts} facts for {people} participants."))
@@ -0,0 +1,36 @@
+"""
+Measure PIN hashing cost and suggest STUDY_PIN_HASH_ITERATIONS for a target.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.hashers import StudyPinHasher
+
+
+class Command(BaseCommand):
+    help = (
+        "Time StudyPinHasher on this machine at the configured iteration count and "
+        "print the iteration count that would hit --target-ms per hash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=25.0)
+        parser.add_argument("--samples", type=int, default=5)
+
+    def handle(self, *args, **options):
+        hasher = StudyPinHasher()
+        iterations = hasher.iterations
+        salt = hasher.salt()
+        timings = []
+        for _ in range(max(1, options["samples"])):
+            t0 = time.perf_counter()
+            hasher.encode("123456", salt, iterations)
+            timings.append((time.perf_counter() - t0) * 1000)
+        ms = statistics.median(timings)
+        suggested = max(1000, int(iterations * options["target_ms"] / ms // 1000 * 1000))
+        self.stdout.write(f"{iterations} iterations: {ms:.1f} ms per hash (median of {len(timings)})")
+        self.stdout.write(
+            f"STUDY_PIN_HASH_ITERATIONS={suggested}  # ~{options['target_ms']:.0f} ms per login"
+        )
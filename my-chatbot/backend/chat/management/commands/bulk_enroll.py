@@ -0,0 +1,57 @@
+"""
+Enroll a classroom from a CSV of names (and optional PINs).
+"""
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.study_enrollment import EnrollmentEntry, bulk_enroll, random_pin
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create participants under one enrollment code. Input CSV columns: "
+        "display_name[,pin]; missing PINs are generated. Writes display_name, "
+        "login_code, pin, participant_id for printing login cards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("enrollment_code")
+        parser.add_argument("input", help="CSV path ('-' = stdin).")
+        parser.add_argument("--output", "-o", default="-", help="File path ('-' = stdout).")
+        parser.add_argument("--workers", type=int, help="PIN hashing processes (default: CPUs).")
+        parser.add_argument("--no-header", action="store_true", help="Input has no header row.")
+
+    def handle(self, *args, **options):
+        fh = sys.stdin if options["input"] == "-" else open(options["input"], newline="", encoding="utf-8")
+        try:
+            rows = [r for r in csv.reader(fh) if r and any(c.strip() for c in r)]
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+        if rows and not options["no_header"]:
+            rows = rows[1:]
+        entries = [
+            EnrollmentEntry(
+                display_name=row[0].strip(),
+                pin=(row[1].strip() if len(row) > 1 and row[1].strip() else random_pin()),
+            )
+            for row in rows
+        ]
+        try:
+            enrolled = bulk_enroll(options["enrollment_code"], entries, workers=options["workers"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        out = options["output"]
+        dest = sys.stdout if out == "-" else open(out, "w", newline="", encoding="utf-8")
+        try:
+            writer = csv.writer(dest)
+            writer.writerow(["display_name", "login_code", "pin", "participant_id"])
+            for e, entry in zip(enrolled, entries):
+                writer.writerow([e.display_name, e.login_code, entry.pin, e.participant_id])
+        finally:
+            if dest is not sys.stdout:
+                dest.close()
+        self.stderr.write(f"Enrolled {len(enrolled)} participants.")
@@ -0,0 +1,66 @@
+"""
+Grouped audit metrics across all conversations.
+"""
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+
+from chat.analytics import (
+    AUDIT_METRICS,
+    GROUP_KEYS,
+    cohort_report,
+    participant_progress_by_condition,
+)
+
+
+class Command(BaseCommand):
+    help = "Mean audit metrics grouped by study arm, week and/or character."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--by",
+            nargs="*",
+            choices=GROUP_KEYS,
+            default=list(GROUP_KEYS),
+            help="Group keys (none = one overall row).",
+        )
+        parser.add_argument("--format", choices=("table", "csv", "json"), default="table")
+        parser.add_argument(
+            "--participants",
+            action="store_true",
+            help="Per-arm participant progress from ParticipantSummary instead of audits.",
+        )
+
+    def handle(self, *args, **options):
+        by = options["by"]
+        fmt = options["format"]
+        if options["participants"]:
+            rows = participant_progress_by_condition()
+            fields = list(rows[0]) if rows else ["condition", "participants"]
+        else:
+            rows = cohort_report(by=by)
+            fields = [*by, "conversations", "mean_messages", *AUDIT_METRICS]
+
+        if fmt == "json":
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+
+        if fmt == "csv":
+            writer = csv.DictWriter(self.stdout, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+            return
+
+        self.stdout.write(" | ".join(fields))
+        for row in rows:
+            cells = []
+            for f in fields:
+                v = row.get(f)
+                if v is None:
+                    cells.append("n/a")
+                elif isinstance(v, float):
+                    cells.append(f"{v:.3f}")
+                else:
+                    cells.append(str(v) or "-")
+            self.stdout.write(" | ".join(cells))
@@ -0,0 +1,60 @@
+"""
+Stream SurveyResponse rows to CSV (or Parquet with pyarrow installed).
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.exports import (
+    SURVEY_RESPONSE_COLUMNS,
+    iter_csv,
+    iter_survey_response_rows,
+    survey_response_queryset,
+    write_parquet,
+)
+
+
+class Command(BaseCommand):
+    help = "Export SurveyResponse long-form rows with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", default="-", help="File path ('-' = stdout).")
+        parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+        parser.add_argument("--condition")
+        parser.add_argument("--session-number", type=int)
+        parser.add_argument("--survey-version", choices=("full", "mini"))
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        qs = survey_response_queryset(
+            condition=options["condition"],
+            session_number=options["session_number"],
+            survey_version=options["survey_version"],
+        )
+        rows = iter_survey_response_rows(qs, chunk_size=options["chunk_size"])
+        out = options["output"]
+
+        if options["format"] == "parquet":
+            if out == "-":
+                raise CommandError("Parquet export needs --output PATH.")
+            try:
+                n = write_parquet(out, SURVEY_RESPONSE_COLUMNS, rows, options["chunk_size"])
+            except ImportError as e:
+                raise CommandError(str(e))
+            if n == 0:
+                self.stderr.write("No rows matched; no file written.")
+            else:
+                self.stderr.write(f"Wrote {n} rows to {out}")
+            return
+
+        fh = sys.stdout if out == "-" else open(out, "w", newline="", encoding="utf-8")
+        n = -1  # header line
+        try:
+            for line in iter_csv(SURVEY_RESPONSE_COLUMNS, rows):
+                fh.write(line)
+                n += 1
+        finally:
+            if fh is not sys.stdout:
+                fh.close()
+        if out != "-":
+            self.stderr.write(f"Wrote {n} rows to {out}")
@@ -0,0 +1,55 @@
+"""
+Stream study transcripts with session context as NDJSON or CSV-per-turn.
+"""
+import sys
+
+from django.core.management.base import BaseCommand
+
+from chat.exports import (
+    DEFAULT_TRANSCRIPT_CHUNK_SIZE,
+    TRANSCRIPT_TURN_COLUMNS,
+    iter_csv,
+    iter_transcript_ndjson,
+    iter_transcript_records,
+    iter_transcript_turn_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Export study transcripts joined with StudySession and Participant context."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", default="-", help="File path ('-' = stdout).")
+        parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+        parser.add_argument("--condition")
+        parser.add_argument(
+            "--no-messages",
+            action="store_true",
+            help="Session metadata only (ndjson); message blobs are not read.",
+        )
+        parser.add_argument(
+            "--no-content", action="store_true", help="Drop message text, keep sender/meta."
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_TRANSCRIPT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        csv_out = options["format"] == "csv"
+        records = iter_transcript_records(
+            condition=options["condition"],
+            include_messages=csv_out or not options["no_messages"],
+            include_content=not options["no_content"],
+            chunk_size=options["chunk_size"],
+        )
+        if csv_out:
+            lines = iter_csv(TRANSCRIPT_TURN_COLUMNS, iter_transcript_turn_rows(records))
+        else:
+            lines = iter_transcript_ndjson(records)
+
+        out = options["output"]
+        fh = sys.stdout if out == "-" else open(out, "w", newline="", encoding="utf-8")
+        try:
+            for line in lines:
+                fh.write(line)
+        finally:
+            if fh is not sys.stdout:
+                fh.close()
@@ -0,0 +1,13 @@
+"""
+Delete expired Idempotency-Key records.
+"""
+from django.core.management.base import BaseCommand
+
+from chat.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete IdempotencyRecord rows past STUDY_IDEMPOTENCY_TTL_SECONDS (run daily from cron)."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {purge_expired()} expired idempotency records.")
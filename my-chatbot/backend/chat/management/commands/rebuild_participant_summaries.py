@@ -0,0 +1,22 @@
+"""
+Rebuild ParticipantSummary rows from StudySession.
+"""
+from django.core.management.base import BaseCommand
+
+from chat.models import Participant
+from chat.study_services import refresh_participant_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute every ParticipantSummary row (batched by participant)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        size = options["batch_size"]
+        ids = list(Participant.objects.order_by("created_at").values_list("id", flat=True))
+        written = 0
+        for i in range(0, len(ids), size):
+            written += refresh_participant_summaries(ids[i : i + size])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} participant summaries."))
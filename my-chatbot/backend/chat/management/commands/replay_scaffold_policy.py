@@ -0,0 +1,88 @@
+"""
+Replay stored transcripts under a grid of PolicyConfig values.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.models import Conversation
+from chat.policy_replay import METRICS, config_grid, replay_corpus
+from chat.scaffold_policy import PolicyConfig
+from chat.signal_classifier import get_signal_scorer
+
+_DEFAULTS = PolicyConfig()
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run LadderPolicy decisions over stored conversations for every combination "
+        "of the given PolicyConfig values and report tailoring_score / adaptivity_index "
+        "against the stored audits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--confusion-threshold", type=float, nargs="+", default=[_DEFAULTS.confusion_threshold]
+        )
+        parser.add_argument(
+            "--success-threshold", type=float, nargs="+", default=[_DEFAULTS.success_threshold]
+        )
+        parser.add_argument("--window", type=int, nargs="+", default=[_DEFAULTS.window])
+        parser.add_argument(
+            "--stuck-rounds",
+            type=int,
+            nargs="+",
+            default=[_DEFAULTS.allow_explanation_if_stuck_rounds],
+            help="allow_explanation_if_stuck_rounds values.",
+        )
+        parser.add_argument("--condition", help="Only conversations of this study arm.")
+        parser.add_argument("--json", action="store_true", help="Emit JSON rows.")
+
+    def handle(self, *args, **options):
+        configs = config_grid(
+            confusion_threshold=options["confusion_threshold"],
+            success_threshold=options["success_threshold"],
+            window=options["window"],
+            allow_explanation_if_stuck_rounds=options["stuck_rounds"],
+        )
+        qs = Conversation.objects.all()
+        if options["condition"]:
+            qs = qs.filter(participant__condition=options["condition"])
+
+        t0 = time.perf_counter()
+        report = replay_corpus(configs, queryset=qs, scorer=get_signal_scorer())
+        elapsed = time.perf_counter() - t0
+        rows = report.rows()
+
+        if options["json"]:
+            self.stdout.write(
+                json.dumps(
+                    {"conversations": report.conversations, "baseline": report.baseline(), "rows": rows},
+                    indent=2,
+                )
+            )
+            return
+
+        def fmt(v, signed=False):
+            if v is None:
+                return "   n/a"
+            return f"{v:+.3f}" if signed else f"{v:6.3f}"
+
+        base = report.baseline()
+        self.stdout.write(
+            f"{report.conversations} conversations, {len(configs)} configs in {elapsed:.2f}s"
+        )
+        self.stdout.write(
+            "stored: "
+            + ", ".join(f"{m}={base[m]:.3f}" if base[m] is not None else f"{m}=n/a" for m in METRICS)
+        )
+        self.stdout.write("conf  succ  win stuck | tailoring  delta | adaptivity  delta")
+        for row in rows:
+            c = row["config"]
+            self.stdout.write(
+                f"{c['confusion_threshold']:.2f}  {c['success_threshold']:.2f}  "
+                f"{c['window']:>3} {c['allow_explanation_if_stuck_rounds']:>5} | "
+                f"{fmt(row['tailoring_score'])}  {fmt(row['delta_tailoring_score'], True)} | "
+                f"{fmt(row['adaptivity_index'])}  {fmt(row['delta_adaptivity_index'], True)}"
+            )
@@ -0,0 +1,46 @@
+"""
+Recompute StudySession.survey_scores from SurveyResponse rows.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from chat.caiq_panas_scoring import rescore_sessions
+from chat.models import StudySession
+from chat.study_services import refresh_participant_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-score every CAIQ-PANAS submission in one batched pass and save sessions whose "
+        "stored survey_scores differ. With --check, only report differences (exit 1 if any)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Validate stored scores without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        result = rescore_sessions()
+        self.stdout.write(
+            f"scored {len(result.scores)}, changed {len(result.changed)}, "
+            f"incomplete {len(result.incomplete)}"
+        )
+        if options["check"]:
+            if result.changed:
+                for sid in result.changed:
+                    self.stdout.write(f"  mismatch: {sid}")
+                raise CommandError(f"{len(result.changed)} sessions have stale survey_scores.")
+            return
+        if not result.changed:
+            return
+
+        sessions = list(StudySession.objects.filter(id__in=result.changed))
+        for ss in sessions:
+            ss.survey_scores = result.scores[ss.id]
+        with transaction.atomic():
+            StudySession.objects.bulk_update(sessions, ["survey_scores"], batch_size=500)
+            refresh_participant_summaries({ss.participant_id for ss in sessions})
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(sessions)} sessions."))
@@ -0,0 +1,36 @@
+"""
+Apply due session locks in bulk (time cap stamps, abandonment).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.study_services import sweep_session_locks
+
+
+class Command(BaseCommand):
+    help = (
+        "Stamp time_cap_triggered_at on in-progress sessions past their wall cap and, "
+        "when STUDY_ABANDON_AFTER_SECONDS > 0, mark long-idle sessions abandoned. "
+        "Run from cron, or with --interval as a long-lived worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat every N seconds instead of sweeping once.",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            result = sweep_session_locks()
+            if result.time_capped or result.abandoned or not interval:
+                self.stdout.write(
+                    f"time-capped {result.time_capped}, abandoned {result.abandoned}"
+                )
+            if not interval:
+                return
+            time.sleep(interval)
@@ -0,0 +1,60 @@
+"""
+Train the local confusion/success classifier from annotated Conversation.messages.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+import numpy as np
+
+from chat.archive import ARCHIVE_FIELDS, messages_from_row
+from chat.models import Conversation
+from chat.signal_classifier import DEFAULT_N_FEATURES, SignalClassifier, labeled_examples
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the hashed n-gram signal classifier from child messages annotated "
+        "with confusion_signal / autonomy_signal and write it as .npz."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the .npz model to write.")
+        parser.add_argument("--features", type=int, default=DEFAULT_N_FEATURES)
+        parser.add_argument("--epochs", type=int, default=40)
+        parser.add_argument("--learning-rate", type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        texts = []
+        targets = []
+        rows = Conversation.objects.values_list("messages", *ARCHIVE_FIELDS).iterator(
+            chunk_size=500
+        )
+        for messages, codec, payload in rows:
+            for text, conf, succ in labeled_examples(messages_from_row(messages, codec, payload)):
+                texts.append(text)
+                targets.append((conf, succ))
+
+        if not texts:
+            raise CommandError("No annotated child messages found.")
+
+        y = np.asarray(targets, dtype=np.float64)
+        model = SignalClassifier.empty(options["features"]).fit(
+            texts,
+            y,
+            epochs=options["epochs"],
+            learning_rate=options["learning_rate"],
+        )
+        model.save(options["output"])
+
+        pred = model.predict_batch(texts)
+        mask = ~np.isnan(y)
+        hits = (pred >= 0.5) == (y >= 0.5)
+        acc = [
+            float(hits[mask[:, h], h].mean()) if mask[:, h].any() else float("nan")
+            for h in (0, 1)
+        ]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Trained on {len(texts)} messages -> {options['output']} "
+                f"(train accuracy confusion={acc[0]:.3f}, success={acc[1]:.3f})"
+            )
+        )
@@ -0,0 +1,114 @@
+"""
+Lexical relevance index over a participant's memory facts (BM25).
+
+Facts are short, so a plain bag-of-words index is enough and needs no
+embeddings or network calls: text is accent-folded, lowercased, split on
+word characters, stop words are dropped and common plural endings are
+folded (Portuguese and English). Scores use Okapi BM25.
+"""
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+K1 = 1.2
+B = 0.75
+
+_WORD = re.compile(r"\w+")
+
+STOP_WORDS = frozenset(
+    """
+    a o as os um uma uns umas de do da dos das em no na nos nas por para pra com sem
+    e ou mas que se ao aos the an and or of to in on at for with is are was were be
+    eu tu ele ela nos eles elas me te lhe meu minha teu tua seu sua isso isto aquilo
+    foi era sao ser estar esta este essa esse muito mais como quando onde porque ja
+    nao sim tambem i you he she it we they my your his her its our their this that
+    do does did have has had not no yes very so but if then than about what who
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    folded = unicodedata.normalize("NFKD", text or "")
+    folded = "".join(c for c in folded if not unicodedata.combining(c)).lower()
+    out = []
+    for tok in _WORD.findall(folded):
+        if len(tok) < 2 or tok in STOP_WORDS or tok.isdigit():
+            continue
+        out.append(_singular(tok))
+    return out
+
+
+def _singular(tok: str) -> str:
+    # Crude plural folding, enough for "dragões"/"dragão" and "piratas"/"pirata".
+    if len(tok) <= 3:
+        return tok
+    for suffix, repl in (("oes", "ao"), ("aes", "ao"), ("ns", "m")):
+        if tok.endswith(suffix):
+            return tok[: -len(suffix)] + repl
+    return tok[:-1] if tok.endswith("s") else tok
+
+
+@dataclass(frozen=True)
+class MemoryIndex:
+    """BM25 index over `facts`, which are in chronological order (oldest first)."""
+
+    facts: Tuple[str, ...]
+    term_freqs: Tuple[Dict[str, int], ...]
+    lengths: Tuple[int, ...]
+    idf: Dict[str, float]
+    avg_length: float
+
+    @classmethod
+    def build(cls, facts: Sequence[str]) -> "MemoryIndex":
+        term_freqs = tuple(Counter(tokenize(f)) for f in facts)
+        n = len(term_freqs)
+        df: Counter = Counter()
+        for tf in term_freqs:
+            df.update(tf.keys())
+        lengths = tuple(sum(tf.values()) for tf in term_freqs)
+        return cls(
+            facts=tuple(facts),
+            term_freqs=term_freqs,
+            lengths=lengths,
+            idf={t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()},
+            avg_length=(sum(lengths) / n) if n else 0.0,
+        )
+
+    def __len__(self) -> int:
+        return len(self.facts)
+
+    def scores(self, query: str) -> List[float]:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        out = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = K1 * (1 - B + B * length / self.avg_length) if self.avg_length else K1
+            score = 0.0
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    score += self.idf[t] * f * (K1 + 1) / (f + norm)
+            out.append(score)
+        return out
+
+    def top_k(self, query: str, k: int) -> List[str]:
+        """
+        Up to k facts by relevance to `query` (newer first on ties). If
+        nothing matches, the k most recent facts, so the prompt still gets
+        some continuity.
+        """
+        if k <= 0 or not self.facts:
+            return []
+        scores = self.scores(query)
+        ranked = sorted(
+            (i for i, s in enumerate(scores) if s > 0),
+            key=lambda i: (scores[i], i),
+            reverse=True,
+        )
+        if not ranked:
+            ranked = list(range(len(self.facts) - 1, -1, -1))
+        return [self.facts[i] for i in ranked[:k]]
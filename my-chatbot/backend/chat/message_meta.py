@@ -0,0 +1,121 @@
+"""
+Compact encoding for the `meta` annotations stored on each Conversation message.
+
+Legacy messages store meta as a dict with string keys and enum strings
+({"role": "agent", "stance": "RESPONSIVE", "ladder_step": "NUDGE", ...}).
+New messages store a short JSON list instead:
+
+    [SCHEMA_VERSION, role, text_focus, stance, ladder_step, affect,
+     confusion_signal, autonomy_signal, flags, {extras}]
+
+- Enum slots are 0 when unset, otherwise 1 + the value's index in its table below.
+- `flags` packs the optional booleans on_text, on_task, elaborated and
+  is_question as two bits each (present, value).
+- Keys outside the schema, and values a table can't represent, are kept verbatim
+  in the trailing extras dict, so encoding never loses information.
+- Trailing zeros (and an empty extras dict) are dropped.
+
+Readers go through decode_meta() (a fresh dict) or meta_view() (a shared,
+read-only mapping, cached per distinct encoding; most messages in a
+conversation carry one of a handful of metas). Both accept either format.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+SCHEMA_VERSION = 1
+
+ROLES = ("agent", "child")
+TEXT_FOCUSES = ("ON_TEXT", "OFF_TEXT_SAFE", "OFF_TEXT")
+STANCES = ("QUIET", "RESPONSIVE", "PROACTIVE")
+LADDER_STEPS = ("NUDGE", "REFLECT", "ANALOGY", "MINIEXPLAIN")
+AFFECTS = ("NEUTRAL", "WARM_SUPPORTIVE", "OVER_SOCIAL")
+SIGNALS = ("NONE", "LOW", "HIGH")
+
+# Position in the encoded list -> (meta key, value table).
+ENUM_SLOTS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("role", ROLES),
+    ("text_focus", TEXT_FOCUSES),
+    ("stance", STANCES),
+    ("ladder_step", LADDER_STEPS),
+    ("affect", AFFECTS),
+    ("confusion_signal", SIGNALS),
+    ("autonomy_signal", SIGNALS),
+)
+FLAG_KEYS = ("on_text", "on_task", "elaborated", "is_question")
+
+_ENUM_CODES = tuple({v: i + 1 for i, v in enumerate(table)} for _, table in ENUM_SLOTS)
+_FLAGS_POS = 1 + len(ENUM_SLOTS)
+_EXTRAS_POS = _FLAGS_POS + 1
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+
+def is_encoded(raw: Any) -> bool:
+    return isinstance(raw, list) and bool(raw) and raw[0] == SCHEMA_VERSION
+
+
+def encode_meta(meta: Optional[Mapping[str, Any]]) -> list:
+    """Compact list for a meta dict (see module docstring). An encoded list passes through."""
+    if is_encoded(meta):
+        return list(meta)
+    meta = dict(meta or {})
+    out = [SCHEMA_VERSION]
+    for (key, _), codes in zip(ENUM_SLOTS, _ENUM_CODES):
+        value = meta.get(key)
+        code = codes.get(value) if isinstance(value, str) else None
+        if code is None:
+            out.append(0)
+        else:
+            out.append(code)
+            del meta[key]
+    flags = 0
+    for i, key in enumerate(FLAG_KEYS):
+        value = meta.get(key)
+        if isinstance(value, bool):
+            flags |= (1 | (value << 1)) << (2 * i)
+            del meta[key]
+    out.append(flags)
+    if meta:
+        out.append(meta)
+    else:
+        while len(out) > 1 and out[-1] == 0:
+            out.pop()
+    return out
+
+
+def _decode(raw: list) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for (key, table), code in zip(ENUM_SLOTS, raw[1:_FLAGS_POS]):
+        if code:
+            out[key] = table[code - 1]
+    flags = raw[_FLAGS_POS] if len(raw) > _FLAGS_POS else 0
+    for i, key in enumerate(FLAG_KEYS):
+        bits = flags >> (2 * i)
+        if bits & 1:
+            out[key] = bool(bits & 2)
+    if len(raw) > _EXTRAS_POS and isinstance(raw[_EXTRAS_POS], dict):
+        out.update(raw[_EXTRAS_POS])
+    return out
+
+
+@lru_cache(maxsize=256)
+def _decode_cached(raw: Tuple[int, ...]) -> Mapping[str, Any]:
+    return MappingProxyType(_decode(list(raw)))
+
+
+def meta_view(raw: Any) -> Mapping[str, Any]:
+    """Read-only mapping for a stored meta in either format. Do not mutate."""
+    if isinstance(raw, dict):
+        return raw
+    if not is_encoded(raw):
+        return _EMPTY
+    if len(raw) > _EXTRAS_POS:
+        return _decode(raw)
+    return _decode_cached(tuple(raw))
+
+
+def decode_meta(raw: Any) -> Dict[str, Any]:
+    """Plain meta dict for a stored meta in either format."""
+    return dict(meta_view(raw))
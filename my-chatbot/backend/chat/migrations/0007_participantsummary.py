@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-19 10:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_survey_caiq_panas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantSummary',
+            fields=[
+                ('participant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='chat.participant')),
+                ('sessions_completed', models.PositiveSmallIntegerField(default=0)),
+                ('total_active_seconds', models.PositiveIntegerField(default=0)),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('latest_session_number', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('latest_survey_scores', models.JSONField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'participant summaries',
+            },
+        ),
+    ]
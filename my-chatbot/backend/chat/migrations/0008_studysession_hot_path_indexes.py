@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_participantsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studysession',
+            index=models.Index(fields=['participant', 'status', 'week_index', 'slot_index'], name='chat_ss_participant_status'),
+        ),
+        migrations.AddIndex(
+            model_name='studysession',
+            index=models.Index(condition=models.Q(('status', 'in_progress')), fields=['participant', 'conversation'], name='chat_ss_in_progress_convo'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.3 on 2026-10-19 11:04
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DateTimeField, ExpressionWrapper, F
+
+
+def _wall_cap(condition):
+    # Same rule as chat.study_config at the time of this migration, inlined so
+    # later changes to live app code cannot change what the backfill computes.
+    dev_cap = int(getattr(settings, "STUDY_DEV_SESSION_CAP_SECONDS", 0) or 0)
+    if dev_cap > 0:
+        return timedelta(seconds=dev_cap)
+    if condition == "personalized":
+        minutes = getattr(settings, "STUDY_PROFILE_PERSONALIZED_MAX_SESSION_MINUTES", 20)
+    else:
+        minutes = getattr(settings, "STUDY_PROFILE_GENERIC_MAX_SESSION_MINUTES", 20)
+    return timedelta(minutes=float(minutes))
+
+
+def _plus(field, delta):
+    return ExpressionWrapper(F(field) + delta, output_field=DateTimeField())
+
+
+def backfill_in_progress_deadlines(apps, schema_editor):
+    StudySession = apps.get_model("chat", "StudySession")
+    in_progress = StudySession.objects.filter(status="in_progress", started_at__isnull=False)
+    # One UPDATE per arm; any other condition value gets the generic cap.
+    in_progress.filter(participant__condition="personalized").update(
+        wall_lock_at=_plus("started_at", _wall_cap("personalized"))
+    )
+    in_progress.exclude(participant__condition="personalized").update(
+        wall_lock_at=_plus("started_at", _wall_cap("generic"))
+    )
+    inactivity = int(getattr(settings, "STUDY_INACTIVITY_SECONDS", 600))
+    if inactivity > 0:
+        in_progress.filter(last_activity_at__isnull=False).update(
+            inactive_lock_at=_plus("last_activity_at", timedelta(seconds=inactivity))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_studysession_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studysession',
+            name='inactive_lock_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='last_activity_at + STUDY_INACTIVITY_SECONDS, moved on every touch.', null=True),
+        ),
+        migrations.AddField(
+            model_name='studysession',
+            name='wall_lock_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text="started_at + the arm's wall cap, stored at session start.", null=True),
+        ),
+        migrations.RunPython(backfill_in_progress_deadlines, migrations.RunPython.noop),
+    ]
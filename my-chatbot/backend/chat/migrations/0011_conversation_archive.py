@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 11:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationArchive',
+            fields=[
+                ('conversation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='chat.conversation')),
+                ('codec', models.CharField(choices=[('gzip', 'gzip'), ('zstd', 'zstd')], max_length=8)),
+                ('payload', models.BinaryField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('raw_bytes', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Messages moved to ConversationArchive; self.messages is empty.', null=True),
+        ),
+    ]
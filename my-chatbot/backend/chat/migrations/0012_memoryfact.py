@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_conversation_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoryFact',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('text', models.CharField(max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='memory_facts', to='chat.conversation')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memory_facts', to='chat.participant')),
+            ],
+            options={
+                'ordering': ['participant', 'created_at', 'id'],
+                'indexes': [models.Index(fields=['participant', 'created_at'], name='chat_memfact_participant')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0012_memoryfact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participant',
+            name='memory_revision',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped whenever memory facts change; keys the chat memory cache.'),
+        ),
+    ]
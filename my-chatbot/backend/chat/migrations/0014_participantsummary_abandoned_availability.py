@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-19 11:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_sessions_abandoned(apps, schema_editor):
+    StudySession = apps.get_model("chat", "StudySession")
+    ParticipantSummary = apps.get_model("chat", "ParticipantSummary")
+    by_count = {}
+    rows = (
+        StudySession.objects.filter(status="abandoned")
+        .order_by()
+        .values("participant_id")
+        .annotate(n=Count("id"))
+    )
+    for row in rows:
+        by_count.setdefault(row["n"], []).append(row["participant_id"])
+    for n, participant_ids in by_count.items():
+        ParticipantSummary.objects.filter(participant_id__in=participant_ids).update(
+            sessions_abandoned=n
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_participant_memory_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='participantsummary',
+            name='availability_week_index',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='participantsummary',
+            name='sessions_abandoned',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_sessions_abandoned, migrations.RunPython.noop),
+    ]
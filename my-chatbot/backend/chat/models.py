@@ -27,6 +27,10 @@ class Participant(models.Model):
     )
     pin_hash = models.CharField(max_length=256, blank=True)
     memory_summary = models.TextField(blank=True)
+    memory_revision = models.PositiveIntegerField(
+        default=0,
+        help_text="Bumped whenever memory facts change; keys the chat memory cache.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -50,13 +54,28 @@ class Conversation(models.Model):
         blank=True,
         related_name="conversations",
     )
+    archived_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Messages moved to ConversationArchive; self.messages is empty.",
+    )
+
+    def load_messages(self) -> list:
+        """self.messages, or the decoded archive copy for an archived conversation."""
+        if self.archived_at is None:
+            return self.messages or []
+        from .archive import decode_messages
+
+        archive = self.archive
+        return decode_messages(archive.codec, archive.payload)
 
     def recompute_audit(self, save: bool = True) -> dict:
         """
-        Recompute auditing scores from self.messages and optionally save them
-        into self.audit.
+        Recompute auditing scores from the conversation's messages and
+        optionally save them into self.audit.
         """
-        scores = audit.compute_audit(self.messages or [])
+        scores = audit.compute_audit(self.load_messages())
         self.audit = scores
         if save:
             self.save(update_fields=["audit"])
@@ -66,6 +85,32 @@ class Conversation(models.Model):
         return f"{self.user_name} - {self.character} - {self.started_at}"
 
 
+class ConversationArchive(models.Model):
+    """
+    Compressed JSON of an archived Conversation's messages (see chat/archive.py).
+    Kept out of the conversation row so the hot table stays small.
+    """
+
+    class Codec(models.TextChoices):
+        GZIP = "gzip", "gzip"
+        ZSTD = "zstd", "zstd"
+
+    conversation = models.OneToOneField(
+        Conversation,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="archive",
+    )
+    codec = models.CharField(max_length=8, choices=Codec.choices)
+    payload = models.BinaryField()
+    message_count = models.PositiveIntegerField(default=0)
+    raw_bytes = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.conversation_id} ({self.codec}, {self.message_count} messages)"
+
+
 class StudySession(models.Model):
     class Status(models.TextChoices):
         LOCKED = "locked", "Locked"
@@ -99,6 +144,18 @@ class StudySession(models.Model):
     active_seconds = models.PositiveIntegerField(default=0)
     last_activity_at = models.DateTimeField(null=True, blank=True)
     time_cap_triggered_at = models.DateTimeField(null=True, blank=True)
+    wall_lock_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="started_at + the arm's wall cap, stored at session start.",
+    )
+    inactive_lock_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="last_activity_at + STUDY_INACTIVITY_SECONDS, moved on every touch.",
+    )
     end_reason = models.CharField(max_length=40, blank=True)
     comprehension_responses = models.JSONField(null=True, blank=True)
     likert_responses = models.JSONField(null=True, blank=True)
@@ -125,6 +182,21 @@ class StudySession(models.Model):
                 name="chat_studysession_unique_participant_week_slot",
             ),
         ]
+        indexes = [
+            # get_current_study_session / study_session_start: filter by
+            # (participant, status), ordered by (week_index, slot_index).
+            models.Index(
+                fields=["participant", "status", "week_index", "slot_index"],
+                name="chat_ss_participant_status",
+            ),
+            # get_study_session_for_conversation runs on every chat turn and
+            # only ever matches the (single) in-progress row.
+            models.Index(
+                fields=["participant", "conversation"],
+                condition=models.Q(status="in_progress"),
+                name="chat_ss_in_progress_convo",
+            ),
+        ]
         ordering = ["week_index", "slot_index"]
 
     def __str__(self):
@@ -176,3 +248,95 @@ class SurveyResponse(models.Model):
 
     def __str__(self):
         return f"{self.participant_code} S{self.session_number} {self.item_id}={self.value}"
+
+
+class ParticipantSummary(models.Model):
+    """
+    Per-participant rollup of StudySession rows, kept current incrementally
+    wherever a session's status or active_seconds changes (heartbeat, survey
+    submit, lock sweep); study_services.refresh_participant_summaries rebuilds
+    it from scratch.
+
+    availability_week_index is the released week for which the participant's
+    slot availability was last recomputed by progress_dict; while it matches
+    the current release, progress can skip that step.
+    """
+
+    participant = models.OneToOneField(
+        Participant,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="summary",
+    )
+    sessions_completed = models.PositiveSmallIntegerField(default=0)
+    sessions_abandoned = models.PositiveSmallIntegerField(default=0)
+    total_active_seconds = models.PositiveIntegerField(default=0)
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+    latest_session_number = models.PositiveSmallIntegerField(null=True, blank=True)
+    latest_survey_scores = models.JSONField(null=True, blank=True)
+    availability_week_index = models.PositiveSmallIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "participant summaries"
+
+    def __str__(self):
+        return f"{self.participant_id}: {self.sessions_completed} completed"
+
+
+class MemoryFact(models.Model):
+    """
+    One short fact about a reader from an earlier session (personalized arm).
+    The chat prompt gets only the facts most relevant to the current message
+    (see chat/memory_index.py).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    participant = models.ForeignKey(
+        Participant,
+        on_delete=models.CASCADE,
+        related_name="memory_facts",
+    )
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="memory_facts",
+    )
+    text = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["participant", "created_at"], name="chat_memfact_participant"),
+        ]
+        ordering = ["participant", "created_at", "id"]
+
+    def __str__(self):
+        return f"{self.participant_id}: {self.text[:40]}"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Stored response for a write request sent with an Idempotency-Key header
+    (see chat/idempotency.py). A row with status_code=None is still running.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    scope = models.CharField(max_length=40)
+    key = models.CharField(max_length=128)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    body = models.BinaryField(blank=True, default=b"")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key"], name="chat_idempotency_scope_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} {self.status_code or 'pending'}"
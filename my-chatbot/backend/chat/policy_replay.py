@@ -0,0 +1,306 @@
+"""
+Offline replay of the scaffold ladder over stored transcripts.
+
+Re-runs LadderPolicy decisions for many PolicyConfig variants at once (one
+numpy lane per config) and reports how tailoring_score / adaptivity_index
+would have changed against the stored audits.
+
+Replay assumptions:
+- each conversation starts from a fresh LadderPolicy;
+- the policy decision made for a child message is applied to the next agent
+  message; agent messages with no preceding child message (e.g. the greeting)
+  keep their stored ladder_step / stance;
+- replayed moves carry no logged stance, so the ladder is mapped onto the audit
+  stance scale (NUDGE -> QUIET, REFLECT -> RESPONSIVE, ANALOGY/MINI -> PROACTIVE).
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .audit import classify_role, compute_audit
+from .message_meta import LADDER_STEPS, STANCES, meta_view
+from .scaffold_policy import Heuristics, Move, PolicyConfig
+
+_STEP_CODES = {name: i for i, name in enumerate(LADDER_STEPS)}
+_STANCE_CODES = {name: i for i, name in enumerate(STANCES)}
+QUIET, RESPONSIVE, PROACTIVE = range(3)
+MOVE_TO_STANCE = np.array([QUIET, RESPONSIVE, PROACTIVE, PROACTIVE], dtype=np.int8)
+
+UNKNOWN = -1
+
+METRICS = ("tailoring_score", "adaptivity_index")
+
+
+def _code(table: Dict[str, int], value: Any) -> int:
+    return table.get(value, UNKNOWN) if isinstance(value, str) else UNKNOWN
+
+
+@dataclass
+class ConversationReplay:
+    """Per-config counts for one transcript (arrays have one lane per config)."""
+
+    moves: np.ndarray  # (n_replayed_agent_turns, K) Move codes
+    agent_turns: int
+    well_tailored: np.ndarray
+    stance_changes: np.ndarray
+    justified_changes: np.ndarray
+
+    def metrics(self) -> Dict[str, np.ndarray]:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tailoring = (
+                self.well_tailored / self.agent_turns
+                if self.agent_turns
+                else np.full(self.well_tailored.shape, np.nan)
+            )
+            adaptivity = np.where(
+                self.stance_changes > 0,
+                self.justified_changes / np.maximum(self.stance_changes, 1),
+                np.nan,
+            )
+        return {"tailoring_score": tailoring, "adaptivity_index": adaptivity}
+
+
+@dataclass
+class ReplayReport:
+    configs: List[PolicyConfig]
+    conversations: int = 0
+    sums: Dict[str, np.ndarray] = field(default_factory=dict)
+    counts: Dict[str, np.ndarray] = field(default_factory=dict)
+    baseline_sums: Dict[str, float] = field(default_factory=dict)
+    baseline_counts: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        k = len(self.configs)
+        for m in METRICS:
+            self.sums.setdefault(m, np.zeros(k))
+            self.counts.setdefault(m, np.zeros(k, dtype=np.int64))
+            self.baseline_sums.setdefault(m, 0.0)
+            self.baseline_counts.setdefault(m, 0)
+
+    def add(self, replay: ConversationReplay, stored_audit: Dict[str, Any]) -> None:
+        self.conversations += 1
+        for m, values in replay.metrics().items():
+            ok = ~np.isnan(values)
+            self.sums[m][ok] += values[ok]
+            self.counts[m] += ok
+            base = stored_audit.get(m)
+            if base is not None:
+                self.baseline_sums[m] += float(base)
+                self.baseline_counts[m] += 1
+
+    def baseline(self) -> Dict[str, Optional[float]]:
+        return {
+            m: (self.baseline_sums[m] / self.baseline_counts[m] if self.baseline_counts[m] else None)
+            for m in METRICS
+        }
+
+    def rows(self) -> List[Dict[str, Any]]:
+        base = self.baseline()
+        out = []
+        for i, cfg in enumerate(self.configs):
+            row: Dict[str, Any] = {"config": asdict(cfg)}
+            for m in METRICS:
+                n = int(self.counts[m][i])
+                mean = float(self.sums[m][i] / n) if n else None
+                row[m] = mean
+                row[f"delta_{m}"] = (
+                    mean - base[m] if mean is not None and base[m] is not None else None
+                )
+            out.append(row)
+        return out
+
+
+class PolicyReplay:
+    def __init__(self, configs: Sequence[PolicyConfig], scorer: Any = None):
+        if not configs:
+            raise ValueError("at least one PolicyConfig is required")
+        self.configs = list(configs)
+        self.scorer = scorer or Heuristics
+        self.confusion_th = np.array([c.confusion_threshold for c in self.configs])
+        self.success_th = np.array([c.success_threshold for c in self.configs])
+        self.window = np.array([c.window for c in self.configs], dtype=np.int64)
+        self.stuck_allow = np.array(
+            [c.allow_explanation_if_stuck_rounds for c in self.configs], dtype=np.int64
+        )
+        self.max_window = int(self.window.max())
+
+    def _score_texts(self, texts: List[str]) -> np.ndarray:
+        model = getattr(self.scorer, "model", None)
+        if model is not None and hasattr(model, "predict_batch"):
+            return model.predict_batch(texts)
+        return np.array(
+            [(self.scorer.confusion_score(t), self.scorer.success_score(t)) for t in texts],
+            dtype=np.float64,
+        ).reshape(len(texts), 2)
+
+    def _climbed(
+        self, positions: List[int], columns: List[np.ndarray], n_entries: int
+    ) -> np.ndarray:
+        """Vectorized LadderPolicy._climbed_sequentially over each config's window."""
+        k = len(self.configs)
+        idx = np.zeros(k, dtype=np.int64)
+        done = np.zeros(k, dtype=bool)
+        first = n_entries - self.max_window
+        for pos, moves in zip(positions, columns):
+            if pos < first:
+                continue
+            in_window = pos >= n_entries - self.window
+            match = in_window & (moves == idx)
+            done |= match & (idx == Move.ANALOGY)
+            idx = np.where(match & (idx < Move.ANALOGY), idx + 1, idx)
+        return done
+
+    def replay_messages(self, messages: Iterable[Dict[str, Any]]) -> ConversationReplay:
+        k = len(self.configs)
+        msgs = [(classify_role(m), m) for m in messages or []]
+        child_texts = [m.get("content") or "" for role, m in msgs if role == "child"]
+        scores = self._score_texts(child_texts) if child_texts else np.zeros((0, 2))
+
+        last = np.zeros(k, dtype=np.int64)
+        stuck = np.zeros(k, dtype=np.int64)
+        # Policy history is shared in shape across configs: only assistant move values differ.
+        n_entries = 0
+        positions: List[int] = []
+        columns: List[np.ndarray] = []
+        pending: Optional[np.ndarray] = None
+
+        replayed: List[np.ndarray] = []
+        agent_turns = 0
+        well_tailored = np.zeros(k, dtype=np.int64)
+        stance_changes = np.zeros(k, dtype=np.int64)
+        justified = np.zeros(k, dtype=np.int64)
+        prev_child: Optional[Tuple[str, str]] = None
+        prev_stance: Optional[np.ndarray] = None
+        child_i = 0
+
+        for role, msg in msgs:
+            meta = meta_view(msg.get("meta"))
+            if role == "child":
+                confusion_p, success_p = scores[child_i]
+                child_i += 1
+                n_entries += 1  # child turn
+                up = np.minimum(last + 1, Move.MINI_EXPLANATION)
+                down = np.maximum(last - 1, Move.NUDGE)
+                succ = success_p >= self.success_th
+                conf = ~succ & (confusion_p >= self.confusion_th)
+                new = np.where(conf, up, down)
+                stuck = np.where(
+                    conf,
+                    np.where(
+                        (last == Move.REFLECT) | (last == Move.ANALOGY),
+                        stuck + 1,
+                        (up > last).astype(np.int64),
+                    ),
+                    0,
+                )
+                top = new == Move.MINI_EXPLANATION
+                if top.any():
+                    climbed = self._climbed(positions, columns, n_entries)
+                    new = np.where(top & ~climbed & (stuck < self.stuck_allow), Move.ANALOGY, new)
+                last = new
+                pending = new
+                n_entries += 1  # system decision turn
+                prev_child = (
+                    meta.get("confusion_signal", "NONE"),
+                    meta.get("autonomy_signal", "NONE"),
+                )
+            elif role == "agent":
+                if pending is not None:
+                    step = pending
+                    stance = MOVE_TO_STANCE[step]
+                    positions.append(n_entries)
+                    columns.append(step)
+                    n_entries += 1
+                    replayed.append(step)
+                    pending = None
+                else:
+                    step_name = meta.get("ladder_step") or meta.get("move") or "NUDGE"
+                    step = np.full(k, _code(_STEP_CODES, step_name), dtype=np.int64)
+                    stance = np.full(
+                        k, _code(_STANCE_CODES, meta.get("stance", "RESPONSIVE")), dtype=np.int64
+                    )
+                agent_turns += 1
+                well_tailored += self._well_tailored(prev_child, step)
+                if prev_stance is not None:
+                    changed = prev_stance != stance
+                    stance_changes += changed
+                    justified += changed & self._justified(prev_child, prev_stance, stance)
+                prev_stance = stance
+
+        moves = np.vstack(replayed) if replayed else np.zeros((0, k), dtype=np.int64)
+        return ConversationReplay(
+            moves=moves,
+            agent_turns=agent_turns,
+            well_tailored=well_tailored,
+            stance_changes=stance_changes,
+            justified_changes=justified,
+        )
+
+    @staticmethod
+    def _well_tailored(prev_child: Optional[Tuple[str, str]], step: np.ndarray) -> np.ndarray:
+        """Vectorized audit.is_well_tailored."""
+        if prev_child is None:
+            return np.ones(step.shape, dtype=bool)
+        confusion, autonomy = prev_child
+        if autonomy == "HIGH":
+            return step == Move.NUDGE
+        if confusion == "HIGH":
+            return (step == Move.ANALOGY) | (step == Move.MINI_EXPLANATION)
+        if confusion == "LOW":
+            return (step == Move.REFLECT) | (step == Move.ANALOGY)
+        return (step == Move.NUDGE) | (step == Move.REFLECT)
+
+    @staticmethod
+    def _justified(
+        prev_child: Optional[Tuple[str, str]], prev: np.ndarray, curr: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized audit.is_justified_stance_change."""
+        if prev_child is None:
+            return np.ones(curr.shape, dtype=bool)
+        confusion, autonomy = prev_child
+        out = np.ones(curr.shape, dtype=bool)
+        if autonomy == "HIGH":
+            backed_off = (prev == PROACTIVE) & ((curr == RESPONSIVE) | (curr == QUIET))
+            out = np.where(backed_off, True, curr != PROACTIVE)
+        if confusion == "HIGH":
+            escalated = ((prev == QUIET) | (prev == RESPONSIVE)) & (curr == PROACTIVE)
+            out = out | escalated
+        return out
+
+
+def config_grid(**values: Sequence[Any]) -> List[PolicyConfig]:
+    """Cartesian product of PolicyConfig field values, e.g. config_grid(window=[4, 6])."""
+    from itertools import product
+
+    names = list(values)
+    return [PolicyConfig(**dict(zip(names, combo))) for combo in product(*values.values())]
+
+
+def replay_corpus(
+    configs: Sequence[PolicyConfig],
+    queryset=None,
+    scorer: Any = None,
+    chunk_size: int = 500,
+) -> ReplayReport:
+    """Stream stored transcripts and aggregate replayed audit metrics per config."""
+    from .archive import ARCHIVE_FIELDS, messages_from_row
+    from .models import Conversation
+
+    engine = PolicyReplay(configs, scorer=scorer)
+    report = ReplayReport(configs=list(configs))
+    qs = queryset if queryset is not None else Conversation.objects.all()
+    rows = (
+        qs.order_by()
+        .values_list("messages", "audit", *ARCHIVE_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for messages, stored, codec, payload in rows:
+        messages = messages_from_row(messages, codec, payload)
+        if not messages:
+            continue
+        replay = engine.replay_messages(messages)
+        report.add(replay, stored or compute_audit(messages))
+    return report
@@ -70,9 +70,12 @@ class LadderState:
     stuck_rounds: int = 0            # consecutive rounds with confusion
 
 class LadderPolicy:
-    def __init__(self, config: Optional[PolicyConfig] = None):
+    def __init__(self, config: Optional[PolicyConfig] = None, scorer: Any = None):
         self.cfg = config or PolicyConfig()
         self.state = LadderState()
+        # Anything with confusion_score(text) / success_score(text), e.g.
+        # signal_classifier.ClassifierScorer; defaults to the regex Heuristics.
+        self.scorer = scorer or Heuristics
 
     def _recent_child_text(self) -> str:
         # Return the most recent child utterance (within window), else ''
@@ -146,8 +149,8 @@ class LadderPolicy:
         self.state.history.append(Turn(role='child', content=child_utterance))
 
         last_move = self.state.last_move
-        confusion_p = Heuristics.confusion_score(child_utterance)
-        success_p = Heuristics.success_score(child_utterance)
+        confusion_p = self.scorer.confusion_score(child_utterance)
+        success_p = self.scorer.success_score(child_utterance)
         move, reason = self._choose_next_move(last_move, confusion_p, success_p)
 
         # Save placeholder (assistant turn will be appended in .log_assistant)
@@ -179,7 +182,7 @@ class LadderPolicy:
                         })
                     # No chatter during self-initiated flow: if last child success was high, the next move shouldn't escalate
                     child_text = self._recent_child_text()
-                    success_p = Heuristics.success_score(child_text)
+                    success_p = self.scorer.success_score(child_text)
                     if success_p >= self.cfg.success_threshold and t.move > last_move:
                         violations.append({
                             'type': 'unnecessary_escalation',
@@ -0,0 +1,238 @@
+"""
+Local confusion/success classifier for the scaffold ladder.
+
+A hashed n-gram logistic model (two heads: confusion, success) trained from
+annotated Conversation.messages meta (confusion_signal / autonomy_signal).
+CPU-only, no network call: drop-in replacement for Heuristics in LadderPolicy.
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .audit import classify_role
+from .message_meta import meta_view
+from .scaffold_policy import Heuristics
+
+CONFUSION = 0
+SUCCESS = 1
+
+DEFAULT_N_FEATURES = 2 ** 14
+
+_TOKEN_RE = re.compile(r"[\w']+|[?!]", re.UNICODE)
+
+# Soft targets from the annotation vocabulary used by the frontend / audit.
+CONFUSION_TARGETS = {"HIGH": 1.0, "LOW": 0.5, "NONE": 0.0}
+AUTONOMY_TARGETS = {"HIGH": 1.0, "LOW": 0.5, "NONE": 0.0}
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _bucket(feature: str, n_features: int) -> int:
+    # crc32 is stable across processes (unlike hash()), so saved models stay valid.
+    return zlib.crc32(feature.encode("utf-8")) % n_features
+
+
+def featurize(text: str, n_features: int = DEFAULT_N_FEATURES) -> Dict[int, float]:
+    """Hashed unigram + bigram counts plus a few shape features."""
+    tokens = tokenize(text)
+    feats: Dict[int, float] = {}
+    grams = list(tokens)
+    grams.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    if not tokens:
+        grams.append("__empty__")
+    elif len(tokens) <= 2:
+        grams.append("__short__")
+    elif len(tokens) >= 8:
+        grams.append("__long__")
+    if (text or "").rstrip().endswith("?"):
+        grams.append("__ends_q__")
+    for g in grams:
+        i = _bucket(g, n_features)
+        feats[i] = feats.get(i, 0.0) + 1.0
+    return feats
+
+
+def _csr(texts: Sequence[str], n_features: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack texts into (indices, values, row_ids) flat arrays."""
+    indices: List[int] = []
+    values: List[float] = []
+    rows: List[int] = []
+    for r, text in enumerate(texts):
+        for i, v in featurize(text, n_features).items():
+            indices.append(i)
+            values.append(v)
+            rows.append(r)
+    return (
+        np.asarray(indices, dtype=np.int64),
+        np.asarray(values, dtype=np.float64),
+        np.asarray(rows, dtype=np.int64),
+    )
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30.0, 30.0)))
+
+
+@dataclass
+class SignalClassifier:
+    weights: np.ndarray  # (2, n_features)
+    bias: np.ndarray  # (2,)
+
+    @property
+    def n_features(self) -> int:
+        return int(self.weights.shape[1])
+
+    @classmethod
+    def empty(cls, n_features: int = DEFAULT_N_FEATURES) -> "SignalClassifier":
+        return cls(
+            weights=np.zeros((2, n_features), dtype=np.float64),
+            bias=np.zeros(2, dtype=np.float64),
+        )
+
+    def predict(self, text: str) -> Tuple[float, float]:
+        """(confusion_p, success_p) for a single utterance."""
+        feats = featurize(text, self.n_features)
+        if feats:
+            idx = np.fromiter(feats.keys(), dtype=np.int64, count=len(feats))
+            val = np.fromiter(feats.values(), dtype=np.float64, count=len(feats))
+            z = self.bias + self.weights[:, idx] @ val
+        else:
+            z = self.bias
+        p = _sigmoid(z)
+        return float(p[CONFUSION]), float(p[SUCCESS])
+
+    def predict_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """Vectorized inference: returns an (n, 2) array of [confusion_p, success_p]."""
+        n = len(texts)
+        if n == 0:
+            return np.zeros((0, 2), dtype=np.float64)
+        idx, val, rows = _csr(texts, self.n_features)
+        return _sigmoid(self._logits(idx, val, rows, n))
+
+    def _logits(self, idx: np.ndarray, val: np.ndarray, rows: np.ndarray, n: int) -> np.ndarray:
+        z = np.empty((n, 2), dtype=np.float64)
+        for head in (CONFUSION, SUCCESS):
+            z[:, head] = self.bias[head] + np.bincount(
+                rows, weights=self.weights[head, idx] * val, minlength=n
+            )
+        return z
+
+    def fit(
+        self,
+        texts: Sequence[str],
+        targets: np.ndarray,
+        epochs: int = 40,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+    ) -> "SignalClassifier":
+        """
+        Full-batch gradient descent on the logistic loss.
+        targets: (n, 2) array in [0, 1]; NaN marks an unlabeled head for that row.
+        """
+        n = len(texts)
+        if n == 0:
+            return self
+        targets = np.asarray(targets, dtype=np.float64).reshape(n, 2)
+        mask = ~np.isnan(targets)
+        y = np.where(mask, targets, 0.0)
+        counts = np.maximum(mask.sum(axis=0), 1)
+        idx, val, rows = _csr(texts, self.n_features)
+        for _ in range(epochs):
+            err = (_sigmoid(self._logits(idx, val, rows, n)) - y) * mask / counts
+            grad_w = np.empty_like(self.weights)
+            # scatter-add err[row] * value into each head's weight vector
+            for head in (CONFUSION, SUCCESS):
+                grad_w[head] = np.bincount(
+                    idx, weights=err[rows, head] * val, minlength=self.n_features
+                )
+            grad_w += l2 * self.weights
+            self.weights -= learning_rate * grad_w
+            self.bias -= learning_rate * err.sum(axis=0)
+        return self
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as fh:
+            np.savez_compressed(fh, weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> "SignalClassifier":
+        with np.load(path) as data:
+            return cls(
+                weights=data["weights"].astype(np.float64),
+                bias=data["bias"].astype(np.float64),
+            )
+
+
+class ClassifierScorer:
+    """
+    Adapts SignalClassifier to the Heuristics interface used by LadderPolicy.
+    plan() asks for confusion and success on the same text, so the last
+    prediction is memoized.
+    """
+
+    def __init__(self, model: SignalClassifier):
+        self.model = model
+        self._last: Optional[Tuple[str, Tuple[float, float]]] = None
+
+    def _scores(self, text: str) -> Tuple[float, float]:
+        if self._last is not None and self._last[0] == text:
+            return self._last[1]
+        scores = self.model.predict(text)
+        self._last = (text, scores)
+        return scores
+
+    def confusion_score(self, text: str) -> float:
+        return self._scores(text)[CONFUSION]
+
+    def success_score(self, text: str) -> float:
+        return self._scores(text)[SUCCESS]
+
+
+def labeled_examples(messages: Iterable[Dict[str, Any]]) -> List[Tuple[str, float, float]]:
+    """
+    Extract (text, confusion_target, success_target) from child messages whose
+    meta carries confusion_signal and/or autonomy_signal. Missing heads are NaN.
+    """
+    out: List[Tuple[str, float, float]] = []
+    for msg in messages or []:
+        if classify_role(msg) != "child":
+            continue
+        meta = meta_view(msg.get("meta"))
+        conf = CONFUSION_TARGETS.get(meta.get("confusion_signal"), float("nan"))
+        succ = AUTONOMY_TARGETS.get(meta.get("autonomy_signal"), float("nan"))
+        if np.isnan(conf) and np.isnan(succ):
+            continue
+        out.append((msg.get("content") or "", conf, succ))
+    return out
+
+
+_DEFAULT_MODEL: Dict[str, Optional[SignalClassifier]] = {}
+
+
+def get_signal_scorer():
+    """
+    Scorer for LadderPolicy: the trained classifier when
+    settings.CHAT_SIGNAL_CLASSIFIER_PATH points to a model, else Heuristics.
+    The model file is read once per process.
+    """
+    from django.conf import settings
+
+    path = getattr(settings, "CHAT_SIGNAL_CLASSIFIER_PATH", "") or ""
+    if not path:
+        return Heuristics
+    if path not in _DEFAULT_MODEL:
+        try:
+            _DEFAULT_MODEL[path] = SignalClassifier.load(path)
+        except (OSError, KeyError, ValueError):
+            _DEFAULT_MODEL[path] = None
+    model = _DEFAULT_MODEL[path]
+    if model is None:
+        return Heuristics
+    return ClassifierScorer(model)
@@ -1,14 +1,19 @@
 """
 Study arm configuration: personalized vs generic profiles.
 
-Override via environment variables (see settings.STUDY_*).
+Override via environment variables (see settings.STUDY_*). Profiles and the
+enrollment-code map are built once from settings and rebuilt when one of
+PROFILE_SETTINGS changes (override_settings) or on reload_study_config().
 """
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import FrozenSet, Optional
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
 from .models import Participant
 
@@ -21,25 +26,30 @@ class StudyProfile:
     default_character: str
 
 
+@dataclass(frozen=True)
+class StudyRegistry:
+    profiles: Dict[str, StudyProfile]
+    enrollment_codes: Dict[str, str]  # code -> Participant.Condition value
+
+
+PROFILE_SETTINGS = frozenset(
+    {
+        "STUDY_CODES_PERSONALIZED",
+        "STUDY_CODES_GENERIC",
+        "STUDY_DEV_SESSION_CAP_SECONDS",
+        "STUDY_PROFILE_PERSONALIZED_MAX_SESSION_MINUTES",
+        "STUDY_PROFILE_GENERIC_MAX_SESSION_MINUTES",
+        "STUDY_PROFILE_PERSONALIZED_DEFAULT_CHARACTER",
+        "STUDY_PROFILE_GENERIC_DEFAULT_CHARACTER",
+    }
+)
+
+
 def _codes_from_env(name: str) -> FrozenSet[str]:
     raw = getattr(settings, name, "") or ""
     return frozenset(x.strip() for x in raw.split(",") if x.strip())
 
 
-def resolve_enrollment_code(code: str) -> Optional[str]:
-    """
-    Return Participant.Condition value ('personalized' | 'generic') or None if invalid.
-    """
-    if not code or not str(code).strip():
-        return None
-    normalized = str(code).strip()
-    if normalized in _codes_from_env("STUDY_CODES_PERSONALIZED"):
-        return Participant.Condition.PERSONALIZED
-    if normalized in _codes_from_env("STUDY_CODES_GENERIC"):
-        return Participant.Condition.GENERIC
-    return None
-
-
 def _wall_minutes_for_condition(condition: str) -> float:
     dev_cap = int(getattr(settings, "STUDY_DEV_SESSION_CAP_SECONDS", 0) or 0)
     if dev_cap > 0:
@@ -51,7 +61,7 @@ def _wall_minutes_for_condition(condition: str) -> float:
     return float(getattr(settings, "STUDY_PROFILE_GENERIC_MAX_SESSION_MINUTES", 20))
 
 
-def get_profile(condition: str) -> StudyProfile:
+def _build_profile(condition: str) -> StudyProfile:
     if condition == Participant.Condition.PERSONALIZED:
         return StudyProfile(
             max_session_wall_minutes=_wall_minutes_for_condition(
@@ -75,6 +85,48 @@ def get_profile(condition: str) -> StudyProfile:
     )
 
 
+@lru_cache(maxsize=1)
+def study_registry() -> StudyRegistry:
+    codes: Dict[str, str] = {}
+    # Personalized wins if a code is listed for both arms.
+    for code in _codes_from_env("STUDY_CODES_GENERIC"):
+        codes[code] = Participant.Condition.GENERIC
+    for code in _codes_from_env("STUDY_CODES_PERSONALIZED"):
+        codes[code] = Participant.Condition.PERSONALIZED
+    return StudyRegistry(
+        profiles={c: _build_profile(c) for c in Participant.Condition.values},
+        enrollment_codes=codes,
+    )
+
+
+def reload_study_config() -> StudyRegistry:
+    study_registry.cache_clear()
+    return study_registry()
+
+
+@receiver(setting_changed)
+def _reset_study_config(*, setting, **kwargs):
+    if setting in PROFILE_SETTINGS:
+        study_registry.cache_clear()
+
+
+def resolve_enrollment_code(code: str) -> Optional[str]:
+    """
+    Return Participant.Condition value ('personalized' | 'generic') or None if invalid.
+    """
+    if not code or not str(code).strip():
+        return None
+    return study_registry().enrollment_codes.get(str(code).strip())
+
+
+def get_profile(condition: str) -> StudyProfile:
+    profiles = study_registry().profiles
+    profile = profiles.get(condition)
+    if profile is None:
+        return profiles[Participant.Condition.GENERIC]
+    return profile
+
+
 def allowed_character(condition: str, character_key: str) -> bool:
     profile = get_profile(condition)
     if not profile.allow_character_selection:
@@ -4,10 +4,13 @@ Login code generation and PIN validation for study return login.
 from __future__ import annotations
 
 import secrets
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 
 from django.conf import settings
 from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+
+from .hashers import STUDY_PIN_ALGORITHM
 
 # Unambiguous uppercase alphanumerics (no 0, O, 1, I, L)
 LOGIN_CODE_ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
@@ -47,10 +50,40 @@ def validate_pin_pair(pin: str, pin_confirm: str) -> Optional[str]:
 
 
 def hash_pin(plain: str) -> str:
-    return make_password(plain)
+    return make_password(plain, hasher=STUDY_PIN_ALGORITHM)
 
 
-def verify_pin(plain: str, pin_hash: str) -> bool:
+def verify_pin(
+    plain: str, pin_hash: str, setter: Optional[Callable[[str], None]] = None
+) -> bool:
+    """
+    Check a PIN. With `setter`, a correct PIN stored under another hasher or
+    iteration count is passed to setter(plain) so the caller can rehash it.
+    """
     if not pin_hash:
         return False
-    return check_password(plain, pin_hash)
+    return check_password(plain, pin_hash, setter=setter, preferred=STUDY_PIN_ALGORITHM)
+
+
+def _failure_key(login_code: str) -> str:
+    return f"study-login-failures:{login_code}"
+
+
+def login_locked_out(login_code: str) -> bool:
+    limit = int(getattr(settings, "STUDY_LOGIN_MAX_FAILURES", 5))
+    return limit > 0 and cache.get(_failure_key(login_code), 0) >= limit
+
+
+def record_login_failure(login_code: str) -> None:
+    window = int(getattr(settings, "STUDY_LOGIN_FAILURE_WINDOW_SECONDS", 900))
+    key = _failure_key(login_code)
+    # add() starts the window; incr() keeps its original expiry.
+    cache.add(key, 0, timeout=window)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=window)
+
+
+def clear_login_failures(login_code: str) -> None:
+    cache.delete(_failure_key(login_code))
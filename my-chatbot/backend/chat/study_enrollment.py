@@ -0,0 +1,180 @@
+"""
+Bulk (classroom) enrollment.
+
+Login codes for the whole batch are generated up front and checked against
+the database in one query, PINs are hashed in parallel, and participants,
+their StudySession rows and ParticipantSummary rows are bulk-created in one
+transaction.
+
+The management command hashes in a process pool. Inside a web request (a
+threaded ASGI worker) forking a pool is unsafe, so the staff endpoint uses a
+small thread pool instead; PBKDF2 in hashlib releases the GIL, so threads
+still hash in parallel.
+"""
+from __future__ import annotations
+
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from django.db import IntegrityError, transaction
+
+from .models import Participant, ParticipantSummary, StudySession
+from .study_config import resolve_enrollment_code
+from .study_credentials import generate_login_code, hash_pin, pin_policy, validate_pin_pair
+from .study_schedule import get_schedule
+
+# Below this many PINs the pool start-up costs more than it saves.
+POOL_MIN_PINS = 16
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class EnrollmentEntry:
+    display_name: str
+    pin: str
+
+
+@dataclass
+class EnrolledParticipant:
+    participant_id: str
+    display_name: str
+    login_code: str
+    condition: str
+
+
+def random_pin(length: Optional[int] = None) -> str:
+    n = length or pin_policy()[0]
+    return "".join(secrets.choice("0123456789") for _ in range(n))
+
+
+def generate_unique_login_codes(n: int, length: Optional[int] = None) -> List[str]:
+    """n distinct login codes not yet in use (normally a single lookup query)."""
+    codes: set = set()
+    while len(codes) < n:
+        fresh = set()
+        while len(codes) + len(fresh) < n:
+            code = generate_login_code(length)
+            if code not in codes:
+                fresh.add(code)
+        taken = set(
+            Participant.objects.filter(login_code__in=fresh).values_list("login_code", flat=True)
+        )
+        codes |= fresh - taken
+    return list(codes)
+
+
+def _init_hash_worker():
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+        django.setup()
+
+
+def hash_pins(
+    pins: Sequence[str], workers: Optional[int] = None, threads: bool = False
+) -> List[str]:
+    """
+    hash_pin() for every PIN, spread across processes for large batches
+    (or across threads with threads=True, for callers that must not fork).
+    """
+    if workers == 1 or len(pins) < POOL_MIN_PINS:
+        return [hash_pin(p) for p in pins]
+    workers = workers or os.cpu_count() or 1
+    if threads:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(hash_pin, pins))
+    chunksize = max(1, len(pins) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_hash_worker) as pool:
+        return list(pool.map(hash_pin, pins, chunksize=chunksize))
+
+
+def _sessions_for(participant: Participant, weeks: int, released: int) -> List[StudySession]:
+    # Same result as bootstrap_study_sessions + refresh_session_availability on a new participant.
+    return [
+        StudySession(
+            participant=participant,
+            week_index=w,
+            slot_index=s,
+            status=(
+                StudySession.Status.AVAILABLE
+                if (w, s) == (1, 1) and released >= 1
+                else StudySession.Status.LOCKED
+            ),
+        )
+        for w in range(1, weeks + 1)
+        for s in range(1, 4)
+    ]
+
+
+def bulk_enroll(
+    enrollment_code: str,
+    entries: Sequence[EnrollmentEntry],
+    workers: Optional[int] = None,
+    threads: bool = False,
+) -> List[EnrolledParticipant]:
+    """
+    Enroll every entry under one enrollment code. Raises ValueError on an
+    invalid code or PIN (nothing is written in that case). `workers` and
+    `threads` are passed to hash_pins().
+    """
+    code = (enrollment_code or "").strip()
+    condition = resolve_enrollment_code(code)
+    if not condition:
+        raise ValueError("Invalid enrollment code")
+    for i, entry in enumerate(entries):
+        err = validate_pin_pair(entry.pin, entry.pin)
+        if err:
+            raise ValueError(f"Entry {i + 1}: {err}")
+    if not entries:
+        return []
+
+    hashes = hash_pins([str(e.pin).strip() for e in entries], workers=workers, threads=threads)
+    schedule = get_schedule()
+    released = schedule.released_week_index()
+
+    for attempt in range(MAX_ATTEMPTS):
+        login_codes = generate_unique_login_codes(len(entries))
+        participants = [
+            Participant(
+                condition=condition,
+                display_name=(entry.display_name or "").strip()[:100],
+                enrollment_code_used=code,
+                auth_token=secrets.token_urlsafe(32),
+                login_code=login_code,
+                pin_hash=pin_hash,
+            )
+            for entry, login_code, pin_hash in zip(entries, login_codes, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                Participant.objects.bulk_create(participants, batch_size=500)
+                StudySession.objects.bulk_create(
+                    [
+                        ss
+                        for p in participants
+                        for ss in _sessions_for(p, schedule.total_weeks, released)
+                    ],
+                    batch_size=1000,
+                )
+                ParticipantSummary.objects.bulk_create(
+                    [ParticipantSummary(participant=p) for p in participants], batch_size=500
+                )
+            break
+        except IntegrityError:
+            # A concurrent registration took one of the codes; draw a new batch.
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+    return [
+        EnrolledParticipant(
+            participant_id=str(p.id),
+            display_name=p.display_name,
+            login_code=p.login_code,
+            condition=p.condition,
+        )
+        for p in participants
+    ]
@@ -0,0 +1,220 @@
+"""
+Server-sent events for a participant's study session state.
+
+The stream wakes at the earliest stored deadline (wall_lock_at,
+inactive_lock_at, next week release) or after the keepalive interval,
+whichever comes first, re-reads state with one query and emits:
+
+    state           first message: full snapshot
+    time-remaining  {studySessionId, secondsUntilLock, wallLockAt}
+    lock            {studySessionId, lockReason}
+    unlock          {studySessionId}
+    week-release    {releasedWeekIndex, nextReleaseAt}
+
+Streams close after STUDY_EVENTS_MAX_SECONDS; EventSource reconnects on its own.
+Each poll closes its database connection (poll_session_state), so an open
+stream does not hold one between polls.
+
+EventSource cannot send an Authorization header, so the URL carries a
+short-lived signed stream token (issue_stream_token, ?stream=) instead of the
+participant's long-lived bearer token, which would otherwise end up in access
+and proxy logs. The stream token is bound to the current bearer token, so a
+login that rotates it also invalidates outstanding stream tokens.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.utils import timezone
+
+from .models import Participant, StudySession
+from .study_schedule import get_schedule
+from .study_services import chat_should_lock, seconds_until_wall_lock
+
+RETRY_MILLISECONDS = 5000
+# Never spin faster than this, even if a deadline is already due.
+MIN_SLEEP_SECONDS = 0.5
+STREAM_TOKEN_SALT = "chat.study_events.stream"
+
+
+def stream_token_ttl() -> int:
+    return int(getattr(settings, "STUDY_EVENTS_TOKEN_TTL_SECONDS", 60))
+
+
+def _auth_fingerprint(participant: Participant) -> str:
+    return hashlib.sha256(participant.auth_token.encode()).hexdigest()[:16]
+
+
+def issue_stream_token(participant: Participant) -> str:
+    return signing.TimestampSigner(salt=STREAM_TOKEN_SALT).sign_object(
+        [str(participant.id), _auth_fingerprint(participant)]
+    )
+
+
+def participant_from_stream_token(token: Optional[str]) -> Optional[Participant]:
+    """Participant for a stream token younger than STUDY_EVENTS_TOKEN_TTL_SECONDS, else None."""
+    if not token:
+        return None
+    try:
+        pid, fingerprint = signing.TimestampSigner(salt=STREAM_TOKEN_SALT).unsign_object(
+            token, max_age=stream_token_ttl()
+        )
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    participant = Participant.objects.filter(id=pid).first()
+    if participant is None or _auth_fingerprint(participant) != fingerprint:
+        return None
+    return participant
+
+
+@dataclass(frozen=True)
+class SessionState:
+    session_id: Optional[str]
+    lock_reason: Optional[str]
+    seconds_until_lock: Optional[int]
+    wall_lock_at: Optional[datetime]
+    inactive_lock_at: Optional[datetime]
+    released_week_index: int
+    next_release_at: Optional[datetime]
+
+    def wake_at(self) -> Optional[datetime]:
+        deadlines = [self.next_release_at]
+        if self.session_id and not self.lock_reason:
+            deadlines += [self.wall_lock_at, self.inactive_lock_at]
+        deadlines = [d for d in deadlines if d is not None]
+        return min(deadlines) if deadlines else None
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def session_state(participant: Participant, now: Optional[datetime] = None) -> SessionState:
+    now = now or timezone.now()
+    schedule = get_schedule()
+    ss = (
+        StudySession.objects.filter(
+            participant=participant, status=StudySession.Status.IN_PROGRESS
+        )
+        .order_by("week_index", "slot_index")
+        .first()
+    )
+    return SessionState(
+        session_id=str(ss.id) if ss else None,
+        lock_reason=chat_should_lock(ss, participant) if ss else None,
+        seconds_until_lock=seconds_until_wall_lock(ss, participant) if ss else None,
+        wall_lock_at=ss.wall_lock_at if ss else None,
+        inactive_lock_at=ss.inactive_lock_at if ss else None,
+        released_week_index=schedule.released_week_index(now),
+        next_release_at=schedule.next_release_at(now),
+    )
+
+
+def poll_session_state(participant: Participant) -> SessionState:
+    """
+    session_state() for one stream poll, then close this thread's DB
+    connection. A stream lives for minutes and its request-finished signal
+    only fires at the end, so without this every connected child would hold
+    a database connection for the whole stream.
+    """
+    try:
+        return session_state(participant)
+    finally:
+        # Never inside a caller's transaction (e.g. a test case's atomic block).
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def diff_events(
+    prev: Optional[SessionState], curr: SessionState
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Events that take a client from `prev` to `curr` (prev=None: initial snapshot)."""
+    if prev is None:
+        return [
+            (
+                "state",
+                {
+                    "studySessionId": curr.session_id,
+                    "sessionLocked": curr.lock_reason is not None,
+                    "lockReason": curr.lock_reason,
+                    "secondsUntilLock": curr.seconds_until_lock,
+                    "wallLockAt": _iso(curr.wall_lock_at),
+                    "releasedWeekIndex": curr.released_week_index,
+                    "nextReleaseAt": _iso(curr.next_release_at),
+                },
+            )
+        ]
+
+    events: List[Tuple[str, Dict[str, Any]]] = []
+    if curr.released_week_index > prev.released_week_index:
+        events.append(
+            (
+                "week-release",
+                {
+                    "releasedWeekIndex": curr.released_week_index,
+                    "nextReleaseAt": _iso(curr.next_release_at),
+                },
+            )
+        )
+    was_locked = prev.lock_reason if prev.session_id == curr.session_id else None
+    if prev.session_id and prev.session_id != curr.session_id:
+        events.append(("unlock", {"studySessionId": prev.session_id}))
+    if curr.lock_reason and curr.lock_reason != was_locked:
+        events.append(
+            ("lock", {"studySessionId": curr.session_id, "lockReason": curr.lock_reason})
+        )
+    elif was_locked and not curr.lock_reason:
+        events.append(("unlock", {"studySessionId": curr.session_id}))
+    if curr.session_id and not curr.lock_reason:
+        events.append(
+            (
+                "time-remaining",
+                {
+                    "studySessionId": curr.session_id,
+                    "secondsUntilLock": curr.seconds_until_lock,
+                    "wallLockAt": _iso(curr.wall_lock_at),
+                },
+            )
+        )
+    return events
+
+
+def format_event(name: str, data: Dict[str, Any]) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(participant: Participant) -> AsyncIterator[str]:
+    keepalive = float(getattr(settings, "STUDY_EVENTS_KEEPALIVE_SECONDS", 15))
+    max_seconds = float(getattr(settings, "STUDY_EVENTS_MAX_SECONDS", 300))
+    loop = asyncio.get_running_loop()
+    closes_at = loop.time() + max_seconds
+    read_state = sync_to_async(poll_session_state)
+
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    prev: Optional[SessionState] = None
+    while True:
+        state = await read_state(participant)
+        events = diff_events(prev, state)
+        for name, data in events:
+            yield format_event(name, data)
+        if not events:
+            yield ": keepalive\n\n"
+        prev = state
+
+        remaining = closes_at - loop.time()
+        if remaining <= 0:
+            return
+        delay = min(keepalive, remaining)
+        wake_at = state.wake_at()
+        if wake_at is not None:
+            delay = min(delay, (wake_at - timezone.now()).total_seconds())
+        await asyncio.sleep(max(delay, MIN_SLEEP_SECONDS))
@@ -0,0 +1,103 @@
+"""
+Study calendar: which weeks are released and when the next one unlocks.
+
+The schedule is parsed from settings (STUDY_TIMEZONE, STUDY_START_DATE,
+STUDY_TOTAL_WEEKS) once and reused; it is rebuilt when those settings change
+(override_settings in tests) or when reload_schedule() is called.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, tzinfo
+from functools import lru_cache
+from typing import Optional
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+SCHEDULE_SETTINGS = frozenset({"STUDY_TIMEZONE", "STUDY_START_DATE", "STUDY_TOTAL_WEEKS"})
+
+WEEK = timedelta(days=7)
+
+
+def _study_tz(name: str) -> tzinfo:
+    try:
+        import zoneinfo
+
+        return zoneinfo.ZoneInfo(name)
+    except Exception:
+        return timezone.utc
+
+
+def _start_of(date_str: str, tz: tzinfo) -> datetime:
+    try:
+        y, m, d = (int(x) for x in date_str.split("-", 2))
+        return datetime(y, m, d, 0, 0, 0, tzinfo=tz)
+    except Exception:
+        return datetime(2026, 1, 1, 0, 0, 0, tzinfo=tz)
+
+
+@dataclass(frozen=True)
+class StudySchedule:
+    tz: tzinfo
+    start: datetime
+    total_weeks: int
+
+    @classmethod
+    def from_settings(cls) -> "StudySchedule":
+        tz = _study_tz(getattr(settings, "STUDY_TIMEZONE", "UTC"))
+        return cls(
+            tz=tz,
+            start=_start_of(getattr(settings, "STUDY_START_DATE", "2026-01-01"), tz),
+            total_weeks=max(1, int(getattr(settings, "STUDY_TOTAL_WEEKS", 3))),
+        )
+
+    def now(self) -> datetime:
+        return timezone.now().astimezone(self.tz)
+
+    def released_week_index(self, now: Optional[datetime] = None) -> int:
+        """
+        1-based week index of the last released study week.
+        0 = before study start, no weeks released.
+        """
+        now = (now or timezone.now()).astimezone(self.tz)
+        if now < self.start:
+            return 0
+        return (now.date() - self.start.date()).days // 7 + 1
+
+    def week_start(self, week_index: int) -> datetime:
+        """Local midnight on which `week_index` (1-based) is released."""
+        # Aware + timedelta is wall-clock arithmetic, so DST shifts keep midnight.
+        return self.start + (week_index - 1) * WEEK
+
+    def next_release_at(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """When the next study week unlocks, or None once every week is out."""
+        released = self.released_week_index(now)
+        if released >= self.total_weeks:
+            return None
+        return self.week_start(released + 1)
+
+    def seconds_until_next_release(self, now: Optional[datetime] = None) -> Optional[int]:
+        now = now or timezone.now()
+        nxt = self.next_release_at(now)
+        if nxt is None:
+            return None
+        return max(0, int((nxt - now).total_seconds()))
+
+
+@lru_cache(maxsize=1)
+def get_schedule() -> StudySchedule:
+    return StudySchedule.from_settings()
+
+
+def reload_schedule() -> StudySchedule:
+    get_schedule.cache_clear()
+    return get_schedule()
+
+
+@receiver(setting_changed)
+def _reset_schedule(*, setting, **kwargs):
+    if setting in SCHEDULE_SETTINGS:
+        get_schedule.cache_clear()
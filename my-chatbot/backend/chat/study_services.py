@@ -4,15 +4,22 @@ Study schedule unlocking, session wall-clock lock, and personalized memory updat
 from __future__ import annotations
 
 import os
-from datetime import datetime
+import re
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 from django.conf import settings
-from django.db.models import F
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
 
-from .models import Conversation, Participant, StudySession
+from .memory_index import MemoryIndex
+from .models import Conversation, MemoryFact, Participant, ParticipantSummary, StudySession
 from .study_config import get_profile
+from .study_schedule import get_schedule
 from .caiq_panas_items import (
     linear_session_number,
     survey_version_for_session,
@@ -29,31 +36,12 @@ def participant_from_token(token: Optional[str]) -> Optional[Participant]:
 
 
 def study_now():
-    tz_name = getattr(settings, "STUDY_TIMEZONE", "UTC")
-    try:
-        import zoneinfo
-
-        tz = zoneinfo.ZoneInfo(tz_name)
-    except Exception:
-        tz = timezone.utc
-    return timezone.now().astimezone(tz)
+    return get_schedule().now()
 
 
 def study_start_datetime() -> datetime:
     """Timezone-aware start of the study in the study timezone."""
-    tz_name = getattr(settings, "STUDY_TIMEZONE", "UTC")
-    try:
-        import zoneinfo
-
-        tz = zoneinfo.ZoneInfo(tz_name)
-    except Exception:
-        tz = timezone.utc
-    date_str = getattr(settings, "STUDY_START_DATE", "2026-01-01")
-    try:
-        y, m, d = (int(x) for x in date_str.split("-", 2))
-        return datetime(y, m, d, 0, 0, 0, tzinfo=tz)
-    except Exception:
-        return datetime(2026, 1, 1, 0, 0, 0, tzinfo=tz)
+    return get_schedule().start
 
 
 def released_week_index() -> int:
@@ -61,16 +49,11 @@ def released_week_index() -> int:
     1-based week index of the last released study week.
     0 = before study start, no weeks released.
     """
-    now = study_now()
-    start = study_start_datetime()
-    if now < start:
-        return 0
-    delta_days = (now.date() - start.date()).days
-    return delta_days // 7 + 1
+    return get_schedule().released_week_index()
 
 
 def total_study_weeks() -> int:
-    return max(1, int(getattr(settings, "STUDY_TOTAL_WEEKS", 3)))
+    return get_schedule().total_weeks
 
 
 def bootstrap_study_sessions(participant: Participant) -> None:
@@ -105,27 +88,35 @@ def ordered_sessions(participant: Participant):
     )
 
 
-def refresh_session_availability(participant: Participant) -> None:
+def refresh_session_availability(
+    participant: Participant,
+    released: Optional[int] = None,
+    slots: Optional[List[StudySession]] = None,
+) -> List[StudySession]:
     """
     Apply calendar week release + strict sequential completion.
+
+    Returns the participant's sessions in (week, slot) order with statuses
+    already updated, so callers can build progress without re-reading them.
+    Pass `slots` to reuse rows the caller has already loaded.
     """
-    released = released_week_index()
-    slots = ordered_sessions(participant)
+    if released is None:
+        released = released_week_index()
+    if slots is None:
+        slots = ordered_sessions(participant)
     prev_all_completed = True
+    changed: List[StudySession] = []
 
     for ss in slots:
-        if ss.status == StudySession.Status.COMPLETED:
+        # An abandoned session can no longer be resumed; let the schedule move past it.
+        if ss.status in (StudySession.Status.COMPLETED, StudySession.Status.ABANDONED):
             prev_all_completed = True
             continue
 
         if ss.week_index > released:
-            if ss.status not in (
-                StudySession.Status.IN_PROGRESS,
-                StudySession.Status.COMPLETED,
-            ):
-                if ss.status == StudySession.Status.AVAILABLE:
-                    ss.status = StudySession.Status.LOCKED
-                    ss.save(update_fields=["status"])
+            if ss.status == StudySession.Status.AVAILABLE:
+                ss.status = StudySession.Status.LOCKED
+                changed.append(ss)
             prev_all_completed = False
             continue
 
@@ -136,12 +127,16 @@ def refresh_session_availability(participant: Participant) -> None:
         if prev_all_completed:
             if ss.status == StudySession.Status.LOCKED:
                 ss.status = StudySession.Status.AVAILABLE
-                ss.save(update_fields=["status"])
+                changed.append(ss)
             prev_all_completed = False
         else:
             if ss.status == StudySession.Status.AVAILABLE:
                 ss.status = StudySession.Status.LOCKED
-                ss.save(update_fields=["status"])
+                changed.append(ss)
+
+    if changed:
+        StudySession.objects.bulk_update(changed, ["status"])
+    return slots
 
 
 def _session_cap_seconds(participant: Participant) -> int:
@@ -149,6 +144,29 @@ def _session_cap_seconds(participant: Participant) -> int:
     return profile.max_session_wall_minutes * 60
 
 
+def _inactivity_seconds() -> int:
+    return int(getattr(settings, "STUDY_INACTIVITY_SECONDS", 600))
+
+
+def _inactive_deadline(last_activity: datetime) -> Optional[datetime]:
+    threshold = _inactivity_seconds()
+    if threshold <= 0:
+        return None
+    return last_activity + timedelta(seconds=threshold)
+
+
+def set_lock_deadlines(ss: StudySession, participant: Participant, now: datetime) -> List[str]:
+    """
+    Mark `ss` started at `now` and store its lock deadlines; returns the
+    update_fields to save.
+    """
+    ss.started_at = now
+    ss.last_activity_at = now
+    ss.wall_lock_at = now + timedelta(seconds=_session_cap_seconds(participant))
+    ss.inactive_lock_at = _inactive_deadline(now)
+    return ["started_at", "last_activity_at", "wall_lock_at", "inactive_lock_at"]
+
+
 def wall_elapsed_seconds(ss: StudySession) -> float:
     if not ss.started_at or ss.status != StudySession.Status.IN_PROGRESS:
         return 0.0
@@ -158,6 +176,9 @@ def wall_elapsed_seconds(ss: StudySession) -> float:
 def is_wall_locked(ss: StudySession, participant: Participant) -> bool:
     if ss.status != StudySession.Status.IN_PROGRESS or not ss.started_at:
         return False
+    if ss.wall_lock_at:
+        return timezone.now() >= ss.wall_lock_at
+    # Sessions started before deadlines were stored.
     return wall_elapsed_seconds(ss) >= _session_cap_seconds(participant)
 
 
@@ -169,10 +190,12 @@ def mark_time_cap_triggered(ss: StudySession) -> None:
 
 
 def is_inactivity_locked(ss: StudySession) -> bool:
-    threshold = int(getattr(settings, "STUDY_INACTIVITY_SECONDS", 600))
-    if threshold <= 0:
+    if ss.status != StudySession.Status.IN_PROGRESS:
         return False
-    if ss.status != StudySession.Status.IN_PROGRESS or not ss.last_activity_at:
+    if ss.inactive_lock_at:
+        return timezone.now() >= ss.inactive_lock_at
+    threshold = _inactivity_seconds()
+    if threshold <= 0 or not ss.last_activity_at:
         return False
     return (timezone.now() - ss.last_activity_at).total_seconds() >= threshold
 
@@ -181,6 +204,9 @@ def chat_should_lock(ss: StudySession, participant: Participant) -> Optional[str
     """Return lock reason ('time_cap' | 'inactive_timeout') or None."""
     if ss.status != StudySession.Status.IN_PROGRESS:
         return None
+    # The wall cap never relaxes, so a stamp (from here or sweep_session_locks) is final.
+    if ss.time_cap_triggered_at:
+        return "time_cap"
     if is_wall_locked(ss, participant):
         mark_time_cap_triggered(ss)
         return "time_cap"
@@ -189,9 +215,76 @@ def chat_should_lock(ss: StudySession, participant: Participant) -> Optional[str
     return None
 
 
+def sessions_locking_before(deadline: datetime):
+    """In-progress sessions whose wall or inactivity lock falls at or before `deadline`."""
+    return StudySession.objects.filter(
+        Q(wall_lock_at__lte=deadline) | Q(inactive_lock_at__lte=deadline),
+        status=StudySession.Status.IN_PROGRESS,
+    )
+
+
+@dataclass
+class LockSweepResult:
+    time_capped: int = 0
+    abandoned: int = 0
+
+
+def sweep_session_locks(now: Optional[datetime] = None) -> LockSweepResult:
+    """
+    Apply lock transitions that came due without a request to notice them.
+
+    In-progress sessions past wall_lock_at get time_cap_triggered_at stamped
+    in one UPDATE. When STUDY_ABANDON_AFTER_SECONDS > 0,
+    sessions with no activity for that long are marked ABANDONED and their
+    participants' schedules are refreshed so the next slot can unlock.
+    """
+    now = now or timezone.now()
+    result = LockSweepResult()
+    in_progress = StudySession.objects.filter(status=StudySession.Status.IN_PROGRESS)
+
+    result.time_capped = in_progress.filter(
+        wall_lock_at__lte=now, time_cap_triggered_at__isnull=True
+    ).update(time_cap_triggered_at=now)
+    # Sessions started before deadlines were stored.
+    for condition in Participant.Condition.values:
+        cap = timedelta(minutes=get_profile(condition).max_session_wall_minutes)
+        result.time_capped += in_progress.filter(
+            participant__condition=condition,
+            wall_lock_at__isnull=True,
+            started_at__lte=now - cap,
+            time_cap_triggered_at__isnull=True,
+        ).update(time_cap_triggered_at=now)
+
+    abandon_after = int(getattr(settings, "STUDY_ABANDON_AFTER_SECONDS", 0) or 0)
+    if abandon_after > 0:
+        cutoff = now - timedelta(seconds=abandon_after)
+        idle = in_progress.filter(
+            Q(last_activity_at__lte=cutoff)
+            | Q(last_activity_at__isnull=True, started_at__lte=cutoff)
+        )
+        with transaction.atomic():
+            rows = list(
+                idle.select_for_update(skip_locked=True).values_list("pk", "participant_id")
+            )
+            if rows:
+                result.abandoned = in_progress.filter(pk__in=[pk for pk, _ in rows]).update(
+                    status=StudySession.Status.ABANDONED,
+                    ended_at=now,
+                    end_reason="abandoned",
+                )
+                record_sessions_abandoned(Counter(pid for _, pid in rows))
+        if rows:
+            for participant in Participant.objects.filter(
+                id__in={pid for _, pid in rows}
+            ):
+                refresh_session_availability(participant)
+    return result
+
+
 def touch_activity(ss: StudySession) -> None:
     ss.last_activity_at = timezone.now()
-    ss.save(update_fields=["last_activity_at"])
+    ss.inactive_lock_at = _inactive_deadline(ss.last_activity_at)
+    ss.save(update_fields=["last_activity_at", "inactive_lock_at"])
 
 
 def add_active_seconds(ss: StudySession, delta: int) -> None:
@@ -199,12 +292,16 @@ def add_active_seconds(ss: StudySession, delta: int) -> None:
     delta = max(0, min(delta, cap))
     if delta <= 0:
         return
-    StudySession.objects.filter(pk=ss.pk).update(active_seconds=F("active_seconds") + delta)
+    with transaction.atomic():
+        StudySession.objects.filter(pk=ss.pk).update(active_seconds=F("active_seconds") + delta)
+        record_active_seconds(ss.participant_id, delta)
 
 
 def seconds_until_wall_lock(ss: StudySession, participant: Participant) -> Optional[int]:
     if ss.status != StudySession.Status.IN_PROGRESS or not ss.started_at:
         return None
+    if ss.wall_lock_at:
+        return max(0, int((ss.wall_lock_at - timezone.now()).total_seconds()))
     cap = _session_cap_seconds(participant)
     elapsed = wall_elapsed_seconds(ss)
     return max(0, int(cap - elapsed))
@@ -229,19 +326,66 @@ def get_current_study_session(participant: Participant) -> Optional[StudySession
     )
 
 
-def progress_dict(participant: Participant) -> Dict[str, Any]:
+def _current_from_slots(slots: List[StudySession]) -> Optional[StudySession]:
+    """get_current_study_session() over already-ordered rows."""
+    available = None
+    for ss in slots:
+        if ss.status == StudySession.Status.IN_PROGRESS:
+            return ss
+        if available is None and ss.status == StudySession.Status.AVAILABLE:
+            available = ss
+    return available
+
+
+def _progress_slots(participant: Participant, released: int, weeks: int) -> List[StudySession]:
+    """
+    Ordered sessions with availability applied for `released`. Every path
+    that changes a session's status refreshes availability itself, so once
+    the summary records that this release was applied the rows are only read.
+    """
+    applied = (
+        ParticipantSummary.objects.filter(participant=participant)
+        .values_list("availability_week_index", flat=True)
+        .first()
+    )
+    if applied == released:
+        slots = ordered_sessions(participant)
+        if len(slots) == weeks * 3:
+            return slots
     bootstrap_study_sessions(participant)
-    refresh_session_availability(participant)
+    slots = refresh_session_availability(participant, released=released)
+    summary = ParticipantSummary.objects.filter(participant=participant)
+    if not summary.update(availability_week_index=released):
+        refresh_participant_summaries([participant.id])
+        summary.update(availability_week_index=released)
+    return slots
+
+
+def progress_dict(
+    participant: Participant, slots: Optional[List[StudySession]] = None
+) -> Dict[str, Any]:
+    """
+    `slots`: the ordered list returned by refresh_session_availability(), if
+    the caller just ran it; otherwise they are loaded (and refreshed when a
+    new week was released since the last call) here.
+    """
+    schedule = get_schedule()
+    now = timezone.now()
+    released = schedule.released_week_index(now)
+    if slots is None:
+        slots = _progress_slots(participant, released, schedule.total_weeks)
     profile = get_profile(participant.condition)
-    slots = ordered_sessions(participant)
-    current = get_current_study_session(participant)
+    next_release = schedule.next_release_at(now)
+    current = _current_from_slots(slots)
     payload: Dict[str, Any] = {
         "condition": participant.condition,
         "memoryEnabled": profile.memory_enabled,
         "maxSessionMinutes": profile.max_session_wall_minutes,
         "allowCharacterSelection": profile.allow_character_selection,
         "defaultCharacter": profile.default_character,
-        "releasedWeekIndex": released_week_index(),
+        "releasedWeekIndex": released,
+        "nextReleaseAt": next_release.isoformat() if next_release else None,
+        "secondsUntilNextRelease": schedule.seconds_until_next_release(now),
         "sessions": [
             {
                 "id": str(s.id),
@@ -287,11 +431,48 @@ def progress_dict(participant: Participant) -> Dict[str, Any]:
     return payload
 
 
-def get_memory_context_for_chat(participant: Participant) -> str:
+MEMORY_FACT_MAX_CHARS = 500
+MEMORY_INDEX_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=MEMORY_INDEX_CACHE_SIZE)
+def memory_index_for(participant_id, revision: int) -> MemoryIndex:
+    """
+    The participant's facts, indexed. Cached per (participant, memory_revision):
+    chat turns reuse it with no query, and bump_memory_revision() makes the
+    next turn load the new facts.
+    """
+    facts = (
+        MemoryFact.objects.filter(participant_id=participant_id)
+        .order_by("created_at", "id")
+        .values_list("text", flat=True)
+    )
+    return MemoryIndex.build(list(facts))
+
+
+def bump_memory_revision(participant: Participant) -> None:
+    Participant.objects.filter(pk=participant.pk).update(
+        memory_revision=F("memory_revision") + 1
+    )
+    participant.refresh_from_db(fields=["memory_revision"])
+
+
+def get_memory_context_for_chat(participant: Participant, query: str = "") -> str:
+    """
+    Prompt block with the STUDY_MEMORY_TOP_K memory facts most relevant to
+    `query` (the child's current message). Participants with no MemoryFact
+    rows yet fall back to the whole legacy memory_summary.
+    """
     profile = get_profile(participant.condition)
     if not profile.memory_enabled:
         return ""
-    summary = (participant.memory_summary or "").strip()
+    index = memory_index_for(participant.pk, participant.memory_revision)
+    if len(index):
+        k = int(getattr(settings, "STUDY_MEMORY_TOP_K", 5))
+        picked = index.top_k(query, k)
+        summary = "\n".join(f"- {fact}" for fact in picked)
+    else:
+        summary = (participant.memory_summary or "").strip()
     if not summary:
         return ""
     return (
@@ -332,9 +513,13 @@ def merge_conversation_into_memory(participant: Participant, conversation: Conve
     try:
         from openai import OpenAI
 
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(
+            api_key=api_key,
+            timeout=float(getattr(settings, "CHAT_OPENAI_TIMEOUT_SECONDS", 30)),
+            max_retries=int(getattr(settings, "CHAT_OPENAI_MAX_RETRIES", 1)),
+        )
         lines = []
-        for m in conversation.messages or []:
+        for m in conversation.load_messages():
             role = m.get("sender", "")
             content = (m.get("content") or "")[:500]
             lines.append(f"{role}: {content}")
@@ -347,9 +532,10 @@ def merge_conversation_into_memory(participant: Participant, conversation: Conve
                 {
                     "role": "system",
                     "content": (
-                        "Summarize in 2-4 short sentences what the child shared about their "
-                        "reading (books, reactions, interests). No PII beyond what is in the text. "
-                        "English or Portuguese is fine."
+                        "List 2-6 short, self-contained facts about what the child shared "
+                        "about their reading (books, characters, reactions, interests), one "
+                        "per line. No PII beyond what is in the text. English or Portuguese "
+                        "is fine."
                     ),
                 },
                 {"role": "user", "content": transcript},
@@ -360,6 +546,7 @@ def merge_conversation_into_memory(participant: Participant, conversation: Conve
         chunk = (completion.choices[0].message.content or "").strip()
         if not chunk:
             return
+        add_memory_facts(participant, facts_from_text(chunk), conversation=conversation)
         prev = (participant.memory_summary or "").strip()
         merged = f"{prev}\n\n---\n{chunk}".strip() if prev else chunk
         max_len = int(getattr(settings, "STUDY_MEMORY_MAX_CHARS", 6000))
@@ -371,6 +558,48 @@ def merge_conversation_into_memory(participant: Participant, conversation: Conve
         return
 
 
+_BULLET = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)])\s*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def facts_from_text(text: str) -> List[str]:
+    """
+    Split a model reply (one fact per line, maybe bulleted) or a legacy
+    summary paragraph into individual facts.
+    """
+    facts: List[str] = []
+    for line in (text or "").splitlines():
+        if set(line.strip()) <= {"-", "*", "="}:
+            continue  # blank, or the "---" separator of legacy summaries
+        line = _BULLET.sub("", line).strip()
+        if not line:
+            continue
+        facts.extend(s.strip() for s in _SENTENCE_END.split(line) if s.strip())
+    return [f[:MEMORY_FACT_MAX_CHARS] for f in facts]
+
+
+def add_memory_facts(
+    participant: Participant, facts: List[str], conversation: Optional[Conversation] = None
+) -> int:
+    """Store facts and drop the oldest beyond STUDY_MEMORY_MAX_FACTS. Returns facts added."""
+    if not facts:
+        return 0
+    MemoryFact.objects.bulk_create(
+        [MemoryFact(participant=participant, conversation=conversation, text=f) for f in facts]
+    )
+    limit = int(getattr(settings, "STUDY_MEMORY_MAX_FACTS", 200))
+    if limit > 0:
+        stale = list(
+            MemoryFact.objects.filter(participant=participant)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)[limit:]
+        )
+        if stale:
+            MemoryFact.objects.filter(id__in=stale).delete()
+    bump_memory_revision(participant)
+    return len(facts)
+
+
 def get_study_session_for_conversation(
     conversation_id: str, participant: Participant
 ) -> Optional[StudySession]:
@@ -382,3 +611,105 @@ def get_study_session_for_conversation(
         )
         .first()
     )
+
+
+def record_active_seconds(participant_id, delta: int) -> None:
+    """Add heartbeat seconds to the participant's summary (rebuilt if it is missing)."""
+    if not ParticipantSummary.objects.filter(participant_id=participant_id).update(
+        total_active_seconds=F("total_active_seconds") + delta
+    ):
+        refresh_participant_summaries([participant_id])
+
+
+def record_session_completed(ss: StudySession) -> None:
+    """Fold a just-completed session (status, ended_at, survey_scores saved) into the summary."""
+    if not ParticipantSummary.objects.filter(participant_id=ss.participant_id).update(
+        sessions_completed=F("sessions_completed") + 1,
+        last_completed_at=ss.ended_at,
+        latest_session_number=linear_session_number(ss.week_index, ss.slot_index),
+        latest_survey_scores=ss.survey_scores,
+    ):
+        refresh_participant_summaries([ss.participant_id])
+
+
+def record_sessions_abandoned(counts: Dict[Any, int]) -> None:
+    """`counts`: participant id -> sessions just marked abandoned."""
+    by_count: Dict[int, List[Any]] = {}
+    for pid, n in counts.items():
+        by_count.setdefault(n, []).append(pid)
+    for n, pids in by_count.items():
+        ParticipantSummary.objects.filter(participant_id__in=pids).update(
+            sessions_abandoned=F("sessions_abandoned") + n
+        )
+    missing = set(counts) - set(
+        ParticipantSummary.objects.filter(participant_id__in=list(counts)).values_list(
+            "participant_id", flat=True
+        )
+    )
+    if missing:
+        refresh_participant_summaries(missing)
+
+
+def refresh_participant_summaries(participant_ids=None) -> int:
+    """
+    Recompute ParticipantSummary rows from StudySession and upsert them, for the
+    given participant ids (or everyone). Returns the number of rows written.
+    Availability is re-applied on the next progress request.
+    """
+    sessions = StudySession.objects.all()
+    participants = Participant.objects.all()
+    if participant_ids is not None:
+        sessions = sessions.filter(participant_id__in=participant_ids)
+        participants = participants.filter(id__in=participant_ids)
+
+    totals = {
+        row["participant_id"]: row
+        for row in sessions.order_by()
+        .values("participant_id")
+        .annotate(
+            completed=Count("id", filter=Q(status=StudySession.Status.COMPLETED)),
+            abandoned=Count("id", filter=Q(status=StudySession.Status.ABANDONED)),
+            active=Sum("active_seconds"),
+        )
+    }
+    latest: Dict[Any, tuple] = {}
+    completed = (
+        sessions.filter(status=StudySession.Status.COMPLETED)
+        .order_by("participant_id", "-ended_at", "-week_index", "-slot_index")
+        .values_list("participant_id", "week_index", "slot_index", "ended_at", "survey_scores")
+    )
+    for pid, week, slot, ended_at, scores in completed:
+        latest.setdefault(pid, (linear_session_number(week, slot), ended_at, scores))
+
+    rows = []
+    for pid in participants.values_list("id", flat=True):
+        agg = totals.get(pid) or {}
+        session_number, ended_at, scores = latest.get(pid, (None, None, None))
+        rows.append(
+            ParticipantSummary(
+                participant_id=pid,
+                sessions_completed=agg.get("completed") or 0,
+                sessions_abandoned=agg.get("abandoned") or 0,
+                total_active_seconds=agg.get("active") or 0,
+                last_completed_at=ended_at,
+                latest_session_number=session_number,
+                latest_survey_scores=scores,
+            )
+        )
+    if rows:
+        ParticipantSummary.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["participant"],
+            update_fields=[
+                "sessions_completed",
+                "sessions_abandoned",
+                "total_active_seconds",
+                "last_completed_at",
+                "latest_session_number",
+                "latest_survey_scores",
+                "availability_week_index",
+                "updated_at",
+            ],
+        )
+    return len(rows)
@@ -8,18 +8,30 @@ import secrets
 from typing import Optional
 
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.db import IntegrityError, transaction
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
 
-from .models import Conversation, Participant, StudySession, SurveyResponse
+from .models import (
+    Conversation,
+    Participant,
+    ParticipantSummary,
+    StudySession,
+    SurveyResponse,
+)
 from .study_config import allowed_character, get_profile, resolve_enrollment_code
 from .study_credentials import (
+    clear_login_failures,
     generate_login_code,
     hash_pin,
+    login_locked_out,
     normalize_login_code,
+    record_login_failure,
     validate_pin_pair,
     verify_pin,
 )
@@ -31,13 +43,29 @@ from .study_services import (
     merge_conversation_into_memory,
     participant_from_token,
     progress_dict,
+    record_session_completed,
     refresh_session_availability,
+    set_lock_deadlines,
     touch_activity,
     validate_likert,
 )
+from .idempotency import idempotent
+from .message_meta import decode_meta, encode_meta
+from .study_enrollment import EnrollmentEntry, bulk_enroll, random_pin
+from .study_events import (
+    event_stream,
+    issue_stream_token,
+    participant_from_stream_token,
+    stream_token_ttl,
+)
+from .study_schedule import get_schedule
+from .throttle import check_throttle, throttle_stats
 from .caiq_panas_items import (
+    SURVEY_VERSIONS,
+    expected_item_id_set,
     expected_item_ids,
     linear_session_number,
+    survey_definition,
     survey_definition_payload,
     survey_items_for_version,
     survey_version_for_session,
@@ -45,6 +73,12 @@ from .caiq_panas_items import (
 from .caiq_panas_scoring import compute_scores
 
 
+# Once every week is released the schedule only changes on redeploy.
+SCHEDULE_FINAL_MAX_AGE = 3600
+# Survey copy only changes on deploy; ETag revalidation covers that.
+SURVEY_DEFINITION_MAX_AGE = 3600
+
+
 def _bearer_token(request) -> Optional[str]:
     h = request.META.get("HTTP_AUTHORIZATION", "") or ""
     if h.startswith("Bearer "):
@@ -66,6 +100,14 @@ def _json_body(request) -> dict:
         return {}
 
 
+def _client_messages(convo: Conversation) -> list:
+    """Stored messages with meta decoded to the dict shape the client reads."""
+    return [
+        {**m, "meta": decode_meta(m["meta"])} if "meta" in m else m
+        for m in convo.messages or []
+    ]
+
+
 def _register_response_json(participant: Participant) -> dict:
     profile = get_profile(participant.condition)
     return {
@@ -91,6 +133,10 @@ def study_register(request):
     pin = body.get("pin") or body.get("PIN") or ""
     pin_confirm = body.get("pinConfirm") or body.get("pin_confirm") or ""
 
+    limited = check_throttle(request, "register")
+    if limited:
+        return limited
+
     pin_err = validate_pin_pair(pin, pin_confirm)
     if pin_err:
         return JsonResponse({"error": pin_err}, status=400)
@@ -123,9 +169,67 @@ def study_register(request):
 
     bootstrap_study_sessions(participant)
     refresh_session_availability(participant)
+    ParticipantSummary.objects.create(participant=participant)
     return JsonResponse(_register_response_json(participant))
 
 
+@require_POST
+@staff_member_required
+def study_bulk_enroll(request):
+    """
+    Staff-only classroom enrollment. Body: {"enrollmentCode": "...",
+    "participants": [{"displayName": "...", "pin": "1234"}, ...]}; a missing
+    PIN is generated and returned so it can be handed out with the login code.
+
+    Authenticated by the admin session cookie, so it keeps Django's CSRF check
+    (send the csrftoken cookie back as X-CSRFToken). PINs are hashed in a
+    bounded thread pool (STUDY_BULK_ENROLL_THREADS); large classes belong in
+    `manage.py bulk_enroll`.
+    """
+    body = _json_body(request)
+    code = body.get("enrollmentCode") or body.get("enrollment_code") or ""
+    rows = body.get("participants")
+    if not isinstance(rows, list) or not rows:
+        return JsonResponse({"error": "participants must be a non-empty list"}, status=400)
+    entries = []
+    for row in rows:
+        if not isinstance(row, dict):
+            return JsonResponse({"error": "participants must be objects"}, status=400)
+        name = row.get("displayName") or row.get("display_name") or ""
+        pin = str(row.get("pin") or row.get("PIN") or "").strip() or random_pin()
+        entries.append(EnrollmentEntry(display_name=name, pin=pin))
+    try:
+        enrolled = bulk_enroll(
+            code,
+            entries,
+            workers=max(1, int(getattr(settings, "STUDY_BULK_ENROLL_THREADS", 4))),
+            threads=True,
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(
+        {
+            "participants": [
+                {
+                    "participantId": e.participant_id,
+                    "displayName": e.display_name,
+                    "loginCode": e.login_code,
+                    "pin": entry.pin,
+                    "condition": e.condition,
+                }
+                for e, entry in zip(enrolled, entries)
+            ]
+        }
+    )
+
+
+@require_GET
+@staff_member_required
+def study_throttle_stats(request):
+    """Admitted vs rejected counts for the login/register throttle."""
+    return JsonResponse(throttle_stats())
+
+
 @csrf_exempt
 @require_POST
 def study_login(request):
@@ -139,18 +243,39 @@ def study_login(request):
             status=400,
         )
 
+    limited = check_throttle(request, "login", login_code=normalized)
+    if limited:
+        return limited
+
+    if login_locked_out(normalized):
+        response = JsonResponse(
+            {"error": "Demasiadas tentativas. Tenta novamente mais tarde."},
+            status=429,
+        )
+        response["Retry-After"] = str(
+            int(getattr(settings, "STUDY_LOGIN_FAILURE_WINDOW_SECONDS", 900))
+        )
+        return response
+
     participant = Participant.objects.filter(login_code=normalized).first()
     if not participant or not participant.pin_hash:
+        record_login_failure(normalized)
         return JsonResponse(
             {"error": "Código ou PIN incorretos."},
             status=401,
         )
 
-    if not verify_pin(pin, participant.pin_hash):
+    def _rehash(raw_pin):
+        participant.pin_hash = hash_pin(raw_pin)
+        participant.save(update_fields=["pin_hash"])
+
+    if not verify_pin(pin, participant.pin_hash, setter=_rehash):
+        record_login_failure(normalized)
         return JsonResponse(
             {"error": "Código ou PIN incorretos."},
             status=401,
         )
+    clear_login_failures(normalized)
 
     if getattr(settings, "STUDY_ROTATE_TOKEN_ON_LOGIN", True):
         for _ in range(8):
@@ -186,8 +311,65 @@ def study_progress(request):
     return JsonResponse(progress_dict(participant))
 
 
+@require_GET
+def study_schedule(request):
+    """Public week-release calendar; cacheable until the next week unlocks."""
+    schedule = get_schedule()
+    now = timezone.now()
+    next_release = schedule.next_release_at(now)
+    seconds = schedule.seconds_until_next_release(now)
+    response = JsonResponse(
+        {
+            "studyStart": schedule.start.isoformat(),
+            "totalWeeks": schedule.total_weeks,
+            "releasedWeekIndex": schedule.released_week_index(now),
+            "nextReleaseAt": next_release.isoformat() if next_release else None,
+            "secondsUntilNextRelease": seconds,
+        }
+    )
+    patch_cache_control(
+        response, public=True, max_age=seconds if seconds is not None else SCHEDULE_FINAL_MAX_AGE
+    )
+    return response
+
+
+@csrf_exempt
+@require_POST
+def study_events_token(request):
+    """Short-lived signed token for opening /api/study/events/ with EventSource."""
+    participant, err = _require_participant(request)
+    if err:
+        return err
+    return JsonResponse(
+        {"streamToken": issue_stream_token(participant), "expiresInSeconds": stream_token_ttl()}
+    )
+
+
+@require_GET
+async def study_events(request):
+    """
+    SSE stream of lock / unlock / time-remaining / week-release events.
+    EventSource cannot send headers, so it authenticates with ?stream=<token>
+    from study_events_token; other clients may send the bearer header.
+    """
+    token = _bearer_token(request)
+    if token:
+        participant = await sync_to_async(participant_from_token)(token)
+    else:
+        participant = await sync_to_async(participant_from_stream_token)(
+            request.GET.get("stream")
+        )
+    if not participant:
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+    response = StreamingHttpResponse(event_stream(participant), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @csrf_exempt
 @require_POST
+@idempotent("session-start")
 def study_session_start(request):
     participant, err = _require_participant(request)
     if err:
@@ -229,7 +411,7 @@ def study_session_start(request):
                 "conversationId": str(convo.id),
                 "character": convo.character,
                 "userName": convo.user_name,
-                "messages": convo.messages or [],
+                "messages": _client_messages(convo),
                 "sessionStartedAt": ss.started_at.isoformat() if ss.started_at else None,
             }
         )
@@ -240,6 +422,7 @@ def study_session_start(request):
             status=400,
         )
 
+    now = timezone.now()
     initial_message = body.get("initialMessage")
     messages = []
     if initial_message:
@@ -247,12 +430,12 @@ def study_session_start(request):
             {
                 "sender": "assistant",
                 "content": initial_message,
-                "created_at": timezone.now().isoformat(),
-                "meta": {"role": "agent", "on_text": True},
+                "created_at": now.isoformat(),
+                "ts": now.timestamp(),
+                "meta": encode_meta({"role": "agent", "on_text": True}),
             }
         )
 
-    now = timezone.now()
     convo = Conversation.objects.create(
         user_name=user_name,
         character=character,
@@ -261,16 +444,8 @@ def study_session_start(request):
     )
     ss.conversation = convo
     ss.status = StudySession.Status.IN_PROGRESS
-    ss.started_at = now
-    ss.last_activity_at = now
-    ss.save(
-        update_fields=[
-            "conversation",
-            "status",
-            "started_at",
-            "last_activity_at",
-        ]
-    )
+    deadline_fields = set_lock_deadlines(ss, participant, now)
+    ss.save(update_fields=["conversation", "status", *deadline_fields])
 
     refresh_session_availability(participant)
 
@@ -280,7 +455,7 @@ def study_session_start(request):
             "conversationId": str(convo.id),
             "character": character,
             "userName": user_name,
-            "messages": convo.messages or [],
+            "messages": _client_messages(convo),
             "sessionStartedAt": ss.started_at.isoformat() if ss.started_at else None,
         }
     )
@@ -404,9 +579,32 @@ def study_survey_definition(request):
     return JsonResponse(payload)
 
 
+@require_GET
+def study_survey_definition_by_version(request, version):
+    """
+    Public, session-independent survey definition ("full" | "mini"): the
+    prebuilt JSON body with a strong ETag; If-None-Match gets a 304.
+    """
+    if version not in SURVEY_VERSIONS:
+        return JsonResponse({"error": "Unknown survey version"}, status=404)
+    definition = survey_definition(version)
+    response = get_conditional_response(request, etag=definition.etag)
+    if response is None:
+        response = HttpResponse(definition.body, content_type="application/json")
+    response["ETag"] = definition.etag
+    patch_cache_control(response, public=True, max_age=SURVEY_DEFINITION_MAX_AGE)
+    return response
+
+
 @csrf_exempt
 @require_POST
+@idempotent("caiq-panas")
 def study_caiq_panas_submit(request):
+    """
+    Validate answers up front, then lock the session row and write the
+    responses, scores, completion and availability in one transaction. The
+    sessions refreshed there are reused for the progress payload.
+    """
     participant, err = _require_participant(request)
     if err:
         return err
@@ -416,29 +614,6 @@ def study_caiq_panas_submit(request):
 
     if not sid:
         return JsonResponse({"error": "studySessionId required"}, status=400)
-    try:
-        ss = StudySession.objects.get(id=sid, participant=participant)
-    except StudySession.DoesNotExist:
-        return JsonResponse({"error": "Study session not found"}, status=404)
-
-    if ss.status != StudySession.Status.IN_PROGRESS:
-        return JsonResponse(
-            {"error": "Session is not in progress", "status": ss.status}, status=400
-        )
-
-    if not ss.reading_questionnaire_submitted_at:
-        return JsonResponse(
-            {"error": "reading questionnaire must be submitted first"}, status=400
-        )
-
-    if ss.caiq_panas_submitted_at:
-        return JsonResponse({"error": "survey already submitted"}, status=400)
-
-    ver = survey_version_for_session(ss.week_index, ss.slot_index)
-    if not ver:
-        return JsonResponse({"error": "No survey for this session"}, status=400)
-
-    expected = expected_item_ids(ver)
     if not isinstance(answers, list):
         return JsonResponse({"error": "answers must be a list of {itemId, value}"}, status=400)
 
@@ -452,40 +627,67 @@ def study_caiq_panas_submit(request):
             return JsonResponse({"error": f"invalid value for {iid!r}"}, status=400)
         by_id[iid] = val
 
-    if sorted(by_id.keys()) != sorted(expected):
-        return JsonResponse(
-            {"error": "answers must include exactly the expected item ids", "expected": expected},
-            status=400,
+    now = timezone.now()
+    released = get_schedule().released_week_index(now)
+    with transaction.atomic():
+        # Row lock: a double-clicked submit waits here and then sees caiq_panas_submitted_at.
+        ss = (
+            StudySession.objects.select_for_update()
+            .filter(id=sid, participant=participant)
+            .first()
         )
+        if ss is None:
+            return JsonResponse({"error": "Study session not found"}, status=404)
 
-    items = {it.item_id: it for it in survey_items_for_version(ver)}
-    pcode = (participant.login_code or str(participant.id))[:32]
-    now = timezone.now()
-    sn = linear_session_number(ss.week_index, ss.slot_index)
+        if ss.status != StudySession.Status.IN_PROGRESS:
+            return JsonResponse(
+                {"error": "Session is not in progress", "status": ss.status}, status=400
+            )
 
-    try:
-        scores = compute_scores(ver, by_id)
-    except ValueError as e:
-        return JsonResponse({"error": str(e)}, status=400)
+        if not ss.reading_questionnaire_submitted_at:
+            return JsonResponse(
+                {"error": "reading questionnaire must be submitted first"}, status=400
+            )
 
-    rows = [
-        SurveyResponse(
-            study_session=ss,
-            participant=participant,
-            participant_code=pcode,
-            condition=participant.condition,
-            session_number=sn,
-            survey_version=ver,
-            item_id=iid,
-            item_text=items[iid].text,
-            value=by_id[iid],
-            completion_status=SurveyResponse.CompletionStatus.COMPLETE,
-        )
-        for iid in expected
-    ]
+        if ss.caiq_panas_submitted_at:
+            return JsonResponse({"error": "survey already submitted"}, status=400)
 
-    with transaction.atomic():
-        SurveyResponse.objects.bulk_create(rows)
+        ver = survey_version_for_session(ss.week_index, ss.slot_index)
+        if not ver:
+            return JsonResponse({"error": "No survey for this session"}, status=400)
+
+        if by_id.keys() != expected_item_id_set(ver):
+            return JsonResponse(
+                {
+                    "error": "answers must include exactly the expected item ids",
+                    "expected": expected_item_ids(ver),
+                },
+                status=400,
+            )
+
+        try:
+            scores = compute_scores(ver, by_id)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        pcode = (participant.login_code or str(participant.id))[:32]
+        sn = linear_session_number(ss.week_index, ss.slot_index)
+        SurveyResponse.objects.bulk_create(
+            [
+                SurveyResponse(
+                    study_session=ss,
+                    participant=participant,
+                    participant_code=pcode,
+                    condition=participant.condition,
+                    session_number=sn,
+                    survey_version=ver,
+                    item_id=it.item_id,
+                    item_text=it.text,
+                    value=by_id[it.item_id],
+                    completion_status=SurveyResponse.CompletionStatus.COMPLETE,
+                )
+                for it in survey_items_for_version(ver)
+            ]
+        )
         ss.caiq_panas_submitted_at = now
         ss.survey_scores = scores
         ss.status = StudySession.Status.COMPLETED
@@ -498,13 +700,15 @@ def study_caiq_panas_submit(request):
                 "ended_at",
             ]
         )
+        record_session_completed(ss)
+        slots = refresh_session_availability(participant, released=released)
 
-    if ss.conversation:
+    if ss.conversation_id:
         merge_conversation_into_memory(participant, ss.conversation)
 
-    refresh_session_availability(participant)
-
-    return JsonResponse({"ok": True, "scores": scores, "progress": progress_dict(participant)})
+    return JsonResponse(
+        {"ok": True, "scores": scores, "progress": progress_dict(participant, slots=slots)}
+    )
 
 
 @csrf_exempt
@@ -1,5 +1,6 @@
 from django.test import TestCase
 from . import audit
+from .models import Conversation
 
 
 class AuditTests(TestCase):
@@ -208,3 +209,346 @@ class MetricSanityTests(TestCase):
         self.assertAlmostEqual(scores["tailoring_score"], 1 / 2)
 
         self.assertAlmostEqual(scores["adaptivity_index"], 1.0)
+
+
+class SignalClassifierTests(TestCase):
+    def _trained(self):
+        from .signal_classifier import SignalClassifier
+
+        confused = ["i don't know", "idk", "i'm stuck", "i am lost", "huh?", "i'm confused"]
+        succeeded = [
+            "let me try",
+            "i want to try it myself",
+            "i got it because the pirate lied",
+            "let me try on my own",
+        ]
+        neutral = ["the pirates sailed away", "i liked the ship", "the captain was tall"]
+        texts = confused + succeeded + neutral
+        y = [(1.0, 0.0)] * len(confused) + [(0.0, 1.0)] * len(succeeded) + [(0.0, 0.0)] * len(neutral)
+        return SignalClassifier.empty(2 ** 10).fit(texts, y, epochs=200)
+
+    def test_trained_model_separates_signals(self):
+        model = self._trained()
+        conf_c, succ_c = model.predict("idk i'm stuck")
+        conf_s, succ_s = model.predict("let me try")
+        self.assertGreater(conf_c, conf_s)
+        self.assertGreater(succ_s, succ_c)
+
+    def test_batch_matches_single_predictions(self):
+        model = self._trained()
+        texts = ["idk", "let me try", "", "the ship was red?"]
+        batch = model.predict_batch(texts)
+        for row, text in zip(batch, texts):
+            self.assertAlmostEqual(row[0], model.predict(text)[0])
+            self.assertAlmostEqual(row[1], model.predict(text)[1])
+
+    def test_save_load_roundtrip(self):
+        import os
+        import tempfile
+
+        from .signal_classifier import SignalClassifier
+
+        model = self._trained()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "m.npz")
+            model.save(path)
+            loaded = SignalClassifier.load(path)
+        self.assertEqual(loaded.predict("idk"), model.predict("idk"))
+
+    def test_labeled_examples_from_messages(self):
+        from .signal_classifier import labeled_examples
+
+        rows = labeled_examples(
+            [
+                {"sender": "assistant", "content": "hi", "meta": {"role": "agent"}},
+                {"sender": "user", "content": "idk", "meta": {"confusion_signal": "HIGH"}},
+                {"sender": "user", "content": "plain", "meta": {}},
+            ]
+        )
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][0], "idk")
+        self.assertEqual(rows[0][1], 1.0)
+
+    def test_policy_uses_pluggable_scorer(self):
+        from .scaffold_policy import LadderPolicy, Move
+        from .signal_classifier import ClassifierScorer
+
+        policy = LadderPolicy(scorer=ClassifierScorer(self._trained()))
+        self.assertEqual(policy.plan("idk i'm stuck"), Move.REFLECT)
+
+
+class PolicyReplayTests(TestCase):
+    CHILD_LINES = [
+        "idk",
+        "i'm stuck?",
+        "still confused, help",
+        "huh?",
+        "i got it because the map was fake",
+        "what?",
+        "i don't know",
+        "let me try",
+        "the captain",
+        "lost",
+    ]
+
+    def _transcript(self):
+        messages = [{"sender": "assistant", "content": "Hi!", "meta": {"role": "agent"}}]
+        for line in self.CHILD_LINES:
+            messages.append(
+                {
+                    "sender": "user",
+                    "content": line,
+                    "meta": {"confusion_signal": "HIGH" if "?" in line else "NONE"},
+                }
+            )
+            messages.append({"sender": "assistant", "content": "…", "meta": {}})
+        return messages
+
+    def test_vectorized_replay_matches_ladder_policy(self):
+        from .policy_replay import PolicyReplay, config_grid
+        from .scaffold_policy import LadderPolicy
+
+        configs = config_grid(
+            confusion_threshold=[0.3, 0.55, 0.9],
+            window=[3, 6, 12],
+            allow_explanation_if_stuck_rounds=[1, 2, 3],
+        )
+        replay = PolicyReplay(configs).replay_messages(self._transcript())
+        for k, cfg in enumerate(configs):
+            policy = LadderPolicy(cfg)
+            expected = []
+            for line in self.CHILD_LINES:
+                move = policy.plan(line)
+                policy.log_assistant(move, "…", reason="test")
+                expected.append(int(move))
+            self.assertEqual(replay.moves[:, k].tolist(), expected, cfg)
+
+    def test_replay_corpus_reports_deltas(self):
+        from .policy_replay import config_grid, replay_corpus
+
+        convo = Conversation.objects.create(
+            user_name="A", character="default", messages=self._transcript()
+        )
+        convo.recompute_audit(save=True)
+        report = replay_corpus(config_grid(confusion_threshold=[0.4, 0.8]))
+        self.assertEqual(report.conversations, 1)
+        rows = report.rows()
+        self.assertEqual(len(rows), 2)
+        for row in rows:
+            self.assertIsNotNone(row["tailoring_score"])
+            self.assertAlmostEqual(
+                row["delta_tailoring_score"],
+                row["tailoring_score"] - convo.audit["tailoring_score"],
+            )
+
+
+class CohortAnalyticsTests(TestCase):
+    def setUp(self):
+        import secrets
+
+        from .models import Participant, StudySession
+
+        for condition, tailoring in (("personalized", (1.0, 0.5)), ("generic", (0.25, None))):
+            p = Participant.objects.create(
+                condition=condition, auth_token=secrets.token_urlsafe(16)
+            )
+            for slot, score in enumerate(tailoring, start=1):
+                convo = Conversation.objects.create(
+                    user_name="A",
+                    character="po",
+                    participant=p,
+                    messages=[{"sender": "user", "content": "hi"}] * slot,
+                    audit={"tailoring_score": score, "warmth_rate": 1.0},
+                )
+                StudySession.objects.create(
+                    participant=p, week_index=1, slot_index=slot, conversation=convo
+                )
+        Conversation.objects.create(user_name="B", character="elsa", audit={})
+
+    def test_grouped_by_condition(self):
+        from .analytics import cohort_report
+
+        rows = {r["condition"]: r for r in cohort_report(by=["condition"])}
+        self.assertEqual(set(rows), {"personalized", "generic", ""})
+        self.assertEqual(rows["personalized"]["conversations"], 2)
+        self.assertAlmostEqual(rows["personalized"]["tailoring_score"], 0.75)
+        self.assertAlmostEqual(rows["personalized"]["mean_messages"], 1.5)
+        self.assertAlmostEqual(rows["generic"]["tailoring_score"], 0.25)
+        self.assertEqual(rows["generic"]["tailoring_score_n"], 1)
+        self.assertIsNone(rows[""]["tailoring_score"])
+
+    def test_grouped_by_week_and_character(self):
+        from .analytics import cohort_report
+
+        rows = cohort_report(by=["week", "character"])
+        keyed = {(r["week"], r["character"]): r for r in rows}
+        self.assertEqual(keyed[(1, "po")]["conversations"], 4)
+        self.assertAlmostEqual(keyed[(1, "po")]["tailoring_score"], (1.0 + 0.5 + 0.25) / 3)
+        self.assertEqual(keyed[(0, "elsa")]["conversations"], 1)
+
+    def test_overall_row_and_admin_report(self):
+        from django.contrib.auth import get_user_model
+
+        from .analytics import cohort_report
+
+        overall = cohort_report(by=[])
+        self.assertEqual(len(overall), 1)
+        self.assertEqual(overall[0]["conversations"], 5)
+
+        admin = get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin)
+        r = self.client.get("/admin/chat/conversation/cohort-report/?by=condition")
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "personalized")
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        import secrets
+
+        from django.contrib.auth import get_user_model
+
+        from .models import Participant, StudySession
+
+        p = Participant.objects.create(condition="generic", auth_token=secrets.token_urlsafe(16))
+        convo = Conversation.objects.create(
+            user_name="A",
+            character="po",
+            participant=p,
+            messages=[{"sender": "assistant", "content": "Hello there, reader!"}],
+        )
+        Conversation.objects.create(user_name="B", character="elsa")
+        StudySession.objects.create(participant=p, week_index=1, slot_index=1, conversation=convo)
+        admin = get_user_model().objects.create_superuser("admin", "a@example.com", "pw")
+        self.client.force_login(admin)
+
+    def test_conversation_preview_is_annotated(self):
+        r = self.client.get("/admin/chat/conversation/")
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "assistant: Hello there, reader!...")
+        self.assertContains(r, "(no messages)")
+        for obj in r.context["cl"].result_list:
+            self.assertTrue({"messages", "audit"} <= obj.get_deferred_fields())
+
+    def test_other_changelists_render(self):
+        for url in ("/admin/chat/studysession/", "/admin/chat/participant/", "/admin/chat/surveyresponse/"):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+    def test_change_form_still_loads_messages(self):
+        convo = Conversation.objects.get(user_name="A")
+        r = self.client.get(f"/admin/chat/conversation/{convo.pk}/change/")
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "Hello there")
+
+
+class MessageMetaTests(TestCase):
+    CHILD = {
+        "role": "child",
+        "on_task": True,
+        "elaborated": False,
+        "is_question": True,
+        "confusion_signal": "HIGH",
+        "autonomy_signal": "NONE",
+    }
+    AGENT = {
+        "role": "agent",
+        "text_focus": "ON_TEXT",
+        "stance": "PROACTIVE",
+        "ladder_step": "ANALOGY",
+        "affect": "WARM_SUPPORTIVE",
+    }
+
+    def test_round_trip_and_size(self):
+        import json
+
+        from .message_meta import decode_meta, encode_meta, meta_view
+
+        for meta in (self.CHILD, self.AGENT, {"role": "agent", "on_text": True}, {}):
+            encoded = encode_meta(meta)
+            self.assertEqual(decode_meta(encoded), meta)
+            self.assertEqual(encode_meta(encoded), encoded)
+            self.assertLess(len(json.dumps(encoded)), len(json.dumps(meta)) + 4)
+        self.assertLess(len(json.dumps(encode_meta(self.CHILD))), len(json.dumps(self.CHILD)) / 4)
+
+        odd = {"stance": "SIDEWAYS", "move": "REFLECT", "on_task": "yes", "note": [1, 2]}
+        self.assertEqual(decode_meta(encode_meta({**self.AGENT, **odd})), {**self.AGENT, **odd})
+        self.assertEqual(dict(meta_view(None)), {})
+        self.assertEqual(decode_meta(self.CHILD), self.CHILD)
+
+    def test_audit_reads_both_formats(self):
+        from .message_meta import encode_meta
+
+        legacy = [
+            {"sender": "assistant", "content": "Olá", "meta": self.AGENT},
+            {"sender": "user", "content": "não sei?", "meta": self.CHILD},
+            {"sender": "assistant", "content": "Pensa assim", "meta": {**self.AGENT, "stance": "QUIET"}},
+            {"meta": {"role": "child"}, "content": "ok"},
+        ]
+        encoded = [{**m, "meta": encode_meta(m["meta"])} for m in legacy]
+        self.assertEqual(audit.messages_to_turns(encoded), audit.messages_to_turns(legacy))
+        self.assertEqual(audit.compute_audit(encoded), audit.compute_audit(legacy))
+
+    def test_save_message_stores_compact_meta_and_export_decodes(self):
+        import json
+
+        convo = Conversation.objects.create(user_name="A", character="po", messages=[])
+        r = self.client.post(
+            "/api/save-message/",
+            data=json.dumps(
+                {"conversationId": str(convo.id), "sender": "user", "content": "hi", "meta": self.CHILD}
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 200)
+        convo.refresh_from_db()
+        stored = convo.messages[0]["meta"]
+        self.assertIsInstance(stored, list)
+        self.assertEqual(convo.audit["child_question_rate"], 1.0)
+
+        from .exports import iter_transcript_turn_rows
+
+        rows = list(
+            iter_transcript_turn_rows(
+                [{"studySessionId": "s", "conversationId": str(convo.id), "participantCode": "",
+                  "condition": "", "weekIndex": 1, "slotIndex": 1, "endReason": "",
+                  "activeSeconds": 0, "messages": convo.messages}]
+            )
+        )
+        self.assertEqual(json.loads(rows[0][-1]), self.CHILD)
+
+
+class MessageTimestampTests(TestCase):
+    def _messages(self, n, with_ts):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+
+        start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        out = []
+        for i in range(n):
+            at = start + timedelta(seconds=i)
+            m = {
+                "sender": "assistant" if i % 2 else "user",
+                "content": "?" if i % 3 == 0 else "ok",
+                "created_at": at.isoformat(),
+            }
+            if with_ts:
+                m["ts"] = at.timestamp()
+            out.append(m)
+        return out
+
+    def test_ts_matches_created_at_and_skips_parsing(self):
+        from unittest import mock
+
+        legacy = self._messages(30, with_ts=False)
+        stamped = self._messages(30, with_ts=True)
+        self.assertEqual(audit.messages_to_turns(stamped), audit.messages_to_turns(legacy))
+        with mock.patch.object(audit, "_timestamp_from_iso") as parse:
+            audit.compute_audit(stamped)
+        parse.assert_not_called()
+
+    def test_out_of_order_messages_are_still_sorted(self):
+        messages = self._messages(6, with_ts=True)
+        shuffled = [messages[i] for i in (1, 0, 3, 2, 5, 4)]
+        turns = audit.messages_to_turns(shuffled)
+        self.assertFalse(audit._is_sorted(turns))
+        self.assertTrue(audit._is_sorted(audit.messages_to_turns(messages)))
+        self.assertEqual(audit.compute_audit(shuffled), audit.compute_audit(messages))
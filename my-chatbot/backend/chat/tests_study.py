@@ -1,13 +1,22 @@
+import io
 import json
 import secrets
 
+from django.db import connection
 from django.test import Client, TestCase, override_settings
 from django.utils import timezone
 
-from .models import Conversation, Participant, StudySession, SurveyResponse
+from .models import (
+    Conversation,
+    Participant,
+    ParticipantSummary,
+    StudySession,
+    SurveyResponse,
+)
 from .study_credentials import validate_pin_pair
 from .study_services import (
     bootstrap_study_sessions,
+    refresh_participant_summaries,
     refresh_session_availability,
     validate_likert,
     comprehension_provided,
@@ -160,6 +169,14 @@ class StudyApiTests(TestCase):
         )
         self.assertEqual(prog2["focusSlotIndex"], 2)
         self.assertEqual(SurveyResponse.objects.filter(study_session_id=sid).count(), 29)
+        submitted_progress = json.loads(r_caiq.content)["progress"]
+        self.assertEqual(submitted_progress["sessions"], prog2["sessions"])
+        self.assertEqual(submitted_progress["focusSessionId"], prog2["focusSessionId"])
+
+        summary = ParticipantSummary.objects.get(participant__auth_token=token)
+        self.assertEqual(summary.sessions_completed, 1)
+        self.assertEqual(summary.latest_session_number, 1)
+        self.assertEqual(summary.latest_survey_scores["caiqTotalMean"], 3.0)
 
     def test_reading_only_does_not_unlock(self):
         r = self.client.post(
@@ -206,6 +223,30 @@ class StudyApiTests(TestCase):
         )
         self.assertEqual(prog2["focusSlotIndex"], 1)
 
+    @override_settings(STUDY_START_DATE="1990-01-01", STUDY_TIMEZONE="UTC")
+    def test_start_and_resume_return_decoded_meta(self):
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(p)
+        refresh_session_availability(p)
+        kwargs = dict(
+            data=json.dumps({"userName": "A", "initialMessage": "Hi."}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {p.auth_token}",
+        )
+        started = self.client.post("/api/study/session/start/", **kwargs)
+        self.assertEqual(started.status_code, 200, started.content)
+        kwargs["data"] = json.dumps({"studySessionId": started.json()["studySessionId"]})
+        resumed = self.client.post("/api/study/session/start/", **kwargs)
+        self.assertEqual(resumed.status_code, 200, resumed.content)
+        stored = Conversation.objects.get(participant=p).messages[0]["meta"]
+        self.assertIsInstance(stored, list)
+        for r in (started, resumed):
+            self.assertEqual(
+                r.json()["messages"][0]["meta"], {"role": "agent", "on_text": True}
+            )
+
     def test_session_complete_deprecated(self):
         r = self.client.post(
             "/api/study/session/complete/",
@@ -375,6 +416,54 @@ class StudyApiTests(TestCase):
         )
         self.assertEqual(r.status_code, 401)
 
+    def test_login_rehashes_legacy_pin_hash(self):
+        from django.contrib.auth.hashers import identify_hasher, make_password
+
+        reg = json.loads(
+            self.client.post(
+                "/api/study/register/",
+                data=_register_payload("TEST-G", pin="2468"),
+                content_type="application/json",
+            ).content
+        )
+        p = Participant.objects.get(id=reg["participantId"])
+        self.assertEqual(identify_hasher(p.pin_hash).algorithm, "study_pin_pbkdf2")
+        p.pin_hash = make_password("2468")  # Django default (pre-StudyPinHasher rows)
+        p.save(update_fields=["pin_hash"])
+
+        with override_settings(STUDY_PIN_HASH_ITERATIONS=1000):
+            r = self.client.post(
+                "/api/study/login/",
+                data=json.dumps({"loginCode": reg["loginCode"], "pin": "2468"}),
+                content_type="application/json",
+            )
+        self.assertEqual(r.status_code, 200)
+        p.refresh_from_db()
+        self.assertTrue(p.pin_hash.startswith("study_pin_pbkdf2$1000$"))
+
+    @override_settings(STUDY_LOGIN_MAX_FAILURES=2, STUDY_LOGIN_FAILURE_WINDOW_SECONDS=60)
+    def test_login_lockout_after_failures(self):
+        reg = json.loads(
+            self.client.post(
+                "/api/study/register/",
+                data=_register_payload("TEST-G", pin="1357"),
+                content_type="application/json",
+            ).content
+        )
+
+        def attempt(pin):
+            return self.client.post(
+                "/api/study/login/",
+                data=json.dumps({"loginCode": reg["loginCode"], "pin": pin}),
+                content_type="application/json",
+            )
+
+        self.assertEqual(attempt("0000").status_code, 401)
+        self.assertEqual(attempt("0000").status_code, 401)
+        locked = attempt("1357")
+        self.assertEqual(locked.status_code, 429)
+        self.assertEqual(locked["Retry-After"], "60")
+
 
 @override_settings(
     STUDY_PIN_MIN_LENGTH=4,
@@ -398,3 +487,1414 @@ class StudyValidationTests(TestCase):
         self.assertTrue(comprehension_provided({"a": "text"}))
         self.assertFalse(comprehension_provided({"a": ""}))
         self.assertFalse(comprehension_provided({}))
+
+
+async def _read_like_asgi(response):
+    """Body as the ASGI handler sends it (async iteration), plus any warnings raised."""
+    import warnings
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        body = b"".join([part async for part in response])
+    return body.decode("utf-8"), [str(w.message) for w in caught]
+
+
+class SurveyResponseExportTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC,
+            auth_token=secrets.token_urlsafe(32),
+            login_code="ABCDEFGHJK",
+        )
+        bootstrap_study_sessions(p)
+        ss = StudySession.objects.get(participant=p, week_index=1, slot_index=1)
+        for sn, ver in ((1, "full"), (2, "mini")):
+            for iid, val in (("CAIQ_02", 4), ("PANAS_PA2", 2)):
+                SurveyResponse.objects.create(
+                    study_session=ss,
+                    participant=p,
+                    participant_code=p.login_code,
+                    condition=p.condition,
+                    session_number=sn,
+                    survey_version=ver,
+                    item_id=iid,
+                    item_text="text, with comma",
+                    value=val,
+                )
+        self.staff = get_user_model().objects.create_user("staff", password="pw", is_staff=True)
+
+    def _rows(self, response):
+        import csv
+        import io
+
+        body = b"".join(response.streaming_content).decode("utf-8")
+        return list(csv.DictReader(io.StringIO(body)))
+
+    def test_requires_staff(self):
+        r = self.client.get("/api/export/survey-responses/")
+        self.assertEqual(r.status_code, 302)
+
+    def test_streams_filtered_csv(self):
+        self.client.force_login(self.staff)
+        r = self.client.get("/api/export/survey-responses/")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.streaming)
+        rows = self._rows(r)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["item_text"], "text, with comma")
+
+        r2 = self.client.get("/api/export/survey-responses/?surveyVersion=mini&sessionNumber=2")
+        rows2 = self._rows(r2)
+        self.assertEqual(len(rows2), 2)
+        self.assertTrue(all(row["survey_version"] == "mini" for row in rows2))
+
+    async def test_streams_under_asgi_without_buffering(self):
+        import csv
+        import io
+
+        await self.async_client.aforce_login(self.staff)
+        r = await self.async_client.get("/api/export/survey-responses/")
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.is_async)
+        body, warned = await _read_like_asgi(r)
+        self.assertFalse([w for w in warned if "StreamingHttpResponse" in w], warned)
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(body)))), 4)
+
+    async def test_batches_are_pulled_lazily(self):
+        from .exports import aiter_in_batches
+
+        pulled = []
+
+        def lines():
+            for i in range(5):
+                pulled.append(i)
+                yield f"{i}\n"
+
+        stream = aiter_in_batches(lines(), batch_size=2)
+        self.assertEqual(await stream.__anext__(), "0\n1\n")
+        self.assertEqual(pulled, [0, 1])
+        self.assertEqual([chunk async for chunk in stream], ["2\n3\n", "4\n"])
+
+    def test_command_writes_csv(self):
+        import csv
+        import io
+        import os
+        import tempfile
+
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.csv")
+            call_command("export_survey_responses", output=path, condition="generic", stderr=io.StringIO())
+            with open(path, newline="", encoding="utf-8") as fh:
+                rows = list(csv.DictReader(fh))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["participant_code"], "ABCDEFGHJK")
+
+    def test_command_writes_parquet(self):
+        import importlib.util
+        import io
+        import os
+        import tempfile
+
+        from django.core.management import call_command
+
+        if importlib.util.find_spec("pyarrow") is None:
+            self.skipTest("pyarrow not installed")
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.parquet")
+            call_command(
+                "export_survey_responses",
+                output=path,
+                format="parquet",
+                chunk_size=3,
+                stderr=io.StringIO(),
+            )
+            table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 4)
+        self.assertEqual(table.column("value").to_pylist(), [4, 2, 4, 2])
+
+
+class TranscriptExportTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.staff = get_user_model().objects.create_user("staff", password="pw", is_staff=True)
+        for n in range(3):
+            p = Participant.objects.create(
+                condition=Participant.Condition.PERSONALIZED if n else Participant.Condition.GENERIC,
+                auth_token=secrets.token_urlsafe(32),
+                login_code=f"CODE{n}",
+            )
+            bootstrap_study_sessions(p)
+            convo = Conversation.objects.create(
+                user_name="A",
+                character="po",
+                participant=p,
+                messages=[
+                    {"sender": "assistant", "content": "Olá!", "meta": {"role": "agent"}},
+                    {"sender": "user", "content": "hi", "meta": {"role": "child"}},
+                ],
+            )
+            StudySession.objects.filter(participant=p, week_index=1, slot_index=1).update(
+                conversation=convo, active_seconds=30 + n, end_reason="completed_content"
+            )
+
+    def test_records_keyset_pagination_and_content_flags(self):
+        from .exports import iter_transcript_records
+
+        records = list(iter_transcript_records(chunk_size=2))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(len({r["studySessionId"] for r in records}), 3)
+        self.assertEqual(records[0]["messages"][0]["content"], "Olá!")
+
+        no_content = list(iter_transcript_records(include_content=False))
+        self.assertNotIn("content", no_content[0]["messages"][0])
+        self.assertEqual(no_content[0]["messages"][0]["sender"], "assistant")
+
+        meta_only = list(iter_transcript_records(include_messages=False, condition="generic"))
+        self.assertEqual(len(meta_only), 1)
+        self.assertNotIn("messages", meta_only[0])
+        self.assertEqual(meta_only[0]["activeSeconds"], 30)
+
+    def test_endpoint_ndjson_and_csv(self):
+        import csv
+        import io
+
+        self.client.force_login(self.staff)
+        r = self.client.get("/api/export/transcripts/")
+        self.assertEqual(r.status_code, 200)
+        lines = b"".join(r.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])["weekIndex"], 1)
+
+        r_csv = self.client.get("/api/export/transcripts/?format=csv&includeContent=false")
+        rows = list(csv.DictReader(io.StringIO(b"".join(r_csv.streaming_content).decode("utf-8"))))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["content"], "")
+        self.assertEqual(rows[1]["turn_index"], "1")
+
+    async def test_endpoint_streams_under_asgi_without_buffering(self):
+        await self.async_client.aforce_login(self.staff)
+        for query, expected_lines in (("", 3), ("?format=csv", 7)):
+            r = await self.async_client.get(f"/api/export/transcripts/{query}")
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r.is_async)
+            body, warned = await _read_like_asgi(r)
+            self.assertFalse([w for w in warned if "StreamingHttpResponse" in w], warned)
+            self.assertEqual(len(body.splitlines()), expected_lines)
+
+
+class ParticipantSummaryTests(TestCase):
+    def test_rebuild_from_sessions(self):
+        import io
+
+        from django.core.management import call_command
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC,
+            auth_token=secrets.token_urlsafe(32),
+        )
+        other = Participant.objects.create(
+            condition=Participant.Condition.PERSONALIZED,
+            auth_token=secrets.token_urlsafe(32),
+        )
+        bootstrap_study_sessions(p)
+        bootstrap_study_sessions(other)
+        now = timezone.now()
+        StudySession.objects.filter(participant=p, week_index=1, slot_index=1).update(
+            status=StudySession.Status.COMPLETED,
+            active_seconds=100,
+            ended_at=now - timezone.timedelta(days=1),
+            survey_scores={"version": "full"},
+        )
+        StudySession.objects.filter(participant=p, week_index=1, slot_index=2).update(
+            status=StudySession.Status.COMPLETED,
+            active_seconds=50,
+            ended_at=now,
+            survey_scores={"version": "mini"},
+        )
+        StudySession.objects.filter(participant=p, week_index=1, slot_index=3).update(
+            status=StudySession.Status.IN_PROGRESS, active_seconds=7
+        )
+
+        call_command("rebuild_participant_summaries", stdout=io.StringIO())
+
+        summary = ParticipantSummary.objects.get(participant=p)
+        self.assertEqual(summary.sessions_completed, 2)
+        self.assertEqual(summary.total_active_seconds, 157)
+        self.assertEqual(summary.latest_session_number, 2)
+        self.assertEqual(summary.latest_survey_scores, {"version": "mini"})
+        empty = ParticipantSummary.objects.get(participant=other)
+        self.assertEqual(empty.sessions_completed, 0)
+        self.assertIsNone(empty.latest_survey_scores)
+
+    @override_settings(
+        STUDY_START_DATE="1990-01-01",
+        STUDY_TIMEZONE="UTC",
+        STUDY_TOTAL_WEEKS=2,
+        STUDY_ABANDON_AFTER_SECONDS=60,
+    )
+    def test_heartbeat_and_sweep_update_summary_incrementally(self):
+        from .study_services import add_active_seconds, sweep_session_locks
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(p)
+        ParticipantSummary.objects.create(participant=p)
+        ss = StudySession.objects.get(participant=p, week_index=1, slot_index=1)
+        ss.status = StudySession.Status.IN_PROGRESS
+        ss.started_at = ss.last_activity_at = timezone.now() - timezone.timedelta(minutes=5)
+        ss.save()
+
+        add_active_seconds(ss, 30)
+        add_active_seconds(ss, 15)
+        summary = ParticipantSummary.objects.get(participant=p)
+        self.assertEqual(summary.total_active_seconds, 45)
+
+        self.assertEqual(sweep_session_locks().abandoned, 1)
+        summary.refresh_from_db()
+        self.assertEqual(summary.sessions_abandoned, 1)
+        self.assertEqual(summary.sessions_completed, 0)
+        self.assertEqual(
+            StudySession.objects.get(participant=p, week_index=1, slot_index=2).status,
+            StudySession.Status.AVAILABLE,
+        )
+
+        # Incremental values agree with a rebuild from the sessions.
+        before = ParticipantSummary.objects.values(
+            "sessions_completed", "sessions_abandoned", "total_active_seconds"
+        ).get(participant=p)
+        refresh_participant_summaries([p.id])
+        after = ParticipantSummary.objects.values(
+            "sessions_completed", "sessions_abandoned", "total_active_seconds"
+        ).get(participant=p)
+        self.assertEqual(before, after)
+
+    @override_settings(STUDY_START_DATE="1990-01-01", STUDY_TIMEZONE="UTC", STUDY_TOTAL_WEEKS=2)
+    def test_progress_reuses_applied_availability(self):
+        from unittest import mock
+
+        from .study_services import progress_dict
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        first = progress_dict(p)
+        summary = ParticipantSummary.objects.get(participant=p)
+        self.assertEqual(summary.availability_week_index, first["releasedWeekIndex"])
+        # Summary marker + session rows; no bootstrap or availability writes.
+        with self.assertNumQueries(2):
+            again = progress_dict(p)
+        self.assertEqual(again["sessions"], first["sessions"])
+
+        # A new release (or a rebuilt summary) re-applies availability once.
+        with mock.patch(
+            "chat.study_services.refresh_session_availability",
+            wraps=refresh_session_availability,
+        ) as refresh:
+            refresh_participant_summaries([p.id])
+            progress_dict(p)
+            progress_dict(p)
+        self.assertEqual(refresh.call_count, 1)
+
+
+class StudySessionIndexTests(TestCase):
+    """The hot-path lookups should be planned against the composite/partial indexes."""
+
+    def setUp(self):
+        self.participant = Participant.objects.create(
+            condition="generic", auth_token=secrets.token_urlsafe(16)
+        )
+        bootstrap_study_sessions(self.participant)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def test_current_session_lookup_uses_status_index(self):
+        plan = (
+            StudySession.objects.filter(
+                participant=self.participant, status=StudySession.Status.AVAILABLE
+            )
+            .order_by("week_index", "slot_index")
+            .explain()
+        )
+        self.assertIn("chat_ss_participant_status", plan)
+        self.assertNotIn("TEMP B-TREE", plan.upper())
+
+    def test_conversation_lookup_uses_partial_index(self):
+        plan = StudySession.objects.filter(
+            participant=self.participant,
+            conversation_id="00000000-0000-0000-0000-000000000000",
+            status=StudySession.Status.IN_PROGRESS,
+        ).explain()
+        self.assertNotIn("SCAN chat_studysession", plan)
+        if connection.vendor == "postgresql":
+            # SQLite only matches a partial index against literal WHERE terms, not bound params.
+            self.assertIn("chat_ss_in_progress_convo", plan)
+
+
+class StudyScheduleTests(TestCase):
+    def _at(self, *args, tz="UTC"):
+        import zoneinfo
+        from datetime import datetime
+
+        return datetime(*args, tzinfo=zoneinfo.ZoneInfo(tz))
+
+    @override_settings(STUDY_START_DATE="2026-03-02", STUDY_TIMEZONE="UTC", STUDY_TOTAL_WEEKS=3)
+    def test_release_boundaries(self):
+        from .study_schedule import get_schedule
+
+        schedule = get_schedule()
+        self.assertEqual(schedule.released_week_index(self._at(2026, 3, 1, 23, 59)), 0)
+        self.assertEqual(schedule.next_release_at(self._at(2026, 3, 1)), self._at(2026, 3, 2))
+        self.assertEqual(schedule.released_week_index(self._at(2026, 3, 2)), 1)
+        self.assertEqual(schedule.released_week_index(self._at(2026, 3, 15, 12)), 2)
+        self.assertEqual(
+            schedule.seconds_until_next_release(self._at(2026, 3, 15, 12)), 12 * 3600
+        )
+        self.assertIsNone(schedule.next_release_at(self._at(2026, 3, 16)))
+
+    @override_settings(
+        STUDY_START_DATE="2026-03-02", STUDY_TIMEZONE="America/New_York", STUDY_TOTAL_WEEKS=3
+    )
+    def test_release_stays_at_local_midnight_across_dst(self):
+        from .study_schedule import get_schedule
+
+        nxt = get_schedule().next_release_at(self._at(2026, 3, 10, tz="America/New_York"))
+        self.assertEqual((nxt.hour, nxt.minute), (0, 0))
+        self.assertEqual(nxt.utcoffset().total_seconds(), -4 * 3600)
+
+    def test_settings_change_rebuilds_schedule(self):
+        from .study_schedule import get_schedule
+
+        with override_settings(STUDY_TOTAL_WEEKS=5):
+            self.assertEqual(get_schedule().total_weeks, 5)
+            self.assertIs(get_schedule(), get_schedule())
+        with override_settings(STUDY_TOTAL_WEEKS=2):
+            self.assertEqual(get_schedule().total_weeks, 2)
+
+    @override_settings(STUDY_START_DATE="2999-01-04", STUDY_TIMEZONE="UTC", STUDY_TOTAL_WEEKS=3)
+    def test_schedule_endpoint_cache_lifetime(self):
+        r = Client().get("/api/study/schedule/")
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual(data["releasedWeekIndex"], 0)
+        self.assertTrue(data["nextReleaseAt"].startswith("2999-01-04T00:00:00"))
+        self.assertIn(f"max-age={data['secondsUntilNextRelease']}", r["Cache-Control"])
+        self.assertIn("public", r["Cache-Control"])
+
+    @override_settings(STUDY_START_DATE="1990-01-01", STUDY_TIMEZONE="UTC", STUDY_TOTAL_WEEKS=2)
+    def test_progress_reports_no_further_release(self):
+        from .study_services import progress_dict
+
+        participant = Participant.objects.create(
+            condition="generic", auth_token=secrets.token_urlsafe(16)
+        )
+        payload = progress_dict(participant)
+        self.assertGreaterEqual(payload["releasedWeekIndex"], 2)
+        self.assertIsNone(payload["nextReleaseAt"])
+        self.assertIsNone(payload["secondsUntilNextRelease"])
+
+
+class StudyConfigRegistryTests(TestCase):
+    @override_settings(STUDY_CODES_PERSONALIZED="P1, SHARED", STUDY_CODES_GENERIC="G1,SHARED")
+    def test_enrollment_codes(self):
+        from .study_config import resolve_enrollment_code
+
+        self.assertEqual(resolve_enrollment_code(" P1 "), "personalized")
+        self.assertEqual(resolve_enrollment_code("G1"), "generic")
+        self.assertEqual(resolve_enrollment_code("SHARED"), "personalized")
+        self.assertIsNone(resolve_enrollment_code("nope"))
+        self.assertIsNone(resolve_enrollment_code(""))
+
+    def test_profiles_are_cached_and_follow_settings(self):
+        from .study_config import get_profile, reload_study_config
+
+        with override_settings(
+            STUDY_DEV_SESSION_CAP_SECONDS=0, STUDY_PROFILE_PERSONALIZED_MAX_SESSION_MINUTES=15
+        ):
+            first = get_profile("personalized")
+            self.assertEqual(first.max_session_wall_minutes, 15.0)
+            self.assertIs(get_profile("personalized"), first)
+            with override_settings(STUDY_PROFILE_PERSONALIZED_MAX_SESSION_MINUTES=25):
+                self.assertEqual(get_profile("personalized").max_session_wall_minutes, 25.0)
+            self.assertEqual(get_profile("personalized").max_session_wall_minutes, 15.0)
+            self.assertFalse(get_profile("unknown-arm").memory_enabled)
+            self.assertIsNot(reload_study_config().profiles["personalized"], first)
+
+
+@override_settings(
+    STUDY_START_DATE="1990-01-01",
+    STUDY_TIMEZONE="UTC",
+    STUDY_TOTAL_WEEKS=2,
+    STUDY_PROFILE_PERSONALIZED_MAX_SESSION_MINUTES=30,
+    STUDY_PROFILE_GENERIC_MAX_SESSION_MINUTES=20,
+    STUDY_DEV_SESSION_CAP_SECONDS=0,
+    STUDY_ABANDON_AFTER_SECONDS=3600,
+)
+class LockSweepTests(TestCase):
+    def _in_progress(self, condition, started_minutes_ago, idle_minutes):
+        p = Participant.objects.create(condition=condition, auth_token=secrets.token_urlsafe(16))
+        bootstrap_study_sessions(p)
+        refresh_session_availability(p)
+        ss = StudySession.objects.get(participant=p, week_index=1, slot_index=1)
+        now = timezone.now()
+        ss.status = StudySession.Status.IN_PROGRESS
+        ss.started_at = now - timezone.timedelta(minutes=started_minutes_ago)
+        ss.last_activity_at = now - timezone.timedelta(minutes=idle_minutes)
+        ss.save()
+        return p, ss
+
+    def test_sweep_stamps_caps_per_arm_and_abandons_idle(self):
+        from .study_services import chat_should_lock, sweep_session_locks
+
+        _, generic_over = self._in_progress("generic", 25, 1)
+        _, personalized_under = self._in_progress("personalized", 25, 1)
+        idle_participant, idle = self._in_progress("generic", 90, 61)
+
+        result = sweep_session_locks()
+        self.assertEqual(result.time_capped, 2)
+        self.assertEqual(result.abandoned, 1)
+
+        generic_over.refresh_from_db()
+        personalized_under.refresh_from_db()
+        idle.refresh_from_db()
+        self.assertIsNotNone(generic_over.time_cap_triggered_at)
+        self.assertIsNone(personalized_under.time_cap_triggered_at)
+        self.assertEqual(idle.status, StudySession.Status.ABANDONED)
+        self.assertEqual(idle.end_reason, "abandoned")
+        next_slot = StudySession.objects.get(participant=idle_participant, week_index=1, slot_index=2)
+        self.assertEqual(next_slot.status, StudySession.Status.AVAILABLE)
+
+        # Request path: the stored stamp alone decides.
+        self.assertEqual(chat_should_lock(generic_over, generic_over.participant), "time_cap")
+        self.assertIsNone(chat_should_lock(personalized_under, personalized_under.participant))
+
+        again = sweep_session_locks()
+        self.assertEqual((again.time_capped, again.abandoned), (0, 0))
+
+    @override_settings(STUDY_ABANDON_AFTER_SECONDS=0)
+    def test_abandonment_disabled_by_default(self):
+        from .study_services import sweep_session_locks
+
+        _, idle = self._in_progress("generic", 10, 9)
+        self.assertEqual(sweep_session_locks().abandoned, 0)
+        idle.refresh_from_db()
+        self.assertEqual(idle.status, StudySession.Status.IN_PROGRESS)
+
+
+@override_settings(
+    STUDY_CODES_GENERIC="TEST-G",
+    STUDY_START_DATE="1990-01-01",
+    STUDY_TIMEZONE="UTC",
+    STUDY_TOTAL_WEEKS=2,
+    STUDY_PROFILE_GENERIC_MAX_SESSION_MINUTES=20,
+    STUDY_DEV_SESSION_CAP_SECONDS=0,
+    STUDY_INACTIVITY_SECONDS=600,
+)
+class LockDeadlineTests(TestCase):
+    def test_start_and_touch_store_deadlines(self):
+        from .study_services import (
+            chat_should_lock,
+            seconds_until_wall_lock,
+            sessions_locking_before,
+            touch_activity,
+        )
+
+        reg = self.client.post(
+            "/api/study/register/", data=_register_payload("TEST-G"), content_type="application/json"
+        ).json()
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {reg['authToken']}"}
+        start = self.client.post(
+            "/api/study/session/start/", data="{}", content_type="application/json", **auth
+        ).json()
+        ss = StudySession.objects.get(id=start["studySessionId"])
+        self.assertEqual(ss.wall_lock_at - ss.started_at, timezone.timedelta(minutes=20))
+        self.assertEqual(ss.inactive_lock_at - ss.last_activity_at, timezone.timedelta(seconds=600))
+        self.assertAlmostEqual(seconds_until_wall_lock(ss, ss.participant), 1200, delta=2)
+
+        ss.inactive_lock_at = timezone.now() - timezone.timedelta(seconds=1)
+        ss.save(update_fields=["inactive_lock_at"])
+        self.assertEqual(chat_should_lock(ss, ss.participant), "inactive_timeout")
+        self.assertIn(ss, sessions_locking_before(timezone.now()))
+
+        touch_activity(ss)
+        ss.refresh_from_db()
+        self.assertIsNone(chat_should_lock(ss, ss.participant))
+        self.assertNotIn(ss, sessions_locking_before(timezone.now()))
+        self.assertIn(ss, sessions_locking_before(timezone.now() + timezone.timedelta(minutes=11)))
+
+        ss.wall_lock_at = timezone.now()
+        ss.save(update_fields=["wall_lock_at"])
+        self.assertEqual(chat_should_lock(ss, ss.participant), "time_cap")
+
+
+@override_settings(
+    STUDY_START_DATE="1990-01-01",
+    STUDY_TIMEZONE="UTC",
+    STUDY_TOTAL_WEEKS=2,
+    STUDY_PROFILE_GENERIC_MAX_SESSION_MINUTES=20,
+    STUDY_DEV_SESSION_CAP_SECONDS=0,
+    STUDY_EVENTS_MAX_SECONDS=0,
+)
+class StudyEventsTests(TestCase):
+    def _state(self, **kw):
+        from .study_events import SessionState
+
+        base = dict(
+            session_id="s1",
+            lock_reason=None,
+            seconds_until_lock=600,
+            wall_lock_at=None,
+            inactive_lock_at=None,
+            released_week_index=1,
+            next_release_at=None,
+        )
+        base.update(kw)
+        return SessionState(**base)
+
+    def test_diff_events(self):
+        from .study_events import diff_events
+
+        names = lambda evs: [e for e, _ in evs]  # noqa: E731
+        self.assertEqual(names(diff_events(None, self._state())), ["state"])
+        self.assertEqual(names(diff_events(self._state(), self._state())), ["time-remaining"])
+        locked = self._state(lock_reason="inactive_timeout")
+        self.assertEqual(names(diff_events(self._state(), locked)), ["lock"])
+        self.assertEqual(names(diff_events(locked, locked)), [])
+        self.assertEqual(names(diff_events(locked, self._state())), ["unlock", "time-remaining"])
+        self.assertEqual(
+            names(diff_events(self._state(), self._state(session_id=None, released_week_index=2))),
+            ["week-release", "unlock"],
+        )
+
+    async def test_stream_requires_token_and_sends_snapshot(self):
+        from asgiref.sync import sync_to_async
+
+        r = await self.async_client.get("/api/study/events/")
+        self.assertEqual(r.status_code, 401)
+
+        def make_participant():
+            p = Participant.objects.create(condition="generic", auth_token=secrets.token_urlsafe(16))
+            bootstrap_study_sessions(p)
+            ss = StudySession.objects.get(participant=p, week_index=1, slot_index=1)
+            now = timezone.now()
+            ss.status = StudySession.Status.IN_PROGRESS
+            ss.started_at = now
+            ss.wall_lock_at = now + timezone.timedelta(minutes=20)
+            ss.save()
+            return p, ss
+
+        p, ss = await sync_to_async(make_participant)()
+        # The long-lived bearer token is not accepted in the URL.
+        r = await self.async_client.get("/api/study/events/", {"token": p.auth_token})
+        self.assertEqual(r.status_code, 401)
+        issued = await self.async_client.post(
+            "/api/study/events/token/", headers={"authorization": f"Bearer {p.auth_token}"}
+        )
+        self.assertEqual(issued.status_code, 200)
+        stream_token = issued.json()["streamToken"]
+        self.assertNotIn(p.auth_token, stream_token)
+        r = await self.async_client.get("/api/study/events/", {"stream": stream_token})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["Content-Type"], "text/event-stream")
+        body = "".join([chunk.decode() async for chunk in r.streaming_content])
+        self.assertTrue(body.startswith("retry: "))
+        self.assertIn("event: state\n", body)
+        data = json.loads(body.split("event: state\ndata: ", 1)[1].split("\n", 1)[0])
+        self.assertEqual(data["studySessionId"], str(ss.id))
+        self.assertFalse(data["sessionLocked"])
+        self.assertGreater(data["secondsUntilLock"], 1100)
+
+    def test_poll_releases_db_connection(self):
+        from unittest import mock
+
+        from .study_events import poll_session_state
+
+        p = Participant.objects.create(condition="generic", auth_token=secrets.token_urlsafe(16))
+        with mock.patch("chat.study_events.connection") as conn:
+            conn.in_atomic_block = False
+            self.assertIsNone(poll_session_state(p).session_id)
+            conn.close.assert_called_once_with()
+            conn.in_atomic_block = True
+            poll_session_state(p)
+            conn.close.assert_called_once_with()
+
+    def test_stream_token_expires_and_follows_auth_token(self):
+        from .study_events import issue_stream_token, participant_from_stream_token
+
+        p = Participant.objects.create(condition="generic", auth_token=secrets.token_urlsafe(16))
+        token = issue_stream_token(p)
+        self.assertEqual(participant_from_stream_token(token), p)
+        self.assertIsNone(participant_from_stream_token(token + "x"))
+        self.assertIsNone(participant_from_stream_token(p.auth_token))
+        with override_settings(STUDY_EVENTS_TOKEN_TTL_SECONDS=-1):
+            self.assertIsNone(participant_from_stream_token(token))
+        p.auth_token = secrets.token_urlsafe(16)
+        p.save(update_fields=["auth_token"])
+        self.assertIsNone(participant_from_stream_token(token))
+
+
+@override_settings(
+    STUDY_CODES_GENERIC="TEST-G",
+    STUDY_START_DATE="1990-01-01",
+    STUDY_TIMEZONE="UTC",
+    STUDY_TOTAL_WEEKS=2,
+    STUDY_PIN_MIN_LENGTH=4,
+    STUDY_PIN_MAX_LENGTH=6,
+    STUDY_LOGIN_CODE_LENGTH=10,
+)
+class BulkEnrollmentTests(TestCase):
+    def test_bulk_enroll_matches_single_registration(self):
+        from .study_credentials import verify_pin
+        from .study_enrollment import EnrollmentEntry, bulk_enroll
+
+        enrolled = bulk_enroll(
+            "TEST-G",
+            [EnrollmentEntry("Ana", "1234"), EnrollmentEntry("Rui", "98765")],
+            workers=1,
+        )
+        self.assertEqual(len(enrolled), 2)
+        self.assertEqual(len({e.login_code for e in enrolled}), 2)
+        ana = Participant.objects.get(id=enrolled[0].participant_id)
+        self.assertEqual(ana.condition, "generic")
+        self.assertTrue(verify_pin("1234", ana.pin_hash))
+        self.assertTrue(ParticipantSummary.objects.filter(participant=ana).exists())
+
+        statuses = list(
+            StudySession.objects.filter(participant=ana)
+            .order_by("week_index", "slot_index")
+            .values_list("status", flat=True)
+        )
+        reference = Participant.objects.create(condition="generic", auth_token=secrets.token_urlsafe(16))
+        bootstrap_study_sessions(reference)
+        refresh_session_availability(reference)
+        self.assertEqual(
+            statuses,
+            list(
+                StudySession.objects.filter(participant=reference)
+                .order_by("week_index", "slot_index")
+                .values_list("status", flat=True)
+            ),
+        )
+
+    def test_invalid_input_writes_nothing(self):
+        from .study_enrollment import EnrollmentEntry, bulk_enroll
+
+        with self.assertRaises(ValueError):
+            bulk_enroll("NOPE", [EnrollmentEntry("A", "1234")])
+        with self.assertRaises(ValueError):
+            bulk_enroll("TEST-G", [EnrollmentEntry("A", "1234"), EnrollmentEntry("B", "12")])
+        self.assertFalse(Participant.objects.exists())
+
+    def test_unique_codes_skip_existing(self):
+        from unittest import mock
+
+        from .study_enrollment import generate_unique_login_codes
+
+        Participant.objects.create(condition="generic", auth_token="t", login_code="AAAA")
+        draws = iter(["AAAA", "BBBB", "AAAA", "CCCC"])
+        with mock.patch("chat.study_enrollment.generate_login_code", lambda length=None: next(draws)):
+            self.assertEqual(sorted(generate_unique_login_codes(2)), ["BBBB", "CCCC"])
+
+    def test_pool_hashing(self):
+        from .study_credentials import verify_pin
+        from .study_enrollment import POOL_MIN_PINS, hash_pins
+
+        pins = [f"{1000 + i}" for i in range(POOL_MIN_PINS)]
+        hashes = hash_pins(pins, workers=2)
+        self.assertTrue(all(verify_pin(p, h) for p, h in zip(pins, hashes)))
+        hashes = hash_pins(pins, workers=2, threads=True)
+        self.assertTrue(all(verify_pin(p, h) for p, h in zip(pins, hashes)))
+
+    def test_staff_endpoint(self):
+        from django.contrib.auth import get_user_model
+
+        payload = json.dumps({"enrollmentCode": "TEST-G", "participants": [{"displayName": "Ana"}]})
+        r = self.client.post("/api/study/enroll/bulk/", data=payload, content_type="application/json")
+        self.assertEqual(r.status_code, 302)
+
+        staff = get_user_model().objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        r = self.client.post("/api/study/enroll/bulk/", data=payload, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        row = r.json()["participants"][0]
+        self.assertEqual(len(row["pin"]), 4)
+        login = self.client.post(
+            "/api/study/login/",
+            data=json.dumps({"loginCode": row["loginCode"], "pin": row["pin"]}),
+            content_type="application/json",
+        )
+        self.assertEqual(login.status_code, 200)
+
+    def test_staff_endpoint_requires_csrf_token(self):
+        from django.contrib.auth import get_user_model
+
+        staff = get_user_model().objects.create_user("staff", password="pw", is_staff=True)
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(staff)
+        payload = json.dumps({"enrollmentCode": "TEST-G", "participants": [{"displayName": "Ana"}]})
+        r = client.post("/api/study/enroll/bulk/", data=payload, content_type="application/json")
+        self.assertEqual(r.status_code, 403)
+        self.assertFalse(Participant.objects.exists())
+
+        client.get("/admin/")
+        token = client.cookies["csrftoken"].value
+        r = client.post(
+            "/api/study/enroll/bulk/",
+            data=payload,
+            content_type="application/json",
+            HTTP_X_CSRFTOKEN=token,
+        )
+        self.assertEqual(r.status_code, 200)
+
+    def test_command_writes_login_cards(self):
+        import csv
+        import os
+        import tempfile
+
+        from django.core.management import call_command
+
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "class.csv")
+            out = os.path.join(tmp, "cards.csv")
+            with open(src, "w", encoding="utf-8") as fh:
+                fh.write("display_name,pin\nAna,4321\nRui,\n")
+            call_command("bulk_enroll", "TEST-G", src, "--output", out, "--workers", "1", stderr=io.StringIO())
+            with open(out, encoding="utf-8") as fh:
+                rows = list(csv.DictReader(fh))
+        self.assertEqual([r["display_name"] for r in rows], ["Ana", "Rui"])
+        self.assertEqual(rows[0]["pin"], "4321")
+        self.assertEqual(Participant.objects.count(), 2)
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def test_token_bucket_refills(self):
+        from .throttle import TokenBucket
+
+        bucket = TokenBucket("t", capacity=2, refill_per_second=0.5)
+        self.assertEqual(bucket.take("k", now=100.0), 0.0)
+        self.assertEqual(bucket.take("k", now=100.0), 0.0)
+        self.assertAlmostEqual(bucket.take("k", now=100.0), 2.0)
+        self.assertAlmostEqual(bucket.take("k", now=101.0), 1.0)
+        self.assertEqual(bucket.take("k", now=102.0), 0.0)
+        self.assertEqual(bucket.take("other", now=102.0), 0.0)
+
+    @override_settings(
+        STUDY_THROTTLE_ENABLED=True,
+        STUDY_THROTTLE_IP_BURST=100,
+        STUDY_THROTTLE_CODE_BURST=2,
+        STUDY_THROTTLE_CODE_PER_MINUTE=1,
+    )
+    def test_login_code_bucket_rejects_before_hashing(self):
+        from unittest import mock
+
+        from django.contrib.auth import get_user_model
+
+        Participant.objects.create(
+            condition="generic", auth_token="tok", login_code="ABCDEFGHJK", pin_hash="x"
+        )
+        body = json.dumps({"loginCode": "ABCDEFGHJK", "pin": "1234"})
+        with mock.patch("chat.study_views.verify_pin", return_value=False) as verify:
+            codes = [
+                self.client.post("/api/study/login/", data=body, content_type="application/json").status_code
+                for _ in range(3)
+            ]
+        self.assertEqual(codes, [401, 401, 429])
+        self.assertEqual(verify.call_count, 2)  # the rejected request never reached hashing
+
+        staff = get_user_model().objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        stats = self.client.get("/api/study/throttle-stats/").json()
+        self.assertEqual(stats["login"], {"admitted": 2, "rejected": 1})
+
+    @override_settings(STUDY_THROTTLE_IP_BURST=1, STUDY_THROTTLE_IP_PER_MINUTE=1)
+    def test_ip_bucket_on_register(self):
+        payload = _register_payload("NOT-A-CODE")
+        first = self.client.post("/api/study/register/", data=payload, content_type="application/json")
+        second = self.client.post("/api/study/register/", data=payload, content_type="application/json")
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second["Retry-After"], "60")
+        other = self.client.post(
+            "/api/study/register/",
+            data=payload,
+            content_type="application/json",
+            REMOTE_ADDR="10.0.0.9",
+        )
+        self.assertEqual(other.status_code, 400)
+
+    @override_settings(STUDY_TRUST_X_FORWARDED_FOR=True, STUDY_TRUSTED_PROXY_HOPS=1)
+    def test_forged_forwarded_for_does_not_change_key(self):
+        from django.test import RequestFactory
+
+        from .throttle import client_ip
+
+        rf = RequestFactory()
+        real = rf.post("/", HTTP_X_FORWARDED_FOR="203.0.113.7")
+        forged = rf.post("/", HTTP_X_FORWARDED_FOR="1.2.3.4, 203.0.113.7")
+        self.assertEqual(client_ip(real), "203.0.113.7")
+        self.assertEqual(client_ip(forged), "203.0.113.7")
+        with override_settings(STUDY_TRUSTED_PROXY_HOPS=2):
+            two_hops = rf.post("/", HTTP_X_FORWARDED_FOR="1.2.3.4, 203.0.113.7, 10.0.0.2")
+            self.assertEqual(client_ip(two_hops), "203.0.113.7")
+            self.assertEqual(client_ip(real), "127.0.0.1")
+
+    @override_settings(
+        STUDY_TRUST_X_FORWARDED_FOR=True,
+        STUDY_THROTTLE_IP_BURST=1,
+        STUDY_THROTTLE_IP_PER_MINUTE=1,
+    )
+    def test_forged_forwarded_for_cannot_reset_ip_bucket(self):
+        payload = _register_payload("NOT-A-CODE")
+        statuses = [
+            self.client.post(
+                "/api/study/register/",
+                data=payload,
+                content_type="application/json",
+                HTTP_X_FORWARDED_FOR=f"198.51.100.{i}, 203.0.113.7",
+            ).status_code
+            for i in range(2)
+        ]
+        self.assertEqual(statuses, [400, 429])
+
+
+class SurveyDefinitionTests(TestCase):
+    def test_prebuilt_payloads(self):
+        from .caiq_panas_items import (
+            MINI_CAIQ_IDS,
+            MINI_PANAS_IDS,
+            expected_item_ids,
+            survey_definition,
+            survey_definition_payload,
+        )
+
+        self.assertEqual(expected_item_ids("mini"), [*MINI_CAIQ_IDS, *MINI_PANAS_IDS])
+        self.assertEqual(len(expected_item_ids("full")), 29)
+        for version in ("full", "mini"):
+            definition = survey_definition(version)
+            self.assertEqual(json.loads(definition.body), definition.payload)
+            payload = survey_definition_payload(version)
+            payload["sessionNumber"] = 1
+            self.assertNotIn("sessionNumber", survey_definition(version).payload)
+        self.assertNotEqual(survey_definition("full").etag, survey_definition("mini").etag)
+
+    def test_endpoint_etag_and_not_modified(self):
+        from .caiq_panas_items import survey_definition
+
+        r = self.client.get("/api/study/survey-definition/mini/")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r["ETag"], survey_definition("mini").etag)
+        self.assertIn("public", r["Cache-Control"])
+        self.assertEqual(r.content, survey_definition("mini").body)
+
+        again = self.client.get("/api/study/survey-definition/mini/", HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(self.client.get("/api/study/survey-definition/other/").status_code, 404)
+
+
+class SurveyRescoreTests(TestCase):
+    def _submit(self, participant, week, slot, version, values):
+        from .caiq_panas_items import expected_item_ids
+
+        ss = StudySession.objects.get(participant=participant, week_index=week, slot_index=slot)
+        SurveyResponse.objects.bulk_create(
+            SurveyResponse(
+                study_session=ss,
+                participant=participant,
+                participant_code="X",
+                condition=participant.condition,
+                session_number=1,
+                survey_version=version,
+                item_id=iid,
+                item_text="",
+                value=values[i % len(values)],
+            )
+            for i, iid in enumerate(expected_item_ids(version))
+        )
+        return ss
+
+    def test_batched_scores_match_scalar_statistics(self):
+        import random
+        from statistics import mean
+
+        from .caiq_panas_items import PANAS_FULL_ITEMS, expected_item_ids
+        from .caiq_panas_scoring import compute_scores, response_matrix, score_matrix
+
+        rng = random.Random(7)
+        for version in ("full", "mini"):
+            responses = [
+                {iid: rng.randint(1, 5) for iid in expected_item_ids(version)} for _ in range(50)
+            ]
+            batched = score_matrix(version, response_matrix(version, responses))
+            self.assertEqual(batched, [compute_scores(version, r) for r in responses])
+        responses_full = {iid: rng.randint(1, 5) for iid in expected_item_ids("full")}
+        pa = [responses_full[it.item_id] for it in PANAS_FULL_ITEMS if it.item_id.startswith("PANAS_PA")]
+        na = [responses_full[it.item_id] for it in PANAS_FULL_ITEMS if it.item_id.startswith("PANAS_NA")]
+        scores = compute_scores("full", responses_full)
+        self.assertEqual(scores["overallAffect"], round(mean(pa) - mean(na), 4))
+        with self.assertRaises(ValueError):
+            compute_scores("mini", {})
+
+    def test_rescore_command_checks_and_repairs(self):
+        from django.core.management import CommandError, call_command
+
+        from .caiq_panas_scoring import compute_scores, rescore_sessions
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(p)
+        full = self._submit(p, 1, 1, "full", [4, 2, 5])
+        mini = self._submit(p, 1, 2, "mini", [3, 1])
+        partial = StudySession.objects.get(participant=p, week_index=1, slot_index=3)
+        SurveyResponse.objects.create(
+            study_session=partial, participant=p, participant_code="X", condition="generic",
+            session_number=3, survey_version="mini", item_id="CAIQ_02", item_text="", value=3,
+        )
+        result = rescore_sessions()
+        self.assertEqual(set(result.scores), {full.id, mini.id})
+        self.assertEqual(result.incomplete, [partial.id])
+        mini_answers = dict(mini.survey_responses.values_list("item_id", "value"))
+        self.assertEqual(result.scores[mini.id], compute_scores("mini", mini_answers))
+
+        StudySession.objects.filter(id=mini.id).update(survey_scores=result.scores[mini.id])
+        with self.assertRaises(CommandError):
+            call_command("rescore_surveys", "--check", stdout=io.StringIO())
+        call_command("rescore_surveys", stdout=io.StringIO())
+        call_command("rescore_surveys", "--check", stdout=io.StringIO())
+        full.refresh_from_db()
+        self.assertEqual(full.survey_scores, result.scores[full.id])
+
+
+class SurveySubmitTests(TestCase):
+    def test_refreshed_slots_feed_progress_without_rereading(self):
+        from .study_services import progress_dict
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(p)
+        StudySession.objects.filter(participant=p, week_index=1, slot_index=1).update(
+            status=StudySession.Status.COMPLETED
+        )
+        slots = refresh_session_availability(p, released=1)
+        self.assertEqual([s.status for s in slots[:3]], ["completed", "available", "locked"])
+        self.assertEqual(
+            list(
+                StudySession.objects.filter(participant=p, week_index=1)
+                .order_by("slot_index")
+                .values_list("status", flat=True)
+            ),
+            ["completed", "available", "locked"],
+        )
+        with self.assertNumQueries(0):
+            reused = progress_dict(p, slots=slots)
+        self.assertEqual(reused["focusSlotIndex"], 2)
+        self.assertEqual(reused["sessions"], progress_dict(p)["sessions"])
+
+    def test_scoring_error_is_a_400_and_writes_nothing(self):
+        from unittest import mock
+
+        from .caiq_panas_items import expected_item_ids
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(p)
+        ss = StudySession.objects.get(participant=p, week_index=1, slot_index=1)
+        ss.status = StudySession.Status.IN_PROGRESS
+        ss.started_at = ss.reading_questionnaire_submitted_at = timezone.now()
+        ss.save()
+        answers = [{"itemId": iid, "value": 3} for iid in expected_item_ids("full")]
+        with mock.patch(
+            "chat.study_views.compute_scores", side_effect=ValueError("missing item CAIQ_01")
+        ):
+            r = self.client.post(
+                "/api/study/session/caiq-panas/",
+                data=json.dumps({"studySessionId": str(ss.id), "answers": answers}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {p.auth_token}",
+            )
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(r.json()["error"], "missing item CAIQ_01")
+        ss.refresh_from_db()
+        self.assertEqual(ss.status, StudySession.Status.IN_PROGRESS)
+        self.assertIsNone(ss.caiq_panas_submitted_at)
+        self.assertFalse(SurveyResponse.objects.filter(study_session=ss).exists())
+
+    def test_expected_id_set_rejects_missing_and_extra_items(self):
+        from .caiq_panas_items import expected_item_id_set, expected_item_ids
+
+        self.assertEqual(expected_item_id_set("mini"), frozenset(expected_item_ids("mini")))
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(p)
+        ss = StudySession.objects.get(participant=p, week_index=1, slot_index=1)
+        StudySession.objects.filter(id=ss.id).update(
+            status=StudySession.Status.IN_PROGRESS,
+            started_at=timezone.now(),
+            reading_questionnaire_submitted_at=timezone.now(),
+        )
+        answers = [{"itemId": iid, "value": 2} for iid in expected_item_ids("full")]
+        for bad in (answers[1:], answers + [{"itemId": "CAIQ_99", "value": 2}]):
+            r = self.client.post(
+                "/api/study/session/caiq-panas/",
+                data=json.dumps({"studySessionId": str(ss.id), "answers": bad}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"Bearer {p.auth_token}",
+            )
+            self.assertEqual(r.status_code, 400)
+        self.assertFalse(SurveyResponse.objects.filter(study_session=ss).exists())
+        ss.refresh_from_db()
+        self.assertEqual(ss.status, StudySession.Status.IN_PROGRESS)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.convo = Conversation.objects.create(user_name="A", character="po", messages=[])
+
+    def _save(self, key, content="hi", **extra):
+        return self.client.post(
+            "/api/save-message/",
+            data=json.dumps({"conversationId": str(self.convo.id), "sender": "user", "content": content}),
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+            **extra,
+        )
+
+    def test_replayed_save_message_appends_once(self):
+        first = self._save("k-1")
+        again = self._save("k-1")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(json.loads(again.content), json.loads(first.content))
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertFalse(first.has_header("Idempotent-Replayed"))
+        self.convo.refresh_from_db()
+        self.assertEqual(len(self.convo.messages), 1)
+
+        self.assertEqual(self._save("k-1", content="other").status_code, 422)
+        self._save("k-2")
+        self.client.post(
+            "/api/save-message/",
+            data=json.dumps({"conversationId": str(self.convo.id), "sender": "user", "content": "x"}),
+            content_type="application/json",
+        )
+        self.convo.refresh_from_db()
+        self.assertEqual(len(self.convo.messages), 3)
+
+    def test_errors_release_the_key_and_pending_claims_conflict(self):
+        from datetime import timedelta
+
+        from .models import IdempotencyRecord
+
+        Conversation.objects.filter(id=self.convo.id).delete()
+        self.assertEqual(self._save("k-err").status_code, 404)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+        self.convo = Conversation.objects.create(user_name="A", character="po", messages=[])
+        IdempotencyRecord.objects.create(
+            scope="save-message",
+            key="k-busy",
+            fingerprint="x",
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        # Fingerprint mismatch on a live claim; once it goes stale the key is reusable.
+        self.assertEqual(self._save("k-busy").status_code, 422)
+        IdempotencyRecord.objects.filter(key="k-busy").update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(self._save("k-busy").status_code, 200)
+
+    def test_pending_same_request_gets_409_and_purge(self):
+        from datetime import timedelta
+
+        from django.core.management import call_command
+        from django.test import RequestFactory
+
+        from .idempotency import request_fingerprint
+        from .models import IdempotencyRecord
+
+        body = json.dumps({"conversationId": str(self.convo.id), "sender": "user", "content": "hi"})
+        fp = request_fingerprint(
+            RequestFactory().post("/api/save-message/", data=body, content_type="application/json")
+        )
+        IdempotencyRecord.objects.create(
+            scope="save-message", key="k-wait", fingerprint=fp,
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        r = self._save("k-wait")
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r["Retry-After"], "1")
+
+        IdempotencyRecord.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = io.StringIO()
+        call_command("purge_idempotency_records", stdout=out)
+        self.assertIn("Deleted 1", out.getvalue())
+
+    @override_settings(
+        STUDY_IDEMPOTENCY_STALE_SECONDS=10,
+        CHAT_OPENAI_TIMEOUT_SECONDS=30,
+        CHAT_OPENAI_MAX_RETRIES=1,
+    )
+    def test_stale_window_outlasts_openai_budget(self):
+        from datetime import timedelta
+
+        from .models import IdempotencyRecord
+
+        IdempotencyRecord.objects.create(
+            scope="save-message",
+            key="k-slow",
+            fingerprint="x",
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        # 100 s is past the configured 10 s but inside 2 x 30 s + margin.
+        IdempotencyRecord.objects.filter(key="k-slow").update(
+            created_at=timezone.now() - timedelta(seconds=100)
+        )
+        self.assertEqual(self._save("k-slow").status_code, 422)
+        self.convo.refresh_from_db()
+        self.assertEqual(self.convo.messages, [])
+
+    def test_lost_claim_still_answers_and_keeps_new_owner(self):
+        from datetime import timedelta
+
+        from django.http import JsonResponse
+        from django.test import RequestFactory
+
+        from .idempotency import idempotent
+        from .models import IdempotencyRecord
+
+        def view(request):
+            # Another attempt takes the claim over while this one is running.
+            IdempotencyRecord.objects.filter(key="k-lost").update(
+                created_at=timezone.now() + timedelta(seconds=1), fingerprint="other"
+            )
+            return JsonResponse({"ok": True})
+
+        request = RequestFactory().post(
+            "/x/", data="{}", content_type="application/json", HTTP_IDEMPOTENCY_KEY="k-lost"
+        )
+        response = idempotent("test")(view)(request)
+        self.assertEqual(response.status_code, 200)
+        record = IdempotencyRecord.objects.get(key="k-lost")
+        self.assertIsNone(record.status_code)
+        self.assertEqual(record.fingerprint, "other")
+
+        IdempotencyRecord.objects.all().delete()
+        response = idempotent("test")(view)(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(IdempotencyRecord.objects.exists())
+
+    @override_settings(
+        STUDY_CODES_GENERIC="TEST-G", STUDY_START_DATE="1990-01-01", STUDY_TIMEZONE="UTC"
+    )
+    def test_session_start_replay(self):
+        p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(p)
+        refresh_session_availability(p)
+        kwargs = dict(
+            data=json.dumps({"userName": "A", "initialMessage": "Olá"}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {p.auth_token}",
+            HTTP_IDEMPOTENCY_KEY="start-1",
+        )
+        first = self.client.post("/api/study/session/start/", **kwargs)
+        again = self.client.post("/api/study/session/start/", **kwargs)
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertEqual(json.loads(again.content), json.loads(first.content))
+        self.assertEqual(Conversation.objects.filter(participant=p).count(), 1)
+
+    def test_chat_api_view_stores_drf_response(self):
+        kwargs = dict(
+            data=json.dumps({"message": ""}),
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY="chat-1",
+        )
+        first = self.client.post("/api/chat/", **kwargs)
+        again = self.client.post("/api/chat/", **kwargs)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(json.loads(again.content), json.loads(first.content))
+
+
+class ConversationArchiveTests(TestCase):
+    def setUp(self):
+        self.p = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        bootstrap_study_sessions(self.p)
+        self.messages = [
+            {"sender": "assistant", "content": "Olá! Já leste o capítulo?", "meta": {"role": "agent"}},
+            {"sender": "user", "content": "sim", "meta": {"role": "child"}},
+        ]
+        self.old = Conversation.objects.create(
+            user_name="A", character="po", participant=self.p, messages=self.messages
+        )
+        self.recent = Conversation.objects.create(
+            user_name="A", character="po", participant=self.p, messages=self.messages
+        )
+        self.legacy = Conversation.objects.create(user_name="A", character="po", messages=self.messages)
+        now = timezone.now()
+        for slot, convo, ended in ((1, self.old, 40), (2, self.recent, 1)):
+            StudySession.objects.filter(participant=self.p, week_index=1, slot_index=slot).update(
+                conversation=convo,
+                status=StudySession.Status.COMPLETED,
+                ended_at=now - timezone.timedelta(days=ended),
+            )
+
+    def test_archive_and_transparent_reads(self):
+        from .analytics import load_audit_columns
+        from .archive import archive_conversations
+        from .exports import iter_transcript_records
+
+        result = archive_conversations(days=30)
+        self.assertEqual(result.conversations, 1)
+        self.assertLess(result.stored_bytes, result.raw_bytes + 64)
+
+        old = Conversation.objects.get(id=self.old.id)
+        self.assertIsNotNone(old.archived_at)
+        self.assertEqual(old.messages, [])
+        self.assertEqual(old.load_messages(), self.messages)
+        self.assertIsNone(Conversation.objects.get(id=self.recent.id).archived_at)
+        self.assertIsNone(Conversation.objects.get(id=self.legacy.id).archived_at)
+        self.assertEqual(archive_conversations(days=30).conversations, 0)
+
+        records = {r["conversationId"]: r for r in iter_transcript_records()}
+        self.assertEqual(
+            [m["content"] for m in records[str(self.old.id)]["messages"]],
+            [m["content"] for m in self.messages],
+        )
+        self.assertEqual(sorted(load_audit_columns().message_count.tolist()), [2, 2, 2])
+
+    def test_restore_on_append_and_command(self):
+        from django.core.management import call_command
+
+        out = io.StringIO()
+        call_command("archive_conversations", "--dry-run", stdout=out)
+        self.assertIn("1 conversations would be archived", out.getvalue())
+        call_command("archive_conversations", "--codec", "gzip", stdout=io.StringIO())
+        self.assertEqual(Conversation.objects.get(id=self.old.id).archive.codec, "gzip")
+
+        payload = json.dumps({"conversationId": str(self.old.id), "sender": "user", "content": "x"})
+        for auth in ({}, {"HTTP_AUTHORIZATION": "Bearer wrong"}):
+            r = self.client.post(
+                "/api/save-message/", data=payload, content_type="application/json", **auth
+            )
+            self.assertEqual(r.status_code, 401)
+        self.assertIsNotNone(Conversation.objects.get(id=self.old.id).archived_at)
+
+        r = self.client.post(
+            "/api/save-message/",
+            data=json.dumps({"conversationId": str(self.old.id), "sender": "user", "content": "mais"}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.p.auth_token}",
+        )
+        self.assertEqual(r.status_code, 200)
+        old = Conversation.objects.get(id=self.old.id)
+        self.assertIsNone(old.archived_at)
+        self.assertEqual([m["content"] for m in old.messages][-1], "mais")
+        self.assertEqual(len(old.messages), 3)
+        from .models import ConversationArchive
+
+        self.assertFalse(ConversationArchive.objects.filter(conversation_id=self.old.id).exists())
+
+
+class MemoryFactTests(TestCase):
+    def test_bm25_ranks_relevant_facts(self):
+        from .memory_index import MemoryIndex, tokenize
+
+        self.assertEqual(tokenize("Os Piratas são ótimos!"), ["pirata", "otimo"])
+        index = MemoryIndex.build(
+            [
+                "Gosta de dragões e de histórias de fantasia.",
+                "Achou o capitão dos piratas engraçado.",
+                "Lê com a irmã antes de dormir.",
+                "O pirata preferido é o grumete.",
+            ]
+        )
+        self.assertEqual(
+            index.top_k("Porque é que o pirata fugiu?", 2),
+            ["O pirata preferido é o grumete.", "Achou o capitão dos piratas engraçado."],
+        )
+        # No overlap: the most recent facts, newest first.
+        self.assertEqual(index.top_k("olá", 1), ["O pirata preferido é o grumete."])
+        self.assertEqual(MemoryIndex.build([]).top_k("pirata", 3), [])
+
+    @override_settings(STUDY_MEMORY_TOP_K=2, STUDY_MEMORY_MAX_FACTS=4)
+    def test_prompt_context_uses_top_k_facts_with_legacy_fallback(self):
+        from django.core.management import call_command
+
+        from .models import MemoryFact
+        from .study_services import add_memory_facts, facts_from_text, get_memory_context_for_chat
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.PERSONALIZED,
+            auth_token=secrets.token_urlsafe(32),
+            memory_summary="Gosta de dragões. Tem um gato.\n\n---\nAchou os piratas engraçados.",
+        )
+        self.assertIn("Tem um gato.", get_memory_context_for_chat(p, "dragões"))
+
+        self.assertEqual(
+            facts_from_text("- Gosta de dragões.\n2) Tem um gato. Lê à noite.\n---"),
+            ["Gosta de dragões.", "Tem um gato.", "Lê à noite."],
+        )
+        out = io.StringIO()
+        call_command("backfill_memory_facts", stdout=out)
+        self.assertIn("Added 3 facts for 1 participants", out.getvalue())
+        call_command("backfill_memory_facts", stdout=io.StringIO())
+        self.assertEqual(MemoryFact.objects.filter(participant=p).count(), 3)
+        p.refresh_from_db()
+
+        context = get_memory_context_for_chat(p, "Vi um dragão enorme")
+        self.assertIn("- Gosta de dragões.", context)
+        self.assertNotIn("Achou os piratas", context)
+        self.assertEqual(context.count("\n- "), 1)
+        self.assertEqual(
+            get_memory_context_for_chat(p, "o gato, o dragão e os piratas").count("\n- "), 2
+        )
+
+        add_memory_facts(p, ["Quer ler sobre o espaço.", "Prefere livros curtos."])
+        self.assertEqual(MemoryFact.objects.filter(participant=p).count(), 4)
+        self.assertFalse(MemoryFact.objects.filter(participant=p, text="Gosta de dragões.").exists())
+
+        generic = Participant.objects.create(
+            condition=Participant.Condition.GENERIC, auth_token=secrets.token_urlsafe(32)
+        )
+        add_memory_facts(generic, ["Gosta de dragões."])
+        self.assertEqual(get_memory_context_for_chat(generic, "dragões"), "")
+
+    def test_memory_index_cached_by_revision(self):
+        from .study_services import add_memory_facts, get_memory_context_for_chat
+
+        p = Participant.objects.create(
+            condition=Participant.Condition.PERSONALIZED, auth_token=secrets.token_urlsafe(32)
+        )
+        add_memory_facts(p, ["Gosta de dragões."])
+        self.assertEqual(p.memory_revision, 1)
+        get_memory_context_for_chat(p, "dragão")
+        with self.assertNumQueries(0):
+            self.assertIn("dragões", get_memory_context_for_chat(p, "o dragão voa"))
+
+        # Another worker's copy of the row sees the bump and reloads.
+        stale = Participant.objects.get(pk=p.pk)
+        add_memory_facts(p, ["Tem um gato chamado Tigre."])
+        fresh = Participant.objects.get(pk=p.pk)
+        self.assertEqual(fresh.memory_revision, 2)
+        self.assertNotIn("Tigre", get_memory_context_for_chat(stale, "gato"))
+        self.assertIn("Tigre", get_memory_context_for_chat(fresh, "gato"))
@@ -0,0 +1,128 @@
+"""
+Token-bucket throttling for the login / registration endpoints.
+
+Buckets live in the Django cache (shared across workers when CACHES points
+at Redis; per-process with the default local-memory cache) and are checked
+before any PIN hashing, so a burst is rejected for the price of a cache
+read. Updates are read-modify-write, so concurrent requests can slip a
+token or two past the limit; that is fine for shedding load.
+"""
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+STATS_PREFIX = "throttle-stats"
+OUTCOMES = ("admitted", "rejected")
+
+
+@dataclass(frozen=True)
+class TokenBucket:
+    name: str
+    capacity: float
+    refill_per_second: float
+
+    def _key(self, ident: str) -> str:
+        return f"throttle:{self.name}:{ident}"
+
+    def take(self, ident: str, now: Optional[float] = None) -> float:
+        """
+        Take one token for `ident`. Returns 0.0 if admitted, otherwise the
+        seconds until a token is available. A bucket with no capacity or no
+        refill rate is disabled and admits everything.
+        """
+        if self.capacity <= 0 or self.refill_per_second <= 0:
+            return 0.0
+        now = time.time() if now is None else now
+        key = self._key(ident)
+        tokens, stamp = cache.get(key) or (self.capacity, now)
+        tokens = min(self.capacity, tokens + max(0.0, now - stamp) * self.refill_per_second)
+        admitted = tokens >= 1
+        if admitted:
+            tokens -= 1
+        # Once the bucket would be full again the entry carries no information.
+        ttl = int((self.capacity - tokens) / self.refill_per_second) + 1
+        cache.set(key, (tokens, now), timeout=ttl)
+        return 0.0 if admitted else (1 - tokens) / self.refill_per_second
+
+
+def _bucket(name: str, burst_setting: str, per_minute_setting: str, default_burst, default_rate):
+    return TokenBucket(
+        name=name,
+        capacity=float(getattr(settings, burst_setting, default_burst)),
+        refill_per_second=float(getattr(settings, per_minute_setting, default_rate)) / 60.0,
+    )
+
+
+def ip_bucket() -> TokenBucket:
+    # Generous: a whole classroom usually shares one school NAT address.
+    return _bucket("ip", "STUDY_THROTTLE_IP_BURST", "STUDY_THROTTLE_IP_PER_MINUTE", 60, 60)
+
+
+def login_code_bucket() -> TokenBucket:
+    return _bucket("code", "STUDY_THROTTLE_CODE_BURST", "STUDY_THROTTLE_CODE_PER_MINUTE", 5, 5)
+
+
+def client_ip(request) -> str:
+    """
+    Client address for the per-IP bucket. Behind trusted proxies, each proxy
+    appends the address it saw to X-Forwarded-For, so the client is the entry
+    STUDY_TRUSTED_PROXY_HOPS from the right; anything to its left was written
+    by the client and is ignored.
+    """
+    if getattr(settings, "STUDY_TRUST_X_FORWARDED_FOR", False):
+        hops = max(1, int(getattr(settings, "STUDY_TRUSTED_PROXY_HOPS", 1)))
+        entries = [e.strip() for e in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")]
+        entries = [e for e in entries if e]
+        if len(entries) >= hops:
+            return entries[-hops]
+    return request.META.get("REMOTE_ADDR", "") or "unknown"
+
+
+def _count(scope: str, outcome: str) -> None:
+    key = f"{STATS_PREFIX}:{scope}:{outcome}"
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def throttle_stats(scopes: Iterable[str] = ("login", "register")) -> Dict[str, Dict[str, int]]:
+    keys = {f"{STATS_PREFIX}:{s}:{o}": (s, o) for s in scopes for o in OUTCOMES}
+    found = cache.get_many(list(keys))
+    out: Dict[str, Dict[str, int]] = {s: {o: 0 for o in OUTCOMES} for s in scopes}
+    for key, (scope, outcome) in keys.items():
+        out[scope][outcome] = int(found.get(key, 0))
+    return out
+
+
+def check_throttle(
+    request, scope: str, login_code: Optional[str] = None
+) -> Optional[JsonResponse]:
+    """
+    Take a token from the client-IP bucket (and the login-code bucket when a
+    code is given). Returns a 429 response if any bucket is empty, else None.
+    """
+    if not getattr(settings, "STUDY_THROTTLE_ENABLED", True):
+        return None
+    checks: Tuple[Tuple[TokenBucket, str], ...] = ((ip_bucket(), f"{scope}:{client_ip(request)}"),)
+    if login_code:
+        checks += ((login_code_bucket(), login_code),)
+    for bucket, ident in checks:
+        wait = bucket.take(ident)
+        if wait > 0:
+            _count(scope, "rejected")
+            response = JsonResponse(
+                {"error": "Demasiados pedidos. Tenta novamente daqui a pouco."}, status=429
+            )
+            response["Retry-After"] = str(math.ceil(wait))
+            return response
+    _count(scope, "admitted")
+    return None
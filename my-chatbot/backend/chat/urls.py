@@ -2,6 +2,7 @@ from django.urls import path
 from .views import ChatAPIView, conversation_audit
 from . import views
 from . import study_views
+from . import export_views
 
 urlpatterns = [
     path("chat/", ChatAPIView.as_view(), name="chat"),
@@ -9,8 +10,13 @@ urlpatterns = [
     path("save-message/", views.save_message, name="save_message"),
     path("audit/<uuid:conversation_id>/", conversation_audit, name="conversation_audit"),
     path("study/register/", study_views.study_register, name="study_register"),
+    path("study/enroll/bulk/", study_views.study_bulk_enroll, name="study_bulk_enroll"),
     path("study/login/", study_views.study_login, name="study_login"),
+    path("study/throttle-stats/", study_views.study_throttle_stats, name="study_throttle_stats"),
     path("study/progress/", study_views.study_progress, name="study_progress"),
+    path("study/schedule/", study_views.study_schedule, name="study_schedule"),
+    path("study/events/", study_views.study_events, name="study_events"),
+    path("study/events/token/", study_views.study_events_token, name="study_events_token"),
     path("study/session/start/", study_views.study_session_start, name="study_session_start"),
     path("study/session/heartbeat/", study_views.study_heartbeat, name="study_heartbeat"),
     path(
@@ -23,6 +29,11 @@ urlpatterns = [
         study_views.study_survey_definition,
         name="study_survey_definition",
     ),
+    path(
+        "study/survey-definition/<str:version>/",
+        study_views.study_survey_definition_by_version,
+        name="study_survey_definition_by_version",
+    ),
     path(
         "study/session/caiq-panas/",
         study_views.study_caiq_panas_submit,
@@ -30,4 +41,10 @@ urlpatterns = [
     ),
     path("study/session/complete/", study_views.study_session_complete, name="study_session_complete"),
     path("study/session/exit/", study_views.study_session_exit, name="study_session_exit"),
+    path(
+        "export/survey-responses/",
+        export_views.export_survey_responses,
+        name="export_survey_responses",
+    ),
+    path("export/transcripts/", export_views.export_transcripts, name="export_transcripts"),
 ]
\ No newline at end of file
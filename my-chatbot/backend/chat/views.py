@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from django.shortcuts import render  # if you use it elsewhere
+from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
@@ -18,8 +19,12 @@ from typing import Dict, List, Optional
 
 from openai import OpenAI
 from .scaffold_policy import LadderPolicy, Move, render_move
+from .signal_classifier import get_signal_scorer
 from .models import Conversation, StudySession
+from .archive import restore_conversation
 from .audit import compute_audit
+from .idempotency import idempotent
+from .message_meta import encode_meta
 from .study_services import (
     chat_should_lock,
     get_memory_context_for_chat,
@@ -30,7 +35,11 @@ from .study_services import (
 # ------------------------------
 # OpenAI client
 # ------------------------------
-openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+openai = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    timeout=float(getattr(settings, "CHAT_OPENAI_TIMEOUT_SECONDS", 30)),
+    max_retries=int(getattr(settings, "CHAT_OPENAI_MAX_RETRIES", 1)),
+)
 
 # Assigned reading for all study/chat sessions (system prompt only; no frontend copy).
 ASSIGNED_READING_BOOK = "Os Piratas"
@@ -267,7 +276,7 @@ def _session_key(request) -> str:
 def _get_policy(request) -> LadderPolicy:
     key = _session_key(request)
     if key not in _POLICY_STORE:
-        _POLICY_STORE[key] = LadderPolicy()
+        _POLICY_STORE[key] = LadderPolicy(scorer=get_signal_scorer())
     return _POLICY_STORE[key]
 
 @csrf_exempt
@@ -295,12 +304,14 @@ def start_conversation(request):
 
     messages = []
     if initial_message:
+        now = timezone.now()
         messages.append(
             {
                 "sender": "assistant",
                 "content": initial_message,
-                "created_at": timezone.now().isoformat(),
-                "meta": {"role": "agent", "on_text": True},
+                "created_at": now.isoformat(),
+                "ts": now.timestamp(),
+                "meta": encode_meta({"role": "agent", "on_text": True}),
             }
         )
 
@@ -313,6 +324,7 @@ def start_conversation(request):
 
 
 @csrf_exempt
+@idempotent("save-message")
 def save_message(request):
     """
     Append a message to an existing Conversation.
@@ -373,13 +385,18 @@ def save_message(request):
                 )
             touch_activity(ss)
 
+    if convo.archived_at:
+        # Only once the caller is authorized and the session may still chat.
+        restore_conversation(convo)
     msgs = convo.messages or []
+    now = timezone.now()
     msgs.append(
         {
             "sender": sender,
             "content": content,
-            "created_at": timezone.now().isoformat(),
-            "meta": meta,
+            "created_at": now.isoformat(),
+            "ts": now.timestamp(),
+            "meta": encode_meta(meta) if isinstance(meta, dict) else {},
         }
     )
     convo.messages = msgs
@@ -391,6 +408,7 @@ def save_message(request):
 
 
 @method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(idempotent("chat"), name="post")
 class ChatAPIView(APIView):
     """
     POST JSON: {
@@ -466,7 +484,7 @@ class ChatAPIView(APIView):
                 if convo:
                     character = convo.character
                     user_name = convo.user_name
-                memory_context = get_memory_context_for_chat(participant)
+                memory_context = get_memory_context_for_chat(participant, user_msg)
 
             if not user_msg:
                 return Response(
@@ -14,6 +14,7 @@ from pathlib import Path
 from urllib.parse import urlparse
 
 import dj_database_url
+from corsheaders.defaults import default_headers as default_cors_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -100,11 +101,19 @@ WSGI_APPLICATION = 'config.wsgi.application'
 #
 # If DATABASE_URL is set (postgres:// or postgresql:// from Heroku, Render, Railway, etc.),
 # dj-database-url configures PostgreSQL. Otherwise use local SQLite.
+#
+# Under ASGI (config/asgi.py sets DJANGO_ASGI) every sync view runs in a fresh
+# thread, so a persistent connection would be left open per request and never
+# reused: default to closing connections after each request there. Put
+# PgBouncer (or another server-side pooler) in front of Postgres if connection
+# setup shows up in latency.
 _sqlite_url = f"sqlite:///{(BASE_DIR / 'db.sqlite3').resolve().as_posix()}"
+_running_asgi = os.getenv("DJANGO_ASGI", "false").lower() == "true"
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "0" if _running_asgi else "600"))
 DATABASES = {
     "default": dj_database_url.config(
         default=_sqlite_url,
-        conn_max_age=600,
+        conn_max_age=DB_CONN_MAX_AGE,
         ssl_require=os.getenv("DATABASE_SSL_REQUIRE", "false").lower() == "true",
     )
 }
@@ -129,6 +138,18 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Django's default hashers, plus the study PIN hasher (selected explicitly by
+# chat.study_credentials, so admin passwords keep the stronger default).
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'chat.hashers.StudyPinHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -160,6 +181,8 @@ CORS_ALLOWED_ORIGINS = [origin.strip() for origin in CORS_ALLOWED_ORIGINS_STR.sp
 
 # Fallback when CORS_* env is unset: allow any Render HTTPS app origin.
 CORS_ALLOWED_ORIGIN_REGEXES = []
+# The frontend sends Idempotency-Key on retried writes.
+CORS_ALLOW_HEADERS = (*default_cors_headers, "idempotency-key")
 if (
     not DEBUG
     and os.getenv("CORS_TRUST_ONRENDER", "true").lower() == "true"
@@ -211,10 +234,21 @@ STUDY_START_DATE = os.getenv("STUDY_START_DATE", "2020-01-01")
 STUDY_TIMEZONE = os.getenv("STUDY_TIMEZONE", "UTC")
 STUDY_TOTAL_WEEKS = int(os.getenv("STUDY_TOTAL_WEEKS", "3"))
 STUDY_INACTIVITY_SECONDS = int(os.getenv("STUDY_INACTIVITY_SECONDS", "600"))
+# sweep_study_locks marks in-progress sessions idle this long as abandoned (0 = never).
+STUDY_ABANDON_AFTER_SECONDS = int(os.getenv("STUDY_ABANDON_AFTER_SECONDS", "0"))
+# /api/study/events/ (SSE): max gap between messages, and stream lifetime before the client reconnects.
+STUDY_EVENTS_KEEPALIVE_SECONDS = int(os.getenv("STUDY_EVENTS_KEEPALIVE_SECONDS", "15"))
+STUDY_EVENTS_MAX_SECONDS = int(os.getenv("STUDY_EVENTS_MAX_SECONDS", "300"))
+# Lifetime of the signed ?stream= token used to open the events stream.
+STUDY_EVENTS_TOKEN_TTL_SECONDS = int(os.getenv("STUDY_EVENTS_TOKEN_TTL_SECONDS", "60"))
 STUDY_HEARTBEAT_MAX_DELTA_SECONDS = int(
     os.getenv("STUDY_HEARTBEAT_MAX_DELTA_SECONDS", "120")
 )
 STUDY_MEMORY_MAX_CHARS = int(os.getenv("STUDY_MEMORY_MAX_CHARS", "6000"))
+# Memory facts (personalized arm): how many relevant facts go into each chat prompt,
+# and how many are kept per participant (oldest dropped first).
+STUDY_MEMORY_TOP_K = int(os.getenv("STUDY_MEMORY_TOP_K", "5"))
+STUDY_MEMORY_MAX_FACTS = int(os.getenv("STUDY_MEMORY_MAX_FACTS", "200"))
 STUDY_PROFILE_PERSONALIZED_MAX_SESSION_MINUTES = int(
     os.getenv("STUDY_PROFILE_PERSONALIZED_MAX_SESSION_MINUTES", "20")
 )
@@ -244,6 +278,63 @@ STUDY_LOGIN_CODE_LENGTH = int(os.getenv("STUDY_LOGIN_CODE_LENGTH", "10"))
 STUDY_ROTATE_TOKEN_ON_LOGIN = (
     os.getenv("STUDY_ROTATE_TOKEN_ON_LOGIN", "true").lower() == "true"
 )
+# PBKDF2 iterations for PINs (chat.hashers.StudyPinHasher); tune with
+# `python manage.py benchmark_pin_hasher`. Existing hashes upgrade on login.
+STUDY_PIN_HASH_ITERATIONS = int(os.getenv("STUDY_PIN_HASH_ITERATIONS", "60000"))
+# Failed PIN attempts per login code before login is refused for the window.
+STUDY_LOGIN_MAX_FAILURES = int(os.getenv("STUDY_LOGIN_MAX_FAILURES", "5"))
+STUDY_LOGIN_FAILURE_WINDOW_SECONDS = int(
+    os.getenv("STUDY_LOGIN_FAILURE_WINDOW_SECONDS", "900")
+)
+# Token-bucket throttle on study login/register (chat.throttle), checked before PIN
+# hashing: burst size and refill rate per client IP and per login code.
+STUDY_THROTTLE_ENABLED = os.getenv("STUDY_THROTTLE_ENABLED", "true").lower() == "true"
+STUDY_THROTTLE_IP_BURST = int(os.getenv("STUDY_THROTTLE_IP_BURST", "60"))
+STUDY_THROTTLE_IP_PER_MINUTE = int(os.getenv("STUDY_THROTTLE_IP_PER_MINUTE", "60"))
+STUDY_THROTTLE_CODE_BURST = int(os.getenv("STUDY_THROTTLE_CODE_BURST", "5"))
+STUDY_THROTTLE_CODE_PER_MINUTE = int(os.getenv("STUDY_THROTTLE_CODE_PER_MINUTE", "5"))
+# Behind Render/Heroku the client address comes from X-Forwarded-For: the entry
+# appended by the outermost trusted proxy, STUDY_TRUSTED_PROXY_HOPS from the right
+# (entries further left are client-supplied and can be forged).
+STUDY_TRUST_X_FORWARDED_FOR = os.getenv(
+    "STUDY_TRUST_X_FORWARDED_FOR",
+    "true" if (os.environ.get("RENDER") or os.environ.get("DYNO")) else "false",
+).lower() == "true"
+STUDY_TRUSTED_PROXY_HOPS = int(os.getenv("STUDY_TRUSTED_PROXY_HOPS", "1"))
+
+# PIN hashing threads for the staff bulk-enrollment endpoint (the management
+# command uses a process pool instead).
+STUDY_BULK_ENROLL_THREADS = int(os.getenv("STUDY_BULK_ENROLL_THREADS", "4"))
+
+# Throttle buckets and login-failure counters live in the cache. Set REDIS_URL so
+# all workers share them; otherwise each process keeps its own local-memory cache.
+_redis_url = os.getenv("REDIS_URL", "").strip()
+if _redis_url:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": _redis_url,
+        }
+    }
+
+# Conversations whose study sessions all ended this many days ago are moved to the
+# compressed archive table by `python manage.py archive_conversations`.
+STUDY_ARCHIVE_AFTER_DAYS = int(os.getenv("STUDY_ARCHIVE_AFTER_DAYS", "30"))
+
+# OpenAI calls made inside a request: per-attempt timeout and retries. Together they
+# bound how long /api/chat/ can run (the client default is 10 minutes x 3 attempts).
+CHAT_OPENAI_TIMEOUT_SECONDS = float(os.getenv("CHAT_OPENAI_TIMEOUT_SECONDS", "30"))
+CHAT_OPENAI_MAX_RETRIES = int(os.getenv("CHAT_OPENAI_MAX_RETRIES", "1"))
+
+# Idempotency-Key handling on write endpoints (chat.idempotency): how long a stored
+# response is replayed, and when an unfinished claim may be taken over (never sooner
+# than the OpenAI budget above plus a minute, whatever this is set to).
+STUDY_IDEMPOTENCY_TTL_SECONDS = int(os.getenv("STUDY_IDEMPOTENCY_TTL_SECONDS", "86400"))
+STUDY_IDEMPOTENCY_STALE_SECONDS = int(os.getenv("STUDY_IDEMPOTENCY_STALE_SECONDS", "300"))
+
+# Optional local confusion/success classifier for the scaffold ladder (.npz written by
+# `python manage.py train_signal_classifier`). Empty: regex Heuristics.
+CHAT_SIGNAL_CLASSIFIER_PATH = os.getenv("CHAT_SIGNAL_CLASSIFIER_PATH", "").strip()
 
 # Production data protection (hosting + ops; Django cannot encrypt disks by itself):
 # - Use HTTPS (see SECURE_SSL_REDIRECT when DEBUG=False).
@@ -1,4 +1,5 @@
 import React, { useEffect, useState } from "react";
+import { idempotentFetch } from "../idempotentFetch.js";
 
 const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
@@ -10,7 +11,13 @@ const CAIQ_VALUES = [
   { v: 5, label: "Concordo totalmente 😄" },
 ];
 
-export default function CaiqPanasSurvey({ authToken, studySessionId, onDone, onBack }) {
+export default function CaiqPanasSurvey({
+  authToken,
+  studySessionId,
+  surveyVersion,
+  onDone,
+  onBack,
+}) {
   const [def, setDef] = useState(null);
   const [answers, setAnswers] = useState({});
   const [error, setError] = useState("");
@@ -21,12 +28,17 @@ export default function CaiqPanasSurvey({ authToken, studySessionId, onDone, onB
     (async () => {
       setError("");
       try {
-        const res = await fetch(
-          `${API_URL}/api/study/session/survey-definition/?studySessionId=${encodeURIComponent(
-            studySessionId
-          )}`,
-          { headers: { Authorization: `Bearer ${authToken}` } }
-        );
+        // With the version known from progress, use the shared HTTP-cacheable definition.
+        const res = surveyVersion
+          ? await fetch(
+              `${API_URL}/api/study/survey-definition/${encodeURIComponent(surveyVersion)}/`
+            )
+          : await fetch(
+              `${API_URL}/api/study/session/survey-definition/?studySessionId=${encodeURIComponent(
+                studySessionId
+              )}`,
+              { headers: { Authorization: `Bearer ${authToken}` } }
+            );
         const data = await res.json().catch(() => ({}));
         if (cancelled) return;
         if (!res.ok) {
@@ -46,7 +58,7 @@ export default function CaiqPanasSurvey({ authToken, studySessionId, onDone, onB
     return () => {
       cancelled = true;
     };
-  }, [authToken, studySessionId]);
+  }, [authToken, studySessionId, surveyVersion]);
 
   const setVal = (itemId, v) => {
     setAnswers((a) => ({ ...a, [itemId]: v }));
@@ -69,7 +81,7 @@ export default function CaiqPanasSurvey({ authToken, studySessionId, onDone, onB
           value: answers[it.itemId],
         })),
       };
-      const res = await fetch(`${API_URL}/api/study/session/caiq-panas/`, {
+      const res = await idempotentFetch(`${API_URL}/api/study/session/caiq-panas/`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
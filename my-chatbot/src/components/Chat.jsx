@@ -6,6 +6,7 @@ import React, {
   useEffect,
 } from "react";
 import { defaultCharacter, characters } from "../data/characters";
+import { idempotentFetch } from "../idempotentFetch.js";
 
 const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
@@ -54,6 +55,8 @@ export default function Chat({
   const listRef = useRef(null);
   const endRef = useRef(null);
   const lockEmittedRef = useRef(false);
+  // Server-reported wall-clock lock time (ms epoch) from /api/study/events/.
+  const wallLockAtRef = useRef(null);
 
   const scrollToBottom = useCallback(() => {
     endRef.current?.scrollIntoView({ block: "end" });
@@ -134,7 +137,7 @@ export default function Chat({
       }
 
       try {
-        const res = await fetch(`${API_URL}/api/save-message/`, {
+        const res = await idempotentFetch(`${API_URL}/api/save-message/`, {
           method: "POST",
           headers,
           body: JSON.stringify({
@@ -219,6 +222,7 @@ export default function Chat({
 
   useEffect(() => {
     lockEmittedRef.current = false;
+    wallLockAtRef.current = null;
   }, [studyContext?.studySessionId]);
 
   useEffect(() => {
@@ -234,7 +238,14 @@ export default function Chat({
         return;
       }
       const elapsed = (Date.now() - start) / 1000;
-      const left = Math.max(0, Math.floor(capSec - elapsed));
+      const left = Math.max(
+        0,
+        Math.floor(
+          wallLockAtRef.current !== null
+            ? (wallLockAtRef.current - Date.now()) / 1000
+            : capSec - elapsed
+        )
+      );
       setSecondsUntilLock(left);
       if (left <= 0 && !lockEmittedRef.current) {
         lockEmittedRef.current = true;
@@ -250,6 +261,69 @@ export default function Chat({
     onStudyLocked,
   ]);
 
+  useEffect(() => {
+    if (!studyContext?.authToken || !studyContext?.studySessionId) return;
+    if (typeof EventSource === "undefined") return;
+
+    const sessionId = studyContext.studySessionId;
+    // EventSource cannot send headers: open it with a short-lived signed stream
+    // token, and fetch a fresh one whenever the browser gives up reconnecting
+    // (the old token has expired by the time the server closes the stream).
+    let source = null;
+    let retryTimer = null;
+    let cancelled = false;
+    const emitLock = (reason) => {
+      if (!lockEmittedRef.current) {
+        lockEmittedRef.current = true;
+        onStudyLocked?.(reason || "time_cap");
+      }
+    };
+    const onState = (e) => {
+      const d = JSON.parse(e.data || "{}");
+      if (d.studySessionId !== sessionId) return;
+      if (d.wallLockAt) wallLockAtRef.current = new Date(d.wallLockAt).getTime();
+      if (d.sessionLocked) emitLock(d.lockReason);
+    };
+    const onLock = (e) => {
+      const d = JSON.parse(e.data || "{}");
+      if (d.studySessionId === sessionId) emitLock(d.lockReason);
+    };
+    const open = async () => {
+      let streamToken = null;
+      try {
+        const res = await fetch(`${API_URL}/api/study/events/token/`, {
+          method: "POST",
+          headers: { Authorization: `Bearer ${studyContext.authToken}` },
+        });
+        if (res.ok) streamToken = (await res.json()).streamToken;
+      } catch {
+        /* retried below */
+      }
+      if (cancelled) return;
+      if (!streamToken) {
+        retryTimer = setTimeout(open, 5000);
+        return;
+      }
+      source = new EventSource(
+        `${API_URL}/api/study/events/?stream=${encodeURIComponent(streamToken)}`
+      );
+      source.addEventListener("state", onState);
+      source.addEventListener("time-remaining", onState);
+      source.addEventListener("lock", onLock);
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && !cancelled) {
+          retryTimer = setTimeout(open, 1000);
+        }
+      };
+    };
+    open();
+    return () => {
+      cancelled = true;
+      clearTimeout(retryTimer);
+      source?.close();
+    };
+  }, [studyContext?.authToken, studyContext?.studySessionId, onStudyLocked]);
+
   useEffect(() => {
     if (!studyContext?.authToken || !studyContext?.studySessionId) return;
 
@@ -321,7 +395,7 @@ export default function Chat({
         headers.Authorization = `Bearer ${studyContext.authToken}`;
       }
 
-      const res = await fetch(`${API_URL}/api/chat/`, {
+      const res = await idempotentFetch(`${API_URL}/api/chat/`, {
         method: "POST",
         headers,
         body: JSON.stringify(payload),
@@ -4,10 +4,11 @@ import NameInput from "./NameInput.jsx";
 import CharacterSelection from "./CharacterSelection.jsx";
 import Chat from "./Chat.jsx";
 import CaiqPanasSurvey from "./CaiqPanasSurvey.jsx";
+import { idempotentFetch } from "../idempotentFetch.js";
 
 const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
-async function studyFetch(path, authToken, options = {}) {
+async function studyFetch(path, authToken, options = {}, { idempotent = false } = {}) {
   const headers = {
     ...(options.headers || {}),
     Authorization: `Bearer ${authToken}`,
@@ -15,7 +16,8 @@ async function studyFetch(path, authToken, options = {}) {
   if (options.body && !headers["Content-Type"]) {
     headers["Content-Type"] = "application/json";
   }
-  return fetch(`${API_URL}${path}`, { ...options, headers });
+  const send = idempotent ? idempotentFetch : fetch;
+  return send(`${API_URL}${path}`, { ...options, headers });
 }
 
 const STUDY_CHARACTER_KEY = "studySelectedCharacter";
@@ -179,7 +181,7 @@ export default function StudySessionDashboard({ authToken, onLogout }) {
         character: charKey,
         initialMessage: initialRaw,
       }),
-    });
+    }, { idempotent: true });
     const data = await res.json().catch(() => ({}));
     if (!res.ok) {
       setErr(data.error || "Não foi possível iniciar a sessão");
@@ -287,6 +289,9 @@ export default function StudySessionDashboard({ authToken, onLogout }) {
       <CaiqPanasSurvey
         authToken={authToken}
         studySessionId={sid}
+        surveyVersion={
+          sid === progress?.focusSessionId ? progress?.focusSurveyVersion : undefined
+        }
         onDone={handleCaiqDone}
         onBack={() => setPhase("lobby")}
       />
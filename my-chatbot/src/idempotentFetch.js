@@ -0,0 +1,47 @@
+// POST with an Idempotency-Key that stays the same across retries, so a
+// request that reached the server before the connection dropped is replayed
+// from the stored response instead of being written (or sent to the LLM) twice.
+//
+// A 409 with Retry-After means the first attempt is still running on the
+// server (e.g. a slow chat reply after a gateway timeout): keep polling until
+// it finishes and its stored response comes back, up to maxPollMs.
+const RETRY_STATUSES = new Set([409, 502, 503, 504]);
+
+function newKey() {
+  if (globalThis.crypto?.randomUUID) return globalThis.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+function retryAfterMs(res) {
+  const seconds = Number(res.headers.get("Retry-After"));
+  return Number.isFinite(seconds) && seconds > 0 ? seconds * 1000 : null;
+}
+
+export async function idempotentFetch(
+  url,
+  options = {},
+  { retries = 2, delayMs = 800, maxPollMs = 300000 } = {}
+) {
+  const headers = { ...(options.headers || {}), "Idempotency-Key": newKey() };
+  const pollUntil = Date.now() + maxPollMs;
+  for (let attempt = 0; ; ) {
+    let wait = null;
+    try {
+      const res = await fetch(url, { ...options, headers });
+      if (!RETRY_STATUSES.has(res.status)) return res;
+      wait = res.status === 409 ? retryAfterMs(res) : null;
+      if (wait !== null) {
+        if (Date.now() + wait > pollUntil) return res;
+      } else if (attempt >= retries) {
+        return res;
+      }
+    } catch (err) {
+      if (attempt >= retries) throw err;
+    }
+    if (wait === null) {
+      attempt += 1;
+      wait = delayMs * attempt;
+    }
+    await new Promise((resolve) => setTimeout(resolve, wait));
+  }
+}